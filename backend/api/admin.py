@@ -1,13 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Optional, List
+import io
 import json
-from backend.database import get_db
+from datetime import date, timedelta
+import asyncio
+import time
+from fastapi.concurrency import run_in_threadpool
+from backend.database import get_db, SessionLocal
 from backend.models.config import Config
-from backend.models.exam import ExamQuestion, ExamResult, ExamConfig
+from backend.models.exam import ExamQuestion, ExamResult, ExamConfig, ExamAnswer, ExamQuestionStats, ExamSession
+from backend.models.transcript import ChatTranscript
+from backend.models.usage import TokenUsageDaily, TokenUsageSession
+from backend.models.pinned import PinnedAnswer, PinnedAnswerStats
 from backend.models.user import User
 from backend.auth_utils import get_current_user
+from backend.services.bedrock_service import (
+    retrieval_cache,
+    RAG_MODES,
+    SEARCH_TYPES,
+    DEFAULT_RETRIEVAL_RESULTS,
+    DEFAULT_CONTEXT_TOKEN_BUDGET,
+)
+from backend.services.rag_backends import RETRIEVAL_BACKENDS, LOCAL_GENERATORS
+from backend.services import rate_limit
+from backend.services import aws_clients
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -31,6 +49,20 @@ class ConfigUpdate(BaseModel):
     chat_bubble_bot: Optional[str] = None
     chat_bubble_bot_foreground: Optional[str] = None
     webhook_url: Optional[str] = None
+    store_exam_images_in_s3: Optional[bool] = None
+    rag_mode: Optional[str] = None
+    retrieval_results: Optional[int] = None
+    search_type: Optional[str] = None
+    max_output_tokens: Optional[int] = None
+    context_token_budget: Optional[int] = None
+    retrieval_backend: Optional[str] = None
+    local_generator: Optional[str] = None
+    preprocess_uploads: Optional[bool] = None
+    daily_token_budget: Optional[int] = None
+    budget_fallback_model_arn: Optional[str] = None
+    chat_rate_limit: Optional[int] = None
+    exam_rate_limit: Optional[int] = None
+    rate_limit_key: Optional[str] = None
 
 
 class ConfigResponse(BaseModel):
@@ -51,6 +83,20 @@ class ConfigResponse(BaseModel):
     chat_bubble_bot: Optional[str]
     chat_bubble_bot_foreground: Optional[str]
     webhook_url: Optional[str]
+    store_exam_images_in_s3: Optional[bool] = None
+    rag_mode: Optional[str] = None
+    retrieval_results: Optional[int] = None
+    search_type: Optional[str] = None
+    max_output_tokens: Optional[int] = None
+    context_token_budget: Optional[int] = None
+    retrieval_backend: Optional[str] = None
+    local_generator: Optional[str] = None
+    preprocess_uploads: Optional[bool] = None
+    daily_token_budget: Optional[int] = None
+    budget_fallback_model_arn: Optional[str] = None
+    chat_rate_limit: Optional[int] = None
+    exam_rate_limit: Optional[int] = None
+    rate_limit_key: Optional[str] = None
 
 
 @router.get("/config", response_model=ConfigResponse)
@@ -72,7 +118,21 @@ async def get_config(db: Session = Depends(get_db), current_user: User = Depends
             chat_bubble_user_foreground="#fafafa",
             chat_bubble_bot="#f4f4f5",
             chat_bubble_bot_foreground="#18181b",
-            webhook_url=None
+            webhook_url=None,
+            store_exam_images_in_s3=False,
+            rag_mode="retrieve_and_generate",
+            retrieval_results=DEFAULT_RETRIEVAL_RESULTS,
+            search_type=None,
+            max_output_tokens=None,
+            context_token_budget=DEFAULT_CONTEXT_TOKEN_BUDGET,
+            retrieval_backend="bedrock",
+            local_generator="extractive",
+            preprocess_uploads=False,
+            daily_token_budget=None,
+            budget_fallback_model_arn=None,
+            chat_rate_limit=rate_limit.DEFAULT_RATE_LIMITS["chat"],
+            exam_rate_limit=rate_limit.DEFAULT_RATE_LIMITS["exam"],
+            rate_limit_key="ip"
         )
     
     return ConfigResponse(
@@ -92,12 +152,43 @@ async def get_config(db: Session = Depends(get_db), current_user: User = Depends
         chat_bubble_user_foreground=config.chat_bubble_user_foreground or "#fafafa",
         chat_bubble_bot=config.chat_bubble_bot or "#f4f4f5",
         chat_bubble_bot_foreground=config.chat_bubble_bot_foreground or "#18181b",
-        webhook_url=config.webhook_url
+        webhook_url=config.webhook_url,
+        store_exam_images_in_s3=bool(config.store_exam_images_in_s3),
+        rag_mode=config.rag_mode or "retrieve_and_generate",
+        retrieval_results=config.retrieval_results or DEFAULT_RETRIEVAL_RESULTS,
+        search_type=config.search_type,
+        max_output_tokens=config.max_output_tokens,
+        context_token_budget=config.context_token_budget or DEFAULT_CONTEXT_TOKEN_BUDGET,
+        retrieval_backend=config.retrieval_backend or "bedrock",
+        local_generator=config.local_generator or "extractive",
+        preprocess_uploads=bool(config.preprocess_uploads),
+        daily_token_budget=config.daily_token_budget,
+        budget_fallback_model_arn=config.budget_fallback_model_arn,
+        chat_rate_limit=config.chat_rate_limit or 0,
+        exam_rate_limit=config.exam_rate_limit or 0,
+        rate_limit_key=config.rate_limit_key or "ip"
     )
 
 
 @router.post("/config")
 async def update_config(config_data: ConfigUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    if config_data.rag_mode is not None and config_data.rag_mode not in RAG_MODES:
+        raise HTTPException(status_code=400, detail=f"rag_mode must be one of: {', '.join(RAG_MODES)}")
+    if config_data.search_type and config_data.search_type not in SEARCH_TYPES:
+        raise HTTPException(status_code=400, detail=f"search_type must be one of: {', '.join(SEARCH_TYPES)}")
+    if config_data.retrieval_backend is not None and config_data.retrieval_backend not in RETRIEVAL_BACKENDS:
+        raise HTTPException(status_code=400, detail=f"retrieval_backend must be one of: {', '.join(RETRIEVAL_BACKENDS)}")
+    if config_data.local_generator is not None and config_data.local_generator not in LOCAL_GENERATORS:
+        raise HTTPException(status_code=400, detail=f"local_generator must be one of: {', '.join(LOCAL_GENERATORS)}")
+    if config_data.retrieval_results is not None and not 1 <= config_data.retrieval_results <= 100:
+        raise HTTPException(status_code=400, detail="retrieval_results must be between 1 and 100")
+    if config_data.rate_limit_key is not None and config_data.rate_limit_key not in rate_limit.RATE_LIMIT_KEYS:
+        raise HTTPException(status_code=400, detail=f"rate_limit_key must be one of: {', '.join(rate_limit.RATE_LIMIT_KEYS)}")
+    for field in ("max_output_tokens", "context_token_budget", "daily_token_budget", "chat_rate_limit", "exam_rate_limit"):
+        value = getattr(config_data, field)
+        if value is not None and value < 0:
+            raise HTTPException(status_code=400, detail=f"{field} must not be negative")
+
     config = db.query(Config).first()
     if not config:
         config = Config()
@@ -139,13 +230,44 @@ async def update_config(config_data: ConfigUpdate, db: Session = Depends(get_db)
         config.chat_bubble_bot_foreground = config_data.chat_bubble_bot_foreground
     if config_data.webhook_url is not None:
         config.webhook_url = config_data.webhook_url if config_data.webhook_url else None
+    if config_data.store_exam_images_in_s3 is not None:
+        config.store_exam_images_in_s3 = config_data.store_exam_images_in_s3
+    if config_data.rag_mode is not None:
+        config.rag_mode = config_data.rag_mode
+    if config_data.retrieval_results is not None:
+        config.retrieval_results = config_data.retrieval_results
+    if config_data.search_type is not None:
+        config.search_type = config_data.search_type or None
+    if config_data.max_output_tokens is not None:
+        config.max_output_tokens = config_data.max_output_tokens or None
+    if config_data.context_token_budget is not None:
+        config.context_token_budget = config_data.context_token_budget or None
+    if config_data.retrieval_backend is not None:
+        config.retrieval_backend = config_data.retrieval_backend
+    if config_data.local_generator is not None:
+        config.local_generator = config_data.local_generator
+    if config_data.preprocess_uploads is not None:
+        config.preprocess_uploads = config_data.preprocess_uploads
+    if config_data.daily_token_budget is not None:
+        config.daily_token_budget = config_data.daily_token_budget or None
+    if config_data.budget_fallback_model_arn is not None:
+        config.budget_fallback_model_arn = config_data.budget_fallback_model_arn or None
+    if config_data.chat_rate_limit is not None:
+        config.chat_rate_limit = config_data.chat_rate_limit
+    if config_data.exam_rate_limit is not None:
+        config.exam_rate_limit = config_data.exam_rate_limit
+    if config_data.rate_limit_key is not None:
+        config.rate_limit_key = config_data.rate_limit_key
         
     db.commit()
+    widget_bootstrap.invalidate()
+    rate_limit.invalidate()
+    # Clients built with replaced credentials are never used again
+    aws_clients.clear()
     return {"message": "Configuration updated successfully"}
 
 
-@router.get("/public-config")
-async def get_public_config(db: Session = Depends(get_db)):
+def build_public_config(db: Session):
     config = db.query(Config).first()
     if not config:
         return {
@@ -175,8 +297,49 @@ async def get_public_config(db: Session = Depends(get_db)):
     }
 
 
+@router.get("/public-config")
+async def get_public_config(db: Session = Depends(get_db)):
+    return build_public_config(db)
+
+
 from fastapi import UploadFile, File
 from backend.services.s3_service import S3Service
+from backend.services.session_store import session_store
+from backend.services.admission import bedrock_admission
+from backend.services import metrics, widget_bootstrap
+from backend.services.exam_cache import question_cache
+from backend.services.transcripts import transcript_logger
+from backend.services import usage
+from backend.services import documents
+from backend.services.pinned_answers import pinned_answers
+from backend.services.citations import citation_cache
+
+
+def _uses_local_index(config) -> bool:
+    return bool(config and config.retrieval_backend == "local")
+
+
+async def _preprocess_and_upload(service: S3Service, files: List[UploadFile], bucket_name: str):
+    """Clean up documents across the process pool, uploading each one's parts as soon as it's done"""
+    from backend.services import preprocessing
+
+    loop = asyncio.get_running_loop()
+    pool = preprocessing.get_pool()
+    # Only as many documents in memory as there are processes to convert them
+    slots = asyncio.Semaphore(preprocessing.PREPROCESS_WORKERS)
+
+    async def convert(file: UploadFile):
+        async with slots:
+            data = await documents.read_upload(file)
+            parts = await loop.run_in_executor(pool, preprocessing.preprocess, file.filename, data)
+            if not parts:
+                await run_in_threadpool(service.upload_file, io.BytesIO(data), file.filename, bucket_name)
+                return file.filename, [file.filename]
+            for key, text in parts:
+                await run_in_threadpool(service.upload_file, io.BytesIO(text.encode("utf-8")), key, bucket_name)
+            return file.filename, [key for key, _ in parts]
+
+    return dict(await asyncio.gather(*(convert(file) for file in files)))
 
 
 @router.post("/upload")
@@ -186,17 +349,48 @@ async def upload_files(
     current_user: User = Depends(get_current_user)
 ):
     config = db.query(Config).first()
-    if not config or not config.s3_bucket_name:
+    local = _uses_local_index(config)
+    if not local and (not config or not config.s3_bucket_name):
         raise HTTPException(status_code=400, detail="S3 Bucket Name not configured")
+    # Starlette has already spooled the files to disk; refuse before sending any on
+    try:
+        for file in files:
+            documents.check_size(file.filename, file.size)
+    except documents.DocumentTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
         
     service = S3Service(db)
     uploaded_files = []
+    indexed = {}
     try:
+        if not local and config.preprocess_uploads:
+            uploaded = await _preprocess_and_upload(service, files, config.s3_bucket_name)
+            return {
+                "message": f"Successfully uploaded {len(uploaded)} files",
+                "files": list(uploaded),
+                "uploaded_keys": uploaded,
+            }
         for file in files:
-            service.upload_file(file.file, file.filename, config.s3_bucket_name)
+            if local:
+                from backend.services import local_index
+                indexed[file.filename] = await run_in_threadpool(local_index.store_document, file.filename, file.file)
+                file.file.seek(0)
+                if config.s3_bucket_name:
+                    # Keep the bucket in step for switching back, but don't require it
+                    try:
+                        service.upload_file(file.file, file.filename, config.s3_bucket_name)
+                    except Exception as e:
+                        print(f"Failed to copy {file.filename} to S3: {e}")
+            else:
+                service.upload_file(file.file, file.filename, config.s3_bucket_name)
             uploaded_files.append(file.filename)
             
-        return {"message": f"Successfully uploaded {len(uploaded_files)} files", "files": uploaded_files}
+        response = {"message": f"Successfully uploaded {len(uploaded_files)} files", "files": uploaded_files}
+        if local:
+            response["indexed_chunks"] = indexed
+        return response
+    except documents.DocumentTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -204,6 +398,9 @@ async def upload_files(
 @router.get("/files")
 async def list_files(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     config = db.query(Config).first()
+    if _uses_local_index(config):
+        from backend.services import local_index
+        return {"files": await run_in_threadpool(local_index.list_documents)}
     if not config or not config.s3_bucket_name:
         raise HTTPException(status_code=400, detail="S3 Bucket Name not configured")
     
@@ -218,6 +415,18 @@ async def list_files(db: Session = Depends(get_db), current_user: User = Depends
 @router.delete("/files/{file_key:path}")
 async def delete_file(file_key: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     config = db.query(Config).first()
+    if _uses_local_index(config):
+        from backend.services import local_index
+        try:
+            await run_in_threadpool(local_index.delete_document, file_key)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if config.s3_bucket_name:
+            try:
+                S3Service(db).delete_file(config.s3_bucket_name, file_key)
+            except Exception as e:
+                print(f"Failed to delete {file_key} from S3: {e}")
+        return {"message": f"File {file_key} deleted successfully"}
     if not config or not config.s3_bucket_name:
         raise HTTPException(status_code=400, detail="S3 Bucket Name not configured")
     
@@ -229,22 +438,229 @@ async def delete_file(file_key: str, db: Session = Depends(get_db), current_user
         raise HTTPException(status_code=500, detail=str(e))
 
 
+INGESTION_POLL_INTERVAL = 10
+INGESTION_POLL_TIMEOUT = 2 * 60 * 60
+INGESTION_TERMINAL_STATUSES = ("COMPLETE", "FAILED", "STOPPED")
+
+# Keeps references to running watcher tasks so they aren't garbage collected
+_ingestion_watchers = set()
+
+
+def _record_ingestion_status(db: Session, job: dict):
+    """Bump the knowledge base version once per completed ingestion job"""
+    if job.get("status") != "COMPLETE":
+        return
+    config = db.query(Config).first()
+    if config and config.last_ingestion_job_id != job["ingestionJobId"]:
+        config.kb_version = (config.kb_version or 0) + 1
+        config.last_ingestion_job_id = job["ingestionJobId"]
+        db.commit()
+        retrieval_cache.clear()
+        print(f"[SYNC] Ingestion job {job['ingestionJobId']} complete, knowledge base version {config.kb_version}")
+
+
+async def _watch_ingestion_job(job_id: str):
+    deadline = time.monotonic() + INGESTION_POLL_TIMEOUT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(INGESTION_POLL_INTERVAL)
+        db = SessionLocal()
+        try:
+            job = await run_in_threadpool(S3Service(db).get_ingestion_job, job_id)
+            if job["status"] in INGESTION_TERMINAL_STATUSES:
+                _record_ingestion_status(db, job)
+                return
+        except Exception as e:
+            print(f"[SYNC] Stopped watching ingestion job {job_id}: {e}")
+            return
+        finally:
+            db.close()
+
+
 @router.post("/sync")
 async def sync_kb(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    if _uses_local_index(db.query(Config).first()):
+        # Uploads are indexed as they arrive; a sync re-reads every stored document
+        from backend.services import local_index
+        stats = await run_in_threadpool(local_index.rebuild)
+        return {"message": "Local index rebuilt", "job": None, "index": stats}
+    
     service = S3Service(db)
     try:
         job = service.start_ingestion_job()
-        return {"message": "Sync started", "job": job}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    watcher = asyncio.create_task(_watch_ingestion_job(job["ingestionJobId"]))
+    _ingestion_watchers.add(watcher)
+    watcher.add_done_callback(_ingestion_watchers.discard)
+    return {"message": "Sync started", "job": job}
+
+
+@router.get("/sync/{job_id}")
+async def get_sync_status(job_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    service = S3Service(db)
+    try:
+        job = service.get_ingestion_job(job_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    _record_ingestion_status(db, job)
+    return {"job": job}
+
+
+@router.get("/local-index")
+async def get_local_index_stats(current_user: User = Depends(get_current_user)):
+    from backend.services import local_index
+    return await run_in_threadpool(local_index.local_index.stats)
+
+
+@router.get("/sessions")
+async def get_session_stats(current_user: User = Depends(get_current_user)):
+    return session_store.stats()
+
+
+@router.get("/metrics")
+async def get_metrics(current_user: User = Depends(get_current_user)):
+    return {
+        "counters": metrics.snapshot(),
+        "bedrock_admission": bedrock_admission.stats(),
+        "retrieval_cache": retrieval_cache.stats(),
+        "transcripts": transcript_logger.stats(),
+    }
+
+
+@router.get("/usage")
+async def get_usage(
+    days: int = Query(30, ge=1, le=366),
+    top_sessions: int = Query(20, ge=0, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Token use and estimated cost per day and model, plus the heaviest sessions"""
+    # Include this worker's unflushed counts; other workers' land within USAGE_FLUSH_INTERVAL
+    await usage.usage_tracker.flush()
+    since = (date.fromisoformat(usage.today()) - timedelta(days=days - 1)).isoformat()
+    rows = db.query(TokenUsageDaily).filter(TokenUsageDaily.day >= since).order_by(
+        TokenUsageDaily.day.desc(), TokenUsageDaily.model
+    ).all()
+
+    daily, models = [], {}
+    for r in rows:
+        daily.append({
+            "day": r.day,
+            "model": r.model,
+            "requests": r.requests,
+            "input_tokens": r.input_tokens,
+            "output_tokens": r.output_tokens,
+            "estimated_requests": r.estimated_requests,
+            "cost_usd": usage.cost(r.model, r.input_tokens, r.output_tokens),
+        })
+        totals = models.setdefault(r.model, {"model": r.model, "requests": 0, "input_tokens": 0, "output_tokens": 0})
+        for field in usage.COUNTERS:
+            totals[field] += getattr(r, field)
+    for totals in models.values():
+        totals["cost_usd"] = usage.cost(totals["model"], totals["input_tokens"], totals["output_tokens"])
+
+    tokens = TokenUsageSession.input_tokens + TokenUsageSession.output_tokens
+    sessions = db.query(TokenUsageSession).order_by(tokens.desc()).limit(top_sessions).all()
+
+    config = db.query(Config).first()
+    budget = config.daily_token_budget if config else None
+    used = usage.usage_tracker.tokens_today()
+    return {
+        "today": {
+            "day": usage.today(),
+            "tokens": used,
+            "budget": budget,
+            "remaining": max(budget - used, 0) if budget else None,
+        },
+        "models": list(models.values()),
+        "daily": daily,
+        "sessions": [
+            {
+                "session_id": s.session_id,
+                "model": s.model,
+                "requests": s.requests,
+                "input_tokens": s.input_tokens,
+                "output_tokens": s.output_tokens,
+                "cost_usd": usage.cost(s.model or "", s.input_tokens, s.output_tokens),
+            }
+            for s in sessions
+        ],
+    }
+
+
+TRANSCRIPTS_PAGE_SIZE = 100
+
+
+@router.get("/transcripts")
+async def get_transcripts(
+    cursor: Optional[int] = None,
+    limit: int = Query(TRANSCRIPTS_PAGE_SIZE, ge=1, le=1000),
+    session_id: Optional[str] = None,
+    q: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Newest chat turns first. Pass the returned next_cursor to fetch the following page."""
+    query = db.query(ChatTranscript)
+    if session_id:
+        query = query.filter(ChatTranscript.session_id == session_id)
+    if q:
+        query = query.filter(ChatTranscript.question.contains(q))
+    if cursor is not None:
+        query = query.filter(ChatTranscript.id < cursor)
+    rows = query.order_by(ChatTranscript.id.desc()).limit(limit + 1).all()
+
+    items = rows[:limit]
+    return {
+        "items": [
+            {
+                "id": r.id,
+                "created_at": r.created_at.isoformat(),
+                "session_id": r.session_id,
+                "question": r.question,
+                "answer": r.answer,
+                "sources": json.loads(r.sources or "[]"),
+                "latency_ms": r.latency_ms,
+                "cache_hit": bool(r.cache_hit),
+            }
+            for r in items
+        ],
+        "next_cursor": items[-1].id if len(rows) > limit else None,
+    }
+
 
 @router.post("/reset")
 async def reset_app(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     db.query(Config).delete()
     db.query(ExamQuestion).delete()
+    db.query(ExamAnswer).delete()
+    db.query(ExamQuestionStats).delete()
+    db.query(ExamSession).delete()
     db.query(ExamResult).delete()
     db.query(ExamConfig).delete()
+    db.query(ChatTranscript).delete()
+    db.query(TokenUsageDaily).delete()
+    db.query(TokenUsageSession).delete()
+    db.query(PinnedAnswerStats).delete()
+    db.query(PinnedAnswer).delete()
     db.query(User).delete()
+    question_cache.changed(db)
+    pinned_answers.changed(db)
     db.commit()
+    widget_bootstrap.invalidate()
+    question_cache.invalidate()
+    rate_limit.invalidate()
+    pinned_answers.invalidate()
+    # In-process state derived from what was just deleted
+    pinned_answers.discard_hits()
+    transcript_logger.discard()
+    usage.usage_tracker.reset()
+    retrieval_cache.clear()
+    citation_cache.clear()
+    session_store.clear()
+    aws_clients.clear()
+    from backend.services import local_index
+    await run_in_threadpool(local_index.reset)
     return {"message": "Application reset successfully"}
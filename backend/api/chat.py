@@ -1,18 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Optional, List
+import asyncio
+import math
+import os
+import threading
+import time
 import uuid
-from backend.database import get_db
-from backend.services.bedrock_service import BedrockService
+from backend.database import get_db, SessionLocal
+from backend.services.bedrock_service import BedrockService, Cancelled, normalize_text
+from backend.services.session_store import session_store, ChatSession
+from backend.services.single_flight import SingleFlight
+from backend.services.admission import bedrock_admission, Overloaded
+from backend.services.disconnect import unless_disconnected, ClientDisconnected
+from backend.services.citations import citation_cache, compact_citations
+from backend.services import metrics
+from backend.services.transcripts import transcript_logger
+from backend.services.usage import usage_tracker, BudgetExceeded
+from backend.services import rate_limit as rate_limits
+from backend.services.rate_limit import rate_limit
+from backend.services.pinned_answers import pinned_answers
 from backend.models.config import Config
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+# Pings keep proxies from timing out quiet sockets; silent clients are dropped
+CHAT_WS_HEARTBEAT_INTERVAL = float(os.getenv("CHAT_WS_HEARTBEAT_INTERVAL", "20"))
+CHAT_WS_IDLE_TIMEOUT = float(os.getenv("CHAT_WS_IDLE_TIMEOUT", "60"))
+
 
 class ChatRequest(BaseModel):
     message: str
     session_id: Optional[str] = None
+    # Return Bedrock's full citation objects instead of the compact form
+    full_citations: bool = False
 
 
 class Citation(BaseModel):
@@ -24,26 +46,342 @@ class ChatResponse(BaseModel):
     response: str
     session_id: str
     citations: Optional[List[dict]] = None
+    response_id: Optional[str] = None
 
 
-@router.post("/", response_model=ChatResponse)
-async def chat(request: ChatRequest, db: Session = Depends(get_db)):
-    service = BedrockService(db)
+chat_flight = SingleFlight()
+
+
+def _pinned_reply(db: Session, session_id: str, session: ChatSession, message: str, started: float):
+    """The pinned answer for ``message``, recorded as the session's next turn, if there is one"""
+    pinned = pinned_answers.match(db, message)
+    if not pinned:
+        return None
+    answer = pinned[1]
+    session.add_turn(message, answer)
+    session_store.save(session_id, session)
+    transcript_logger.log(session_id, message, answer, [], time.perf_counter() - started, True)
+    return answer
+
+
+async def _generate(service: BedrockService, message: str, session_id: str = None, history=None, on_text=None):
+    """``service.chat`` behind admission control, abandoned if this coroutine is cancelled.
+
+    The answer is always streamed from Bedrock, so a cancelled call stops
+    generating (and spending tokens) instead of running to completion.
+    """
+    cancel = threading.Event()
+    # Text already sent to the client can't be taken back, so a retry would repeat it
+    streamed = threading.Event()
+
+    def forward(text: str):
+        streamed.set()
+        on_text(text)
+
+    call = asyncio.ensure_future(bedrock_admission.call(
+        service.chat, message, session_id, history,
+        committed=streamed.is_set, on_text=forward if on_text else _discard, cancel=cancel,
+    ))
+    try:
+        # Awaiting a worker thread defers cancellation until the thread returns;
+        # the shield lets the stream be told to stop right away instead
+        return await asyncio.shield(call)
+    except asyncio.CancelledError:
+        cancel.set()
+        call.cancel()
+        call.add_done_callback(_consume)
+        raise
+
+
+def _discard(text: str):
+    pass
+
+
+def _consume(task: asyncio.Task):
+    if not task.cancelled():
+        task.exception()
+
+
+def _complete_turn(session_id: str, session: ChatSession, message: str, result, started: float, cache_hit: bool):
+    """Save a generated answer to the session, citation cache and transcript log; returns its response id"""
+    session.add_turn(message, result["response"])
+    session_store.save(session_id, session)
+
+    # Full chunk content stays server-side until a client asks for it
+    response_id = uuid.uuid4().hex
+    citation_cache.set(response_id, result["citations"])
+    transcript_logger.log(
+        session_id, message, result["response"], result["citations"],
+        time.perf_counter() - started, cache_hit,
+    )
+    return response_id
+
+
+@router.post("/", response_model=ChatResponse, dependencies=[Depends(rate_limit("chat"))])
+async def chat(request: ChatRequest, http_request: Request, db: Session = Depends(get_db)):
     session_id = request.session_id or str(uuid.uuid4())
+    # Unknown or expired ids simply start a fresh Bedrock session under the same id
+    session = session_store.get(session_id) if request.session_id else None
+    if session is None:
+        session = ChatSession()
+    metrics.incr("chat_requests")
+    started = time.perf_counter()
+    
+    # Approved answers to common questions skip retrieval and generation entirely
+    answer = _pinned_reply(db, session_id, session, request.message, started)
+    if answer is not None:
+        return ChatResponse(response=answer, session_id=session_id, citations=[])
+    
+    service = BedrockService(db)
     
     try:
-        result = service.chat(request.message, request.session_id)
+        usage_tracker.apply_budget(service)
+        if request.session_id:
+            result = await unless_disconnected(
+                http_request,
+                _generate(service, request.message, session.bedrock_session_id, session.history),
+                "chat_cancelled",
+            )
+            shared = False
+        else:
+            # First messages carry no conversation state, so identical ones can share one call;
+            # it is only abandoned once every client waiting on it has gone
+            key = (normalize_text(request.message), service.config_version())
+            result, shared = await unless_disconnected(
+                http_request,
+                chat_flight.do(key, lambda: _generate(service, request.message)),
+                "chat_cancelled",
+            )
+        
+        if shared:
+            # The Bedrock session belongs to the leading request; followers start their own next turn
+            metrics.incr("chat_coalesced")
+        else:
+            session.bedrock_session_id = result["sessionId"]
+            usage_tracker.record(session_id, result.get("usage"))
+        response_id = _complete_turn(
+            session_id, session, request.message, result, started, shared or service.retrieval_cache_hit
+        )
         
         return ChatResponse(
             response=result["response"],
-            session_id=result["sessionId"],
-            citations=result["citations"]
+            session_id=session_id,
+            citations=result["citations"] if request.full_citations else compact_citations(result["citations"]),
+            response_id=response_id,
+        )
+    except ClientDisconnected:
+        # Nobody reads this; 499 is how nginx logs a client that went away
+        return Response(status_code=499)
+    except BudgetExceeded as e:
+        print(f"[CHAT] Rejected chat request: {str(e)}")
+        raise HTTPException(
+            status_code=429,
+            detail="The assistant has reached its daily usage limit. Please try again tomorrow.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except Overloaded as e:
+        print(f"[CHAT] Rejected chat request: {str(e)}")
+        raise HTTPException(
+            status_code=429,
+            detail="The assistant is busy right now. Please try again shortly.",
+            headers={"Retry-After": str(e.retry_after)},
         )
     except Exception as e:
         print(f"[CHAT] Error in chat endpoint: {str(e)}")
         import traceback
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
+        # Let the app-level handler decide how much of the error to expose
+        raise
+
+
+class ChatSocket:
+    """One widget's chat over a WebSocket.
+
+    Client frames:
+      {"type": "message", "id": "<turn id>", "message": "...", "full_citations": false}
+      {"type": "cancel", "id": "<turn id>"}
+      {"type": "pong"}  (any frame counts as a sign of life)
+
+    Server frames, all but "ready" and "ping" tagged with the turn id:
+      {"type": "ready", "session_id": "..."}
+      {"type": "delta", "id": ..., "text": "..."}  (parts of the answer as it is written)
+      {"type": "done", "id": ..., "response": "...", "citations": [...], "response_id": "..."}
+      {"type": "cancelled", "id": ...}
+      {"type": "error", "id": ..., "status": 429, "detail": "...", "retry_after": 5}
+      {"type": "ping"}
+
+    One turn runs at a time: a new message cancels the one in flight, which
+    stops reading Bedrock's stream and frees its admission slot. "done"
+    carries the whole answer, which replaces the streamed parts.
+    """
+
+    def __init__(self, websocket: WebSocket, session_id: str):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.loop = asyncio.get_running_loop()
+        # Frames are written by a single task so sends never interleave
+        self.outbox = asyncio.Queue()
+        self.turn_id = None
+        self.turn = None
+
+    def send(self, frame: dict):
+        self.outbox.put_nowait(frame)
+
+    def send_threadsafe(self, frame: dict):
+        self.loop.call_soon_threadsafe(self.outbox.put_nowait, frame)
+
+    def send_error(self, turn_id, status: int, detail: str, retry_after: int = None):
+        self.send({"type": "error", "id": turn_id, "status": status, "detail": detail, "retry_after": retry_after})
+
+    async def _write(self):
+        while True:
+            frame = await self.outbox.get()
+            try:
+                await self.websocket.send_json(frame)
+            except Exception:
+                # The client is gone; the receive loop notices and cleans up
+                return
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(CHAT_WS_HEARTBEAT_INTERVAL)
+            self.send({"type": "ping"})
+
+    def cancel_turn(self):
+        if self.turn is not None:
+            self.turn.cancel()
+            self.turn, self.turn_id = None, None
+
+    def start_turn(self, frame: dict):
+        message = frame.get("message")
+        turn_id = frame.get("id") or uuid.uuid4().hex
+        if not isinstance(message, str) or not message.strip():
+            self.send_error(turn_id, 400, "Message must not be empty")
+            return
+
+        current = rate_limits.settings()
+        wait = rate_limits.wait_time(
+            "chat", rate_limits.connection_key(self.websocket, current["key"], self.session_id)
+        )
+        if wait:
+            self.send_error(turn_id, 429, "Too many requests. Please slow down.", max(1, math.ceil(wait)))
+            return
+
+        self.cancel_turn()
+        self.turn_id = turn_id
+        self.turn = asyncio.create_task(self._run_turn(turn_id, message, bool(frame.get("full_citations"))))
+
+    async def _run_turn(self, turn_id, message: str, full_citations: bool):
+        session = session_store.get(self.session_id) or ChatSession()
+        metrics.incr("chat_requests")
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            answer = _pinned_reply(db, self.session_id, session, message, started)
+            if answer is not None:
+                self.send({"type": "done", "id": turn_id, "response": answer, "citations": [], "response_id": None})
+                return
+
+            service = BedrockService(db)
+            usage_tracker.apply_budget(service)
+            result = await _generate(
+                service, message, session.bedrock_session_id, session.history,
+                on_text=lambda text: self.send_threadsafe({"type": "delta", "id": turn_id, "text": text}),
+            )
+            session.bedrock_session_id = result["sessionId"]
+            usage_tracker.record(self.session_id, result.get("usage"))
+            response_id = _complete_turn(
+                self.session_id, session, message, result, started, service.retrieval_cache_hit
+            )
+            self.send({
+                "type": "done",
+                "id": turn_id,
+                "response": result["response"],
+                "citations": result["citations"] if full_citations else compact_citations(result["citations"]),
+                "response_id": response_id,
+            })
+        except (asyncio.CancelledError, Cancelled):
+            # Replaced by a newer message, cancelled by the client, or the socket closed
+            metrics.incr("chat_cancelled")
+            self.send({"type": "cancelled", "id": turn_id})
+        except BudgetExceeded as e:
+            print(f"[CHAT] Rejected chat message: {str(e)}")
+            self.send_error(
+                turn_id, 429, "The assistant has reached its daily usage limit. Please try again tomorrow.", e.retry_after
+            )
+        except Overloaded as e:
+            print(f"[CHAT] Rejected chat message: {str(e)}")
+            self.send_error(turn_id, 429, "The assistant is busy right now. Please try again shortly.", e.retry_after)
+        except Exception as e:
+            print(f"[CHAT] Error in chat socket: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            self.send_error(turn_id, 500, "Something went wrong. Please try again later.")
+        finally:
+            db.close()
+            # Clients may reuse ids, so only a turn that is still current clears itself
+            if self.turn is asyncio.current_task():
+                self.turn, self.turn_id = None, None
+
+    async def serve(self):
+        tasks = [asyncio.create_task(self._write()), asyncio.create_task(self._heartbeat())]
+        self.send({"type": "ready", "session_id": self.session_id})
+        try:
+            while True:
+                try:
+                    frame = await asyncio.wait_for(self.websocket.receive_json(), CHAT_WS_IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    metrics.incr("chat_ws_idle_closed")
+                    await self.websocket.close(code=1001)
+                    return
+                except ValueError:
+                    self.send_error(None, 400, "Frames must be JSON objects")
+                    continue
+                if not isinstance(frame, dict):
+                    self.send_error(None, 400, "Frames must be JSON objects")
+                    continue
+                kind = frame.get("type")
+                if kind == "message":
+                    self.start_turn(frame)
+                elif kind == "cancel":
+                    if frame.get("id") is None or frame.get("id") == self.turn_id:
+                        self.cancel_turn()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            # Nobody is left to read the answer
+            self.cancel_turn()
+            for task in tasks:
+                task.cancel()
+
+
+@router.websocket("/ws")
+async def chat_socket(websocket: WebSocket, session_id: Optional[str] = None):
+    await websocket.accept()
+    metrics.incr("chat_ws_connections")
+    await ChatSocket(websocket, session_id or str(uuid.uuid4())).serve()
+
+
+@router.get("/citations/{response_id}")
+async def get_citation_detail(
+    response_id: str,
+    citation: Optional[int] = Query(None, ge=0),
+    reference: Optional[int] = Query(None, ge=0),
+):
+    citations = citation_cache.get(response_id)
+    if citations is None:
+        raise HTTPException(status_code=404, detail="Citations expired or not found")
+    
+    if citation is None:
+        return {"response_id": response_id, "citations": citations}
+    
+    try:
+        selected = citations[citation]
+        if reference is not None:
+            return selected["retrievedReferences"][reference]
+        return selected
+    except (IndexError, KeyError):
+        raise HTTPException(status_code=404, detail="Citation not found")
 
 
 class GreetingResponse(BaseModel):
@@ -51,8 +389,7 @@ class GreetingResponse(BaseModel):
     template: str
 
 
-@router.get("/greeting", response_model=GreetingResponse)
-async def get_greeting(db: Session = Depends(get_db)):
+def build_greeting(db: Session) -> GreetingResponse:
     config = db.query(Config).first()
     default_message = "Hello! How can I help you today?"
     
@@ -65,3 +402,8 @@ async def get_greeting(db: Session = Depends(get_db)):
     greeting_message = config.greeting_message or default_message
     
     return GreetingResponse(message=greeting_message, template=greeting_message)
+
+
+@router.get("/greeting", response_model=GreetingResponse)
+async def get_greeting(db: Session = Depends(get_db)):
+    return build_greeting(db)
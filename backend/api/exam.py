@@ -1,16 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request, Response, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import Integer, String, and_, case, cast, func, insert, literal, or_, update
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional, List
-import random
-import httpx
-import uuid
-import base64
+from datetime import date, datetime, timedelta
+import csv
+import io
 import os
-from backend.database import get_db
-from backend.models.exam import ExamQuestion, ExamResult, ExamConfig
+import orjson
+import uuid
+from backend.database import get_db, SessionLocal
+from backend.responses import ORJSONResponse
+from backend.models.exam import ExamQuestion, ExamResult, ExamConfig, ExamQuestionStats, ExamSession
 from backend.models.user import User
+from backend.models.config import Config
 from backend.auth_utils import get_current_user
+from backend.services import widget_bootstrap
+from backend.services.exam_cache import question_cache
+from backend.services.http_cache import accepts_encoding, is_not_modified
+from backend.services.s3_service import S3Service
+from backend.services import image_service
+from backend.services import exam_stats
+from backend.services import question_import
+from backend.services import exam_sessions
+from backend.services.rate_limit import rate_limit
 
 router = APIRouter(prefix="/exam", tags=["exam"])
 
@@ -26,6 +41,7 @@ class ExamQuestionCreate(BaseModel):
     explanation: Optional[str] = None
     order_index: Optional[int] = 0
     is_active: Optional[bool] = True
+    category: Optional[str] = None
 
 
 class ExamQuestionUpdate(BaseModel):
@@ -39,9 +55,12 @@ class ExamQuestionUpdate(BaseModel):
     explanation: Optional[str] = None
     order_index: Optional[int] = None
     is_active: Optional[bool] = None
+    category: Optional[str] = None
 
 
 class ExamQuestionResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     question_text: str
     question_image_url: Optional[str] = None
@@ -53,6 +72,7 @@ class ExamQuestionResponse(BaseModel):
     explanation: Optional[str] = None
     order_index: int
     is_active: bool
+    category: Optional[str] = None
 
 
 class ExamQuestionPublic(BaseModel):
@@ -71,14 +91,20 @@ class ExamConfigUpdate(BaseModel):
     exam_description: Optional[str] = None
     show_correct_answers: Optional[bool] = None
     shuffle_questions: Optional[bool] = None
+    questions_per_exam: Optional[int] = None
+    stratify_by_category: Optional[bool] = None
 
 
 class ExamConfigResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     passing_score: float
     exam_title: str
     exam_description: Optional[str] = None
     show_correct_answers: bool
     shuffle_questions: bool
+    questions_per_exam: int = 0
+    stratify_by_category: bool = False
 
 
 class AnswerSubmission(BaseModel):
@@ -86,6 +112,14 @@ class AnswerSubmission(BaseModel):
     selected_answer: str
 
 
+class CheckAnswerRequest(AnswerSubmission):
+    exam_session_id: Optional[str] = None
+
+
+class StartExamRequest(BaseModel):
+    external_user_id: Optional[str] = None
+
+
 class AnswerResult(BaseModel):
     is_correct: bool
     correct_answer: Optional[str] = None
@@ -98,6 +132,8 @@ class ExamSubmission(BaseModel):
     external_user_name: Optional[str] = None
     webhook_url: Optional[str] = None
     custom_data: Optional[dict] = None
+    # Set when the exam was started with /public/start; only its questions are graded
+    exam_session_id: Optional[str] = None
     answers: List[AnswerSubmission]
 
 
@@ -115,19 +151,16 @@ async def list_questions(
     current_user: User = Depends(get_current_user)
 ):
     questions = db.query(ExamQuestion).order_by(ExamQuestion.order_index).all()
-    return [ExamQuestionResponse(
-        id=q.id,
-        question_text=q.question_text,
-        question_image_url=q.question_image_url,
-        option_a=q.option_a,
-        option_b=q.option_b,
-        option_c=q.option_c,
-        option_d=q.option_d,
-        correct_answer=q.correct_answer,
-        explanation=q.explanation,
-        order_index=q.order_index,
-        is_active=q.is_active
-    ) for q in questions]
+    return [ExamQuestionResponse.model_validate(q) for q in questions]
+
+
+@router.get("/questions/stats")
+async def get_question_stats(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Per-question attempts, correct rate and answer distribution"""
+    return ORJSONResponse(exam_stats.question_stats(db))
 
 
 @router.post("/questions", response_model=ExamQuestionResponse)
@@ -146,25 +179,96 @@ async def create_question(
         correct_answer=question_data.correct_answer,
         explanation=question_data.explanation,
         order_index=question_data.order_index or 0,
-        is_active=question_data.is_active if question_data.is_active is not None else True
+        is_active=question_data.is_active if question_data.is_active is not None else True,
+        category=question_data.category or None
     )
     db.add(question)
+    question_cache.changed(db)
     db.commit()
     db.refresh(question)
+    question_cache.invalidate()
+    
+    return ExamQuestionResponse.model_validate(question)
+
+
+@router.post("/questions/import")
+async def import_questions(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Create many questions from a CSV, JSON or ZIP (questions file plus images) in one transaction"""
+    try:
+        rows, archive = await run_in_threadpool(question_import.read_rows, file.filename or "", file.file)
+    except question_import.QuestionImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (ValueError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse {file.filename}: {e}")
+    
+    questions, errors = question_import.validate_rows(rows, archive)
+    if errors:
+        # All or nothing: report every bad row so the file can be fixed in one pass
+        raise HTTPException(status_code=422, detail={"message": "No questions were imported", "errors": errors})
+    if not questions:
+        raise HTTPException(status_code=400, detail="The file contains no questions")
+    
+    images = {}
+    if archive is not None:
+        images = await run_in_threadpool(question_import.extract_images, questions, archive)
+        await _copy_images_to_s3(db, [name for files in images.values() for name in files.values()])
+    
+    next_index = (db.query(func.max(ExamQuestion.order_index)).scalar() or 0) + 1
+    values = []
+    for question in questions:
+        image_url = question.question_image_url
+        if question.image:
+            files = images[os.path.basename(question.image)]
+            image_url = image_service.image_url(files.get("display", files["original"]))
+        if question.order_index is None:
+            question.order_index = next_index
+            next_index += 1
+        values.append({
+            **question.model_dump(exclude={"image", "question_image_url", "is_active"}),
+            "question_image_url": image_url,
+            "is_active": True if question.is_active is None else question.is_active,
+        })
     
-    return ExamQuestionResponse(
-        id=question.id,
-        question_text=question.question_text,
-        question_image_url=question.question_image_url,
-        option_a=question.option_a,
-        option_b=question.option_b,
-        option_c=question.option_c,
-        option_d=question.option_d,
-        correct_answer=question.correct_answer,
-        explanation=question.explanation,
-        order_index=question.order_index,
-        is_active=question.is_active
+    db.execute(insert(ExamQuestion), values)
+    question_cache.changed(db)
+    db.commit()
+    question_cache.invalidate()
+    
+    return {"imported": len(values)}
+
+
+class QuestionReorder(BaseModel):
+    question_ids: List[int]
+
+
+@router.put("/questions/reorder")
+async def reorder_questions(
+    reorder: QuestionReorder,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Set order_index from the position of each id in the list, in a single UPDATE"""
+    if not reorder.question_ids:
+        return {"updated": 0}
+    if len(set(reorder.question_ids)) != len(reorder.question_ids):
+        raise HTTPException(status_code=400, detail="question_ids contains duplicates")
+    
+    positions = {question_id: index for index, question_id in enumerate(reorder.question_ids)}
+    result = db.execute(
+        update(ExamQuestion)
+        .where(ExamQuestion.id.in_(positions))
+        .values(order_index=case(positions, value=ExamQuestion.id))
+        .execution_options(synchronize_session=False)
     )
+    question_cache.changed(db)
+    db.commit()
+    question_cache.invalidate()
+    
+    return {"updated": result.rowcount}
 
 
 @router.put("/questions/{question_id}", response_model=ExamQuestionResponse)
@@ -191,6 +295,8 @@ async def update_question(
     if question_data.option_d is not None:
         question.option_d = question_data.option_d
     if question_data.correct_answer is not None:
+        if question_data.correct_answer.upper() != question.correct_answer.upper():
+            exam_stats.rebuild_question_stats(db, question_id, question_data.correct_answer)
         question.correct_answer = question_data.correct_answer
     if question_data.explanation is not None:
         question.explanation = question_data.explanation
@@ -198,23 +304,15 @@ async def update_question(
         question.order_index = question_data.order_index
     if question_data.is_active is not None:
         question.is_active = question_data.is_active
+    if question_data.category is not None:
+        question.category = question_data.category or None
     
+    question_cache.changed(db)
     db.commit()
     db.refresh(question)
+    question_cache.invalidate()
     
-    return ExamQuestionResponse(
-        id=question.id,
-        question_text=question.question_text,
-        question_image_url=question.question_image_url,
-        option_a=question.option_a,
-        option_b=question.option_b,
-        option_c=question.option_c,
-        option_d=question.option_d,
-        correct_answer=question.correct_answer,
-        explanation=question.explanation,
-        order_index=question.order_index,
-        is_active=question.is_active
-    )
+    return ExamQuestionResponse.model_validate(question)
 
 
 @router.delete("/questions/{question_id}")
@@ -228,10 +326,29 @@ async def delete_question(
         raise HTTPException(status_code=404, detail="Question not found")
     
     db.delete(question)
+    db.query(ExamQuestionStats).filter(ExamQuestionStats.question_id == question_id).delete()
+    question_cache.changed(db)
     db.commit()
+    question_cache.invalidate()
     return {"message": "Question deleted successfully"}
 
 
+async def _copy_images_to_s3(db: Session, filenames):
+    app_config = db.query(Config).first()
+    if app_config and app_config.store_exam_images_in_s3 and app_config.s3_bucket_name:
+        service = S3Service(db)
+        try:
+            for filename in filenames:
+                await run_in_threadpool(
+                    service.upload_path,
+                    os.path.join(image_service.EXAM_IMAGE_DIR, filename),
+                    app_config.s3_bucket_name,
+                    image_service.EXAM_IMAGE_S3_PREFIX + filename,
+                )
+        except Exception as e:
+            print(f"Failed to copy exam image to S3: {e}")
+
+
 @router.post("/questions/{question_id}/upload-image")
 async def upload_question_image(
     question_id: int,
@@ -246,29 +363,53 @@ async def upload_question_image(
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
     
-    os.makedirs("/app/data/exam_images", exist_ok=True)
+    try:
+        tmp_path, digest = await image_service.save_upload(file)
+    except image_service.ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     
     file_ext = file.filename.split(".")[-1] if "." in file.filename else "png"
-    filename = f"{question_id}_{uuid.uuid4().hex[:8]}.{file_ext}"
-    file_path = f"/app/data/exam_images/{filename}"
+    files = await run_in_threadpool(image_service.store_image, tmp_path, digest, file_ext)
     
-    content = await file.read()
-    with open(file_path, "wb") as f:
-        f.write(content)
+    await _copy_images_to_s3(db, files.values())
     
-    question.question_image_url = f"/api/exam/images/{filename}"
+    question.question_image_url = image_service.image_url(files.get("display", files["original"]))
+    question_cache.changed(db)
     db.commit()
+    question_cache.invalidate()
     
-    return {"image_url": question.question_image_url}
+    return {
+        "image_url": question.question_image_url,
+        "variants": {name: image_service.image_url(filename) for name, filename in files.items()},
+    }
 
 
 @router.get("/images/{filename}")
-async def get_question_image(filename: str):
-    from fastapi.responses import FileResponse
-    file_path = f"/app/data/exam_images/{filename}"
-    if not os.path.exists(file_path):
+async def get_question_image(filename: str, db: Session = Depends(get_db)):
+    if os.path.basename(filename) != filename or filename.startswith("."):
         raise HTTPException(status_code=404, detail="Image not found")
-    return FileResponse(file_path)
+    file_path = os.path.join(image_service.EXAM_IMAGE_DIR, filename)
+    
+    if not os.path.exists(file_path):
+        # Containers without the data volume can fall back to the S3 copy
+        app_config = db.query(Config).first()
+        if not (app_config and app_config.store_exam_images_in_s3 and app_config.s3_bucket_name):
+            raise HTTPException(status_code=404, detail="Image not found")
+        try:
+            await run_in_threadpool(
+                S3Service(db).download_path,
+                app_config.s3_bucket_name,
+                image_service.EXAM_IMAGE_S3_PREFIX + filename,
+                file_path,
+            )
+        except Exception:
+            raise HTTPException(status_code=404, detail="Image not found")
+    
+    if image_service.is_hashed_name(filename):
+        cache_control = "public, max-age=31536000, immutable"
+    else:
+        cache_control = "public, max-age=3600"
+    return FileResponse(file_path, headers={"Cache-Control": cache_control})
 
 
 @router.get("/config", response_model=ExamConfigResponse)
@@ -283,13 +424,7 @@ async def get_exam_config(
         db.commit()
         db.refresh(config)
     
-    return ExamConfigResponse(
-        passing_score=config.passing_score,
-        exam_title=config.exam_title,
-        exam_description=config.exam_description,
-        show_correct_answers=config.show_correct_answers,
-        shuffle_questions=config.shuffle_questions
-    )
+    return ExamConfigResponse.model_validate(config)
 
 
 @router.post("/config", response_model=ExamConfigResponse)
@@ -313,21 +448,23 @@ async def update_exam_config(
         config.show_correct_answers = config_data.show_correct_answers
     if config_data.shuffle_questions is not None:
         config.shuffle_questions = config_data.shuffle_questions
+    if config_data.questions_per_exam is not None:
+        if config_data.questions_per_exam < 0:
+            raise HTTPException(status_code=400, detail="questions_per_exam cannot be negative")
+        config.questions_per_exam = config_data.questions_per_exam
+    if config_data.stratify_by_category is not None:
+        config.stratify_by_category = config_data.stratify_by_category
     
+    question_cache.changed(db)
     db.commit()
     db.refresh(config)
+    widget_bootstrap.invalidate()
+    question_cache.invalidate()
     
-    return ExamConfigResponse(
-        passing_score=config.passing_score,
-        exam_title=config.exam_title,
-        exam_description=config.exam_description,
-        show_correct_answers=config.show_correct_answers,
-        shuffle_questions=config.shuffle_questions
-    )
+    return ExamConfigResponse.model_validate(config)
 
 
-@router.get("/public/config")
-async def get_public_exam_config(db: Session = Depends(get_db)):
+def build_public_exam_config(db: Session):
     config = db.query(ExamConfig).first()
     if not config:
         return {
@@ -340,49 +477,105 @@ async def get_public_exam_config(db: Session = Depends(get_db)):
     }
 
 
-@router.get("/public/questions", response_model=List[ExamQuestionPublic])
-async def get_public_questions(db: Session = Depends(get_db)):
-    config = db.query(ExamConfig).first()
-    questions = db.query(ExamQuestion).filter(
-        ExamQuestion.is_active == True
-    ).order_by(ExamQuestion.order_index).all()
+@router.get("/public/config", dependencies=[Depends(rate_limit("exam"))])
+async def get_public_exam_config(db: Session = Depends(get_db)):
+    return build_public_exam_config(db)
+
+
+@router.get("/public/questions", response_model=List[ExamQuestionPublic], dependencies=[Depends(rate_limit("exam"))])
+async def get_public_questions(request: Request, db: Session = Depends(get_db)):
+    snapshot = question_cache.get(db)
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if snapshot.last_modified:
+        headers["Last-Modified"] = snapshot.last_modified
+    
+    if is_not_modified(request, snapshot.etag, snapshot.last_modified):
+        return Response(status_code=304, headers=headers)
     
-    result = [ExamQuestionPublic(
-        id=q.id,
-        question_text=q.question_text,
-        question_image_url=q.question_image_url,
-        option_a=q.option_a,
-        option_b=q.option_b,
-        option_c=q.option_c,
-        option_d=q.option_d
-    ) for q in questions]
+    if not snapshot.shuffle and accepts_encoding(request.headers.get("accept-encoding"), "gzip"):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=snapshot.gzipped, media_type="application/json", headers=headers)
+    return Response(content=snapshot.render(), media_type="application/json", headers=headers)
+
+
+def _grading_map(db: Session, question_ids):
+    """question id -> (correct answer, explanation), from the cached snapshot where possible"""
+    grading = question_cache.get(db).grading
+    found = {i: grading[i] for i in question_ids if i in grading}
+    missing = set(question_ids) - found.keys()
+    if missing:
+        # Questions deactivated since the exam started aren't in the snapshot
+        for q in db.query(ExamQuestion).filter(ExamQuestion.id.in_(missing)):
+            found[q.id] = (q.correct_answer.upper(), q.explanation)
+    return found
+
+
+def _load_exam_session(db: Session, exam_session_id: str) -> ExamSession:
+    exam_session = db.query(ExamSession).filter(ExamSession.id == exam_session_id).first()
+    if not exam_session:
+        raise HTTPException(status_code=404, detail="Exam session not found")
+    if exam_sessions.is_expired(exam_session):
+        raise HTTPException(status_code=410, detail="Exam session expired")
+    return exam_session
+
+
+@router.post("/public/start", dependencies=[Depends(rate_limit("exam"))])
+async def start_exam(request: StartExamRequest, db: Session = Depends(get_db)):
+    """Draw this attempt's questions and remember them for grading"""
+    snapshot = question_cache.get(db)
+    config = db.query(ExamConfig).first()
+    question_ids = exam_sessions.draw_questions(
+        snapshot,
+        count=(config.questions_per_exam or 0) if config else 0,
+        stratify=bool(config and config.stratify_by_category),
+        shuffle=bool(config and config.shuffle_questions),
+    )
+    if not question_ids:
+        raise HTTPException(status_code=404, detail="No exam questions available")
     
-    if config and config.shuffle_questions:
-        random.shuffle(result)
+    exam_session = ExamSession(
+        id=uuid.uuid4().hex,
+        question_ids=exam_sessions.encode_ids(question_ids),
+        external_user_id=request.external_user_id,
+    )
+    exam_sessions.purge_expired(db)
+    db.add(exam_session)
+    db.commit()
     
-    return result
+    body = b'{"exam_session_id":"' + exam_session.id.encode() + b'","questions":' + snapshot.render_ids(question_ids) + b"}"
+    return Response(content=body, media_type="application/json", headers={"Cache-Control": "no-store"})
 
 
-@router.post("/public/check-answer", response_model=AnswerResult)
+@router.post("/public/check-answer", response_model=AnswerResult, dependencies=[Depends(rate_limit("exam"))])
 async def check_answer(
-    submission: AnswerSubmission,
+    submission: CheckAnswerRequest,
     db: Session = Depends(get_db)
 ):
-    question = db.query(ExamQuestion).filter(ExamQuestion.id == submission.question_id).first()
-    if not question:
+    if submission.exam_session_id:
+        exam_session = _load_exam_session(db, submission.exam_session_id)
+        if submission.question_id not in exam_sessions.decode_ids(exam_session.question_ids):
+            raise HTTPException(status_code=404, detail="Question not found")
+        grading = _grading_map(db, [submission.question_id])
+    elif exam_sessions.EXAM_ALLOW_SESSIONLESS_SUBMIT:
+        grading = question_cache.get(db).grading
+    else:
+        raise HTTPException(status_code=400, detail="exam_session_id is required; start the exam first")
+    
+    if submission.question_id not in grading:
         raise HTTPException(status_code=404, detail="Question not found")
+    correct_answer, explanation = grading[submission.question_id]
     
     config = db.query(ExamConfig).first()
-    is_correct = question.correct_answer.upper() == submission.selected_answer.upper()
+    is_correct = correct_answer == submission.selected_answer.upper()
     
     return AnswerResult(
         is_correct=is_correct,
-        correct_answer=question.correct_answer if (config and config.show_correct_answers) else None,
-        explanation=question.explanation if (config and config.show_correct_answers) else None
+        correct_answer=correct_answer if (config and config.show_correct_answers) else None,
+        explanation=explanation if (config and config.show_correct_answers) else None
     )
 
 
-@router.post("/public/submit", response_model=ExamResultResponse)
+@router.post("/public/submit", response_model=ExamResultResponse, dependencies=[Depends(rate_limit("exam"))])
 async def submit_exam(
     submission: ExamSubmission,
     db: Session = Depends(get_db)
@@ -394,24 +587,53 @@ async def submit_exam(
         db.commit()
         db.refresh(config)
     
+    answers = submission.answers
+    if submission.exam_session_id:
+        exam_session = _load_exam_session(db, submission.exam_session_id)
+        # Conditional update so two concurrent submissions can't both be graded
+        claimed = db.query(ExamSession).filter(
+            ExamSession.id == exam_session.id, ExamSession.submitted_at.is_(None)
+        ).update({ExamSession.submitted_at: func.now()}, synchronize_session=False)
+        if not claimed:
+            raise HTTPException(status_code=409, detail="Exam already submitted")
+        allowed = exam_sessions.decode_ids(exam_session.question_ids)
+        # Unanswered questions score zero
+        total_questions = len(allowed)
+    elif exam_sessions.EXAM_ALLOW_SESSIONLESS_SUBMIT:
+        # Older widgets send answers for the questions they showed, which can be any active ones
+        allowed = question_cache.get(db).ids
+        total_questions = len(answers)
+    else:
+        raise HTTPException(status_code=400, detail="exam_session_id is required; start the exam first")
+    
+    # Only the exam's questions count, each once
+    allowed_ids = set(allowed)
+    first_answers = {}
+    for answer in answers:
+        if answer.question_id in allowed_ids:
+            first_answers.setdefault(answer.question_id, answer)
+    answers = list(first_answers.values())
+    
     results = []
+    graded = []
     correct_count = 0
+    grading = _grading_map(db, {answer.question_id for answer in answers})
     
-    for answer in submission.answers:
-        question = db.query(ExamQuestion).filter(ExamQuestion.id == answer.question_id).first()
-        if question:
-            is_correct = question.correct_answer.upper() == answer.selected_answer.upper()
+    for answer in answers:
+        if answer.question_id in grading:
+            correct_answer, explanation = grading[answer.question_id]
+            is_correct = correct_answer == answer.selected_answer.upper()
             if is_correct:
                 correct_count += 1
+            graded.append((answer.question_id, answer.selected_answer.upper(), is_correct))
             results.append({
                 "question_id": answer.question_id,
                 "selected_answer": answer.selected_answer,
                 "is_correct": is_correct,
-                "correct_answer": question.correct_answer if config.show_correct_answers else None,
-                "explanation": question.explanation if config.show_correct_answers else None
+                "correct_answer": correct_answer if config.show_correct_answers else None,
+                "explanation": explanation if config.show_correct_answers else None
             })
     
-    total_questions = len(submission.answers)
     score_percentage = (correct_count / total_questions * 100) if total_questions > 0 else 0
     passed = score_percentage >= config.passing_score
     
@@ -426,6 +648,8 @@ async def submit_exam(
         webhook_url=submission.webhook_url
     )
     db.add(exam_result)
+    db.flush()
+    exam_stats.record_answers(db, exam_result.id, graded)
     db.commit()
     
     if submission.webhook_url:
@@ -442,6 +666,7 @@ async def submit_exam(
                 "passing_score": config.passing_score,
                 "custom_data": submission.custom_data
             }
+            import httpx
             async with httpx.AsyncClient() as client:
                 await client.post(submission.webhook_url, json=webhook_payload, timeout=10)
             exam_result.webhook_sent = True
@@ -458,13 +683,12 @@ async def submit_exam(
     )
 
 
-@router.get("/results")
-async def get_exam_results(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    results = db.query(ExamResult).order_by(ExamResult.completed_at.desc()).limit(100).all()
-    return [{
+RESULTS_PAGE_SIZE = 100
+RESULTS_MAX_PAGE_SIZE = 1000
+
+
+def _serialize_result(r: ExamResult):
+    return {
         "id": r.id,
         "external_user_id": r.external_user_id,
         "external_user_name": r.external_user_name,
@@ -475,5 +699,183 @@ async def get_exam_results(
         "passed": r.passed,
         "webhook_sent": r.webhook_sent,
         "completed_at": r.completed_at.isoformat() if r.completed_at else None
-    } for r in results]
+    }
+
+
+def _filter_results(
+    query,
+    external_user_id: Optional[str] = None,
+    passed: Optional[bool] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    if external_user_id is not None:
+        query = query.filter(ExamResult.external_user_id == external_user_id)
+    if passed is not None:
+        query = query.filter(ExamResult.passed == passed)
+    # SQLite keeps completed_at as "YYYY-MM-DD HH:MM:SS" text, so compare
+    # against ISO day strings; the bare column keeps the index usable
+    if date_from is not None:
+        query = query.filter(ExamResult.completed_at >= literal(date_from.isoformat(), String))
+    if date_to is not None:
+        day_after = (date_to + timedelta(days=1)).isoformat()
+        query = query.filter(ExamResult.completed_at < literal(day_after, String))
+    return query
+
+
+@router.get("/results")
+async def get_exam_results(
+    cursor: Optional[int] = None,
+    limit: int = Query(RESULTS_PAGE_SIZE, ge=1, le=RESULTS_MAX_PAGE_SIZE),
+    external_user_id: Optional[str] = None,
+    passed: Optional[bool] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Newest results first. Pass the returned next_cursor to fetch the following page."""
+    query = _filter_results(db.query(ExamResult), external_user_id, passed, date_from, date_to)
+    if cursor is not None:
+        # Resume strictly after the last row of the previous page on (completed_at, id)
+        after = db.query(ExamResult.completed_at).filter(ExamResult.id == cursor).scalar_subquery()
+        query = query.filter(or_(
+            ExamResult.completed_at < after,
+            and_(ExamResult.completed_at == after, ExamResult.id < cursor),
+        ))
+    rows = query.order_by(ExamResult.completed_at.desc(), ExamResult.id.desc()).limit(limit + 1).all()
+    
+    items = rows[:limit]
+    return ORJSONResponse({
+        "items": [_serialize_result(r) for r in items],
+        "next_cursor": items[-1].id if len(rows) > limit else None,
+    })
+
+
+EXPORT_FORMATS = ("csv", "ndjson")
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COLUMNS = (
+    ExamResult.id, ExamResult.external_user_id, ExamResult.external_user_name,
+    ExamResult.session_id, ExamResult.total_questions, ExamResult.correct_answers,
+    ExamResult.score_percentage, ExamResult.passed, ExamResult.webhook_sent,
+    ExamResult.completed_at,
+)
+
+
+def _csv_value(value):
+    # Spelled as in the NDJSON export rather than Python's True/False
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _csv_row(row):
+    return [_csv_value(value) for value in row]
+
+
+def _export_rows(export_format: str, filters: dict):
+    """Yield the export a batch at a time so memory stays flat however many rows match.
+
+    Uses its own session: the request's session is closed once the endpoint
+    returns, while this generator keeps running as the body is streamed.
+    """
+    names = [column.key for column in EXPORT_COLUMNS]
+    db = SessionLocal()
+    try:
+        query = _filter_results(db.query(*EXPORT_COLUMNS), **filters).order_by(
+            ExamResult.completed_at, ExamResult.id
+        )
+        result = db.execute(query.statement.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE))
+        
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(names)
+            yield buffer.getvalue()
+        
+        for batch in result.partitions():
+            if export_format == "csv":
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(_csv_row(row) for row in batch)
+                yield buffer.getvalue()
+            else:
+                yield b"".join(
+                    orjson.dumps(dict(zip(names, row))) + b"\n" for row in batch
+                )
+    finally:
+        db.close()
+
+
+@router.get("/results/export")
+async def export_exam_results(
+    format: str = "csv",
+    external_user_id: Optional[str] = None,
+    passed: Optional[bool] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current_user: User = Depends(get_current_user)
+):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    
+    filters = dict(external_user_id=external_user_id, passed=passed, date_from=date_from, date_to=date_to)
+    media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+    filename = f"exam-results-{date.today().isoformat()}.{format}"
+    return StreamingResponse(
+        _export_rows(format, filters),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
 
+@router.get("/results/summary")
+async def get_exam_results_summary(
+    external_user_id: Optional[str] = None,
+    passed: Optional[bool] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    filters = dict(external_user_id=external_user_id, passed=passed, date_from=date_from, date_to=date_to)
+    
+    total, passed_count, average_score = _filter_results(db.query(
+        func.count(ExamResult.id),
+        func.coalesce(func.sum(case((ExamResult.passed == True, 1), else_=0)), 0),
+        func.avg(ExamResult.score_percentage),
+    ), **filters).one()
+    
+    # Ten 10-point buckets; a perfect score belongs to the last one
+    bucket = case(
+        (ExamResult.score_percentage >= 100, 9),
+        else_=cast(ExamResult.score_percentage / 10, Integer),
+    ).label("bucket")
+    bucket_counts = dict(_filter_results(
+        db.query(bucket, func.count(ExamResult.id)), **filters
+    ).group_by(bucket).all())
+    
+    day = func.date(ExamResult.completed_at).label("day")
+    per_day = _filter_results(db.query(
+        day,
+        func.count(ExamResult.id),
+        func.sum(case((ExamResult.passed == True, 1), else_=0)),
+    ), **filters).group_by(day).order_by(day).all()
+    
+    return ORJSONResponse({
+        "total": total,
+        "passed": passed_count,
+        "failed": total - passed_count,
+        "pass_rate": round(passed_count / total * 100, 2) if total else None,
+        "average_score": round(average_score, 2) if average_score is not None else None,
+        "score_distribution": [
+            {"range": f"{b * 10}-{b * 10 + 10}", "count": bucket_counts.get(b, 0)}
+            for b in range(10)
+        ],
+        "per_day": [
+            {"date": d, "total": count, "passed": day_passed}
+            for d, count, day_passed in per_day
+        ],
+    })
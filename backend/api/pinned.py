@@ -0,0 +1,128 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from pydantic import BaseModel
+from typing import Optional
+from backend.database import get_db
+from backend.models.pinned import PinnedAnswer, PinnedAnswerStats
+from backend.models.user import User
+from backend.auth_utils import get_current_user
+from backend.services import metrics
+from backend.services.pinned_answers import pinned_answers, terms, phrasings, PINNED_MATCH_THRESHOLD
+
+router = APIRouter(prefix="/admin/pinned-answers", tags=["admin"])
+
+
+class PinnedAnswerCreate(BaseModel):
+    question: str
+    phrases: Optional[str] = None
+    answer: str
+    is_active: bool = True
+
+
+class PinnedAnswerUpdate(BaseModel):
+    question: Optional[str] = None
+    phrases: Optional[str] = None
+    answer: Optional[str] = None
+    is_active: Optional[bool] = None
+
+
+class MatchTest(BaseModel):
+    message: str
+
+
+def _serialize(entry: PinnedAnswer, stats: Optional[PinnedAnswerStats]):
+    return {
+        "id": entry.id,
+        "question": entry.question,
+        "phrases": entry.phrases or "",
+        "answer": entry.answer,
+        "is_active": bool(entry.is_active),
+        "hits": stats.hits if stats else 0,
+        "last_hit_at": stats.last_hit_at.isoformat() if stats and stats.last_hit_at else None,
+    }
+
+
+def _validate(entry: PinnedAnswer):
+    if not entry.answer or not entry.answer.strip():
+        raise HTTPException(status_code=400, detail="Answer must not be empty")
+    if not any(terms(text) for text in phrasings(entry)):
+        raise HTTPException(status_code=400, detail="Question must contain at least one word")
+
+
+@router.get("")
+async def list_pinned_answers(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    rows = db.query(PinnedAnswer, PinnedAnswerStats).outerjoin(
+        PinnedAnswerStats, PinnedAnswerStats.pinned_answer_id == PinnedAnswer.id
+    ).order_by(PinnedAnswer.id).all()
+    return [_serialize(entry, stats) for entry, stats in rows]
+
+
+@router.post("")
+async def create_pinned_answer(data: PinnedAnswerCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    entry = PinnedAnswer(**data.model_dump())
+    _validate(entry)
+    db.add(entry)
+    pinned_answers.changed(db)
+    db.commit()
+    db.refresh(entry)
+    pinned_answers.invalidate()
+    return _serialize(entry, None)
+
+
+@router.put("/{entry_id}")
+async def update_pinned_answer(entry_id: int, data: PinnedAnswerUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    entry = db.query(PinnedAnswer).filter(PinnedAnswer.id == entry_id).first()
+    if not entry:
+        raise HTTPException(status_code=404, detail="Pinned answer not found")
+    for field, value in data.model_dump(exclude_unset=True).items():
+        setattr(entry, field, value)
+    _validate(entry)
+    pinned_answers.changed(db)
+    db.commit()
+    db.refresh(entry)
+    pinned_answers.invalidate()
+    stats = db.query(PinnedAnswerStats).filter(PinnedAnswerStats.pinned_answer_id == entry_id).first()
+    return _serialize(entry, stats)
+
+
+@router.delete("/{entry_id}")
+async def delete_pinned_answer(entry_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    entry = db.query(PinnedAnswer).filter(PinnedAnswer.id == entry_id).first()
+    if not entry:
+        raise HTTPException(status_code=404, detail="Pinned answer not found")
+    db.query(PinnedAnswerStats).filter(PinnedAnswerStats.pinned_answer_id == entry_id).delete()
+    db.delete(entry)
+    pinned_answers.changed(db)
+    db.commit()
+    pinned_answers.invalidate()
+    return {"message": "Pinned answer deleted successfully"}
+
+
+@router.post("/test")
+async def test_pinned_match(data: MatchTest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """The closest pinned answer for a message and whether it would be served; not counted as a hit"""
+    found = pinned_answers.matcher(db).match(data.message, threshold=0.0)
+    if found is None:
+        return {"matched": False, "threshold": PINNED_MATCH_THRESHOLD, "closest": None}
+    entry_id, answer, score = found
+    return {
+        "matched": score >= PINNED_MATCH_THRESHOLD,
+        "threshold": PINNED_MATCH_THRESHOLD,
+        "closest": {"id": entry_id, "answer": answer, "score": score},
+    }
+
+
+@router.get("/stats")
+async def get_pinned_stats(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Messages answered by pinned answers: all time, and this worker's hit rate since it started"""
+    await pinned_answers.flush_stats()
+    hits, misses = metrics.get("pinned_hits"), metrics.get("pinned_misses")
+    return {
+        "total_hits": db.query(func.coalesce(func.sum(PinnedAnswerStats.hits), 0)).scalar(),
+        "worker": {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+        },
+    }
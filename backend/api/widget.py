@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.orm import Session
+from backend.database import get_db
+from backend.api.admin import build_public_config
+from backend.api.chat import build_greeting
+from backend.api.exam import build_public_exam_config
+from backend.services.http_cache import is_not_modified
+from backend.services.widget_bootstrap import (
+    bootstrap_cache,
+    serialize,
+    WIDGET_BOOTSTRAP_MAX_AGE,
+)
+
+router = APIRouter(prefix="/widget", tags=["widget"])
+
+
+@router.get("/bootstrap")
+async def get_bootstrap(request: Request, db: Session = Depends(get_db)):
+    """Everything the widget needs on page load, in one cacheable response"""
+    cached = bootstrap_cache.get("bootstrap")
+    if cached is None:
+        cached = serialize({
+            "config": build_public_config(db),
+            "greeting": build_greeting(db).model_dump(),
+            "exam": build_public_exam_config(db),
+        })
+        bootstrap_cache.set("bootstrap", cached)
+    body, etag = cached
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={WIDGET_BOOTSTRAP_MAX_AGE}",
+    }
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,77 @@
+"""Import time of the API application, checked against a budget.
+
+Every worker imports ``backend.main`` before it can serve, so this is
+startup latency paid on each deploy and scale-out. Each run imports it in
+a fresh interpreter (bytecode already compiled, as in the container) and
+the median is compared with the budget. Run from the repository root:
+
+    python -m backend.benchmarks.import_time --runs 7 --budget-ms 900
+
+The budget can also come from IMPORT_TIME_BUDGET_MS. Exits with status 1
+when over budget, after listing the slowest imports reported by
+``python -X importtime``.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+DEFAULT_BUDGET_MS = 900
+
+_TIMED_IMPORT = (
+    "import time; started = time.perf_counter(); import {module}; "
+    "print((time.perf_counter() - started) * 1000)"
+)
+
+
+def import_ms(module: str) -> float:
+    result = subprocess.run(
+        [sys.executable, "-c", _TIMED_IMPORT.format(module=module)],
+        capture_output=True, text=True, check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(module: str, count: int):
+    """(cumulative ms, module) of the slowest top-level imports"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Only direct imports of the module itself, one level of indentation
+        if name.startswith("   ") and not name.startswith("    "):
+            rows.append((int(cumulative) / 1000, name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="backend.main")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET_MS", DEFAULT_BUDGET_MS)))
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    import_ms(args.module)  # compile bytecode and warm the OS file cache
+    times = [import_ms(args.module) for _ in range(args.runs)]
+    median = statistics.median(times)
+
+    print(f"import {args.module}: median {median:.0f} ms, min {min(times):.0f} ms, "
+          f"max {max(times):.0f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    print("slowest direct imports (cumulative):")
+    for ms, name in slowest_imports(args.module, args.top):
+        print(f"  {ms:8.1f} ms  {name}")
+
+    if median > args.budget_ms:
+        print(f"over budget by {median - args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
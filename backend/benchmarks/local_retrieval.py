@@ -0,0 +1,88 @@
+"""Indexing throughput and query latency of the local retrieval index.
+
+Builds a throwaway index of synthetic chunks (Zipf-distributed vocabulary)
+and times keyword, semantic and hybrid queries against it. Run from the
+repository root:
+
+    python -m backend.benchmarks.local_retrieval --chunks 100000
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from backend.services.local_index import CHUNK_WORDS, LocalIndex
+
+
+def vocabulary(size: int, rng):
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    return [
+        "".join(rng.choice(letters, size=rng.integers(3, 10)))
+        for _ in range(size)
+    ]
+
+
+def percentile(values, p):
+    return float(np.percentile(values, p)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--words", type=int, default=CHUNK_WORDS)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--batch", type=int, default=5_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    words = np.array(vocabulary(args.vocabulary, rng))
+    # Zipf-like word frequencies, as in natural text
+    weights = 1.0 / np.arange(1, args.vocabulary + 1)
+    weights /= weights.sum()
+
+    path = tempfile.mkdtemp(prefix="local-index-bench-")
+    index = LocalIndex(path)
+    try:
+        started = time.perf_counter()
+        for start in range(0, args.chunks, args.batch):
+            count = min(args.batch, args.chunks - start)
+            ids = rng.choice(args.vocabulary, size=(count, args.words), p=weights)
+            index.add_documents({
+                f"doc-{start + i}.txt": " ".join(words[row]) for i, row in enumerate(ids)
+            })
+        elapsed = time.perf_counter() - started
+        stats = index.stats()
+        print(f"indexed {stats['chunks']} chunks in {elapsed:.1f} s "
+              f"({stats['chunks'] / elapsed:.0f} chunks/s, {stats['segments']} segments)")
+
+        queries = [
+            " ".join(words[rng.choice(args.vocabulary, size=rng.integers(2, 8), p=weights)])
+            for _ in range(args.queries)
+        ]
+        for label, search_type in (("hybrid", None), ("semantic", "SEMANTIC")):
+            index.search(queries[0], args.k, search_type)
+            timings = []
+            for query in queries:
+                started = time.perf_counter()
+                index.search(query, args.k, search_type)
+                timings.append(time.perf_counter() - started)
+            print(f"{label:<9} p50 {percentile(timings, 50):7.2f} ms   "
+                  f"p95 {percentile(timings, 95):7.2f} ms   max {max(timings) * 1000:7.2f} ms")
+
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            index.retrieve(query, args.k)
+            timings.append(time.perf_counter() - started)
+        print(f"{'retrieve':<9} p50 {percentile(timings, 50):7.2f} ms   "
+              f"p95 {percentile(timings, 95):7.2f} ms   (hybrid search + chunk text)")
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Bytes on the wire and serialization time for the largest API payloads.
+
+Run from the repository root:
+
+    python -m backend.benchmarks.serialization
+"""
+import gzip
+import json
+import random
+import string
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import brotli
+import orjson
+from backend.services.citations import compact_citations
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, TypeAdapter
+
+
+class ChatResponse(BaseModel):
+    response: str
+    session_id: str
+    citations: Optional[List[dict]] = None
+
+
+def _words(rng, n):
+    return " ".join(
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9))) for _ in range(n)
+    )
+
+
+def chat_payload(rng, citations: int = 5, references: int = 5):
+    """A /chat/ response with full RetrieveAndGenerate citations"""
+    return {
+        "response": _words(rng, 180),
+        "session_id": "3f1c2a9e-8d7b-4f60-9a1e-2b5c7d9e0f11",
+        "citations": [
+            {
+                "generatedResponsePart": {
+                    "textResponsePart": {"text": _words(rng, 40), "span": {"start": 0, "end": 240}}
+                },
+                "retrievedReferences": [
+                    {
+                        "content": {"text": _words(rng, 220)},
+                        "location": {
+                            "type": "S3",
+                            "s3Location": {"uri": f"s3://kb-bucket/docs/handbook-{i}.pdf"},
+                        },
+                        "metadata": {
+                            "x-amz-bedrock-kb-source-uri": f"s3://kb-bucket/docs/handbook-{i}.pdf",
+                            "x-amz-bedrock-kb-chunk-id": f"{rng.getrandbits(64):016x}",
+                            "x-amz-bedrock-kb-data-source-id": "ABCDEFGHIJ",
+                        },
+                    }
+                    for i in range(references)
+                ],
+            }
+            for _ in range(citations)
+        ],
+    }
+
+
+def exam_results_payload(rng, rows: int):
+    """A /exam/results response"""
+    start = datetime(2025, 1, 1)
+    return [
+        {
+            "id": i,
+            "external_user_id": f"user-{rng.randint(1, 50000)}",
+            "external_user_name": _words(rng, 2).title(),
+            "session_id": f"{rng.getrandbits(128):032x}",
+            "total_questions": 20,
+            "correct_answers": (correct := rng.randint(0, 20)),
+            "score_percentage": correct * 5.0,
+            "passed": correct >= 14,
+            "webhook_sent": rng.random() < 0.5,
+            "completed_at": (start + timedelta(minutes=i)).isoformat(),
+        }
+        for i in range(rows)
+    ]
+
+
+def timed(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def report(name, payload, adapter=None, repeat: int = 50):
+    print(f"\n{name}")
+    serializers = {
+        # What a dict-returning route cost before: jsonable_encoder + json.dumps
+        "jsonable_encoder + json": lambda: json.dumps(
+            jsonable_encoder(payload), ensure_ascii=False, separators=(",", ":")
+        ).encode(),
+        "json.dumps": lambda: json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode(),
+        "orjson": lambda: orjson.dumps(payload),
+    }
+    if adapter is not None:
+        # FastAPI's response_model fast path
+        serializers["pydantic dump_json"] = lambda: adapter.dump_json(adapter.validate_python(payload))
+    for label, fn in serializers.items():
+        print(f"  {label:<26} {timed(fn, repeat):8.3f} ms")
+
+    body = orjson.dumps(payload)
+    gz = gzip.compress(body, compresslevel=6)
+    br = brotli.compress(body, quality=4)
+    print(f"  {'identity':<26} {len(body):8d} bytes")
+    print(f"  {'gzip (level 6)':<26} {len(gz):8d} bytes  ({len(gz) / len(body):.0%})")
+    print(f"  {'brotli (quality 4)':<26} {len(br):8d} bytes  ({len(br) / len(body):.0%})")
+    for label, compress in (("gzip", lambda: gzip.compress(body, 6)), ("brotli", lambda: brotli.compress(body, quality=4))):
+        print(f"  {label + ' time':<26} {timed(compress, repeat):8.3f} ms")
+
+
+def main():
+    rng = random.Random(42)
+    chat = chat_payload(rng)
+    report("/chat/ with 5 citations x 5 references", chat, TypeAdapter(ChatResponse))
+    report("/chat/ with compact citations", {**chat, "citations": compact_citations(chat["citations"])}, TypeAdapter(ChatResponse))
+    report("/exam/results, 100 rows", exam_results_payload(rng, 100))
+    report("/exam/results, 10000 rows", exam_results_payload(rng, 10000), repeat=10)
+
+
+if __name__ == "__main__":
+    main()
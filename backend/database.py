@@ -1,12 +1,11 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-import os
 
-# Ensure data directory exists
-os.makedirs("/app/data", exist_ok=True)
+# Created by `python -m backend.migrations`, which runs before the app starts
+DATA_DIR = "/app/data"
 
-SQLALCHEMY_DATABASE_URL = "sqlite:////app/data/chatbot.db"
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{DATA_DIR}/chatbot.db"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
@@ -21,3 +20,4 @@ def get_db():
         yield db
     finally:
         db.close()
+
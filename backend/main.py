@@ -1,20 +1,38 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from backend.database import engine, Base
-from backend.api import auth, admin, chat, exam
-from backend.models import config, exam as exam_models
-
-# Create tables
-Base.metadata.create_all(bind=engine)
+from brotli_asgi import BrotliMiddleware
+from backend.api import auth, admin, chat, exam, health, pinned, widget
+from backend.services.transcripts import transcript_logger
+from backend.services.usage import usage_tracker
+from backend.services.pinned_answers import pinned_answers
+from backend.services.readiness import readiness
+from backend.services import rate_limit
 
 # Check if running in production mode
 IS_PRODUCTION = os.getenv("ENVIRONMENT", "production") == "production"
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Before the first request rather than during it
+    await readiness.warm_up()
+    rate_limit.warn_if_unconfigured()
+    transcript_logger.start()
+    usage_tracker.start()
+    pinned_answers.start()
+    yield
+    await transcript_logger.stop()
+    await usage_tracker.stop()
+    await pinned_answers.stop()
+
+
 app = FastAPI(
     title="RAG Chatbot API",
-    debug=not IS_PRODUCTION
+    debug=not IS_PRODUCTION,
+    lifespan=lifespan
 )
 
 # Production error handling middleware
@@ -41,6 +59,16 @@ async def production_error_handler(request: Request, call_next):
                 }
             )
 
+# Brotli when the client accepts it, gzip otherwise; small bodies and
+# already-compressed images are left alone
+app.add_middleware(
+    BrotliMiddleware,
+    quality=4,
+    minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")),
+    gzip_fallback=True,
+    excluded_handlers=[r"^/exam/images/"],
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -53,6 +81,9 @@ app.include_router(auth.router)
 app.include_router(admin.router)
 app.include_router(chat.router)
 app.include_router(exam.router)
+app.include_router(health.router)
+app.include_router(pinned.router)
+app.include_router(widget.router)
 
 @app.get("/")
 async def root():
@@ -0,0 +1,104 @@
+"""Versioned schema migrations, applied once per deploy before the app starts:
+
+    python -m backend.migrations
+
+The database's schema version is kept in SQLite's ``user_version``. Each
+entry in MIGRATIONS runs at most once per database, in order. To change the
+schema, change the models and append a migration. Steps must also cope with
+tables that a newer baseline already created in their final shape, which
+the helpers below do.
+"""
+import os
+
+from sqlalchemy import inspect, text
+
+from backend.database import engine, Base, DATA_DIR
+# Every model module, so Base.metadata knows all tables
+from backend.models import cache_version, config, exam, pinned, transcript, usage, user  # noqa: F401
+
+
+def _sql_literal(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def add_missing_columns(conn):
+    """create_all() never alters existing tables, so add columns introduced since the database was created"""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=conn.dialect)}"
+            if column.default is not None and column.default.is_scalar:
+                ddl += f" DEFAULT {_sql_literal(column.default.arg)}"
+            conn.execute(text(ddl))
+
+
+def add_missing_indexes(conn):
+    """create_all() skips indexes on tables that already exist"""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(conn)
+
+
+def _baseline(conn):
+    """Every table, column and index of the current models.
+
+    Releases before versioned migrations reconciled the schema whenever the
+    app was imported, so existing databases may stop anywhere in that
+    history; this brings them, and new databases, to the same point.
+    """
+    Base.metadata.create_all(bind=conn)
+    add_missing_columns(conn)
+    add_missing_indexes(conn)
+
+
+def _cache_versions(conn):
+    """Counters that tell workers their cached questions and pinned answers changed"""
+    cache_version.CacheVersion.__table__.create(bind=conn, checkfirst=True)
+
+
+MIGRATIONS = [
+    (1, _baseline),
+    (2, _cache_versions),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def migrate(bind=engine):
+    """Apply pending migrations to ``bind``; returns the versions applied"""
+    if bind is engine:
+        os.makedirs(DATA_DIR, exist_ok=True)
+    applied = []
+    for version, step in MIGRATIONS:
+        with bind.begin() as conn:
+            if schema_version(conn) >= version:
+                continue
+            step(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {version}")
+        applied.append(version)
+    return applied
+
+
+if __name__ == "__main__":
+    applied = migrate()
+    if applied:
+        print(f"[MIGRATIONS] Applied {', '.join(map(str, applied))}; schema is at version {LATEST_VERSION}")
+    else:
+        print(f"[MIGRATIONS] Schema is up to date at version {LATEST_VERSION}")
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, String
+from backend.database import Base
+
+
+class CacheVersion(Base):
+    """A counter bumped in the same transaction as every write to data that workers cache"""
+    __tablename__ = "cache_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -23,4 +23,32 @@ class Config(Base):
     chat_bubble_user_foreground = Column(String, default="#fafafa")
     chat_bubble_bot = Column(String, default="#f4f4f5")
     chat_bubble_bot_foreground = Column(String, default="#18181b")
-    webhook_url = Column(String, nullable=True)
\ No newline at end of file
+    webhook_url = Column(String, nullable=True)
+    store_exam_images_in_s3 = Column(Boolean, default=False)
+
+    # "retrieve_and_generate" lets Bedrock do both steps; "retrieve_then_generate"
+    # retrieves passages and assembles the prompt locally before calling Converse
+    rag_mode = Column(String, default="retrieve_and_generate")
+    retrieval_results = Column(Integer, default=5)
+    search_type = Column(String, nullable=True)  # HYBRID, SEMANTIC or None for the KB default
+    max_output_tokens = Column(Integer, nullable=True)
+    context_token_budget = Column(Integer, default=3000)
+    # "local" answers from the on-host index instead of the knowledge base;
+    # local_generator then picks "extractive" (no model) or "bedrock"
+    retrieval_backend = Column(String, default="bedrock")
+    local_generator = Column(String, default="extractive")
+    # Upload extracted, cleaned-up text instead of the original documents
+    preprocess_uploads = Column(Boolean, default=False)
+    # Input + output tokens per UTC day; once spent, answers use the fallback
+    # model if one is set, otherwise chat requests are rejected until midnight
+    daily_token_budget = Column(Integer, nullable=True)
+    budget_fallback_model_arn = Column(String, nullable=True)
+    # Requests per minute per client on the public endpoints (0 = unlimited),
+    # with clients told apart by "ip", "session" or "origin"
+    chat_rate_limit = Column(Integer, default=20)
+    exam_rate_limit = Column(Integer, default=120)
+    rate_limit_key = Column(String, default="ip")
+
+    # Bumped whenever an ingestion job completes, so retrieval caches can key on it
+    kb_version = Column(Integer, default=0)
+    last_ingestion_job_id = Column(String, nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Float
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Float, Index, ForeignKey
 from sqlalchemy.sql import func
 from backend.database import Base
 
@@ -16,11 +16,20 @@ class ExamQuestion(Base):
     explanation = Column(Text, nullable=True)
     order_index = Column(Integer, default=0)
     is_active = Column(Boolean, default=True)
+    # Optional grouping used to stratify randomly drawn exams
+    category = Column(String, nullable=True)
     created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
 
 class ExamResult(Base):
     __tablename__ = "exam_results"
+    # Newest-first keyset pagination, optionally narrowed by user or outcome
+    __table_args__ = (
+        Index("ix_exam_results_completed_at_id", "completed_at", "id"),
+        Index("ix_exam_results_user_completed_at", "external_user_id", "completed_at", "id"),
+        Index("ix_exam_results_passed_completed_at", "passed", "completed_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     external_user_id = Column(String, nullable=True)
@@ -35,6 +44,30 @@ class ExamResult(Base):
     completed_at = Column(DateTime, server_default=func.now())
 
 
+class ExamAnswer(Base):
+    __tablename__ = "exam_answers"
+
+    id = Column(Integer, primary_key=True)
+    result_id = Column(Integer, ForeignKey("exam_results.id", ondelete="CASCADE"), nullable=False, index=True)
+    question_id = Column(Integer, nullable=False, index=True)
+    selected_answer = Column(String, nullable=False)
+    is_correct = Column(Boolean, nullable=False)
+
+
+class ExamQuestionStats(Base):
+    """Running per-question counters, updated on every submission"""
+    __tablename__ = "exam_question_stats"
+
+    question_id = Column(Integer, primary_key=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    correct = Column(Integer, nullable=False, default=0)
+    option_a = Column(Integer, nullable=False, default=0)
+    option_b = Column(Integer, nullable=False, default=0)
+    option_c = Column(Integer, nullable=False, default=0)
+    option_d = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
 class ExamConfig(Base):
     __tablename__ = "exam_config"
 
@@ -44,4 +77,19 @@ class ExamConfig(Base):
     exam_description = Column(Text, nullable=True)
     show_correct_answers = Column(Boolean, default=True)
     shuffle_questions = Column(Boolean, default=False)
+    # 0 asks every active question; otherwise each exam draws this many at random
+    questions_per_exam = Column(Integer, default=0)
+    stratify_by_category = Column(Boolean, default=False)
+
+
+class ExamSession(Base):
+    """The questions drawn for one exam attempt; grading only considers these"""
+    __tablename__ = "exam_sessions"
+
+    id = Column(String, primary_key=True)
+    # Comma-separated question ids in the order they were presented
+    question_ids = Column(Text, nullable=False)
+    external_user_id = Column(String, nullable=True)
+    created_at = Column(DateTime, server_default=func.now(), index=True)
+    submitted_at = Column(DateTime, nullable=True)
 
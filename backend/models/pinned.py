@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from backend.database import Base
+
+
+class PinnedAnswer(Base):
+    """An approved answer returned instantly when a chat message matches one of its phrasings"""
+    __tablename__ = "pinned_answers"
+
+    id = Column(Integer, primary_key=True, index=True)
+    question = Column(String, nullable=False)
+    # Extra phrasings, one per line, matched the same way as the question
+    phrases = Column(Text, nullable=True)
+    answer = Column(Text, nullable=False)
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class PinnedAnswerStats(Base):
+    # Kept apart from pinned_answers so counting hits doesn't look like an edit
+    __tablename__ = "pinned_answer_stats"
+
+    pinned_answer_id = Column(Integer, ForeignKey("pinned_answers.id", ondelete="CASCADE"), primary_key=True)
+    hits = Column(Integer, default=0)
+    last_hit_at = Column(DateTime, nullable=True)
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime
+from backend.database import Base
+
+
+class ChatTranscript(Base):
+    __tablename__ = "chat_transcripts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Time the turn was answered (UTC), not when the batch was written
+    created_at = Column(DateTime, nullable=False, index=True)
+    session_id = Column(String, nullable=False, index=True)
+    question = Column(Text, nullable=False)
+    answer = Column(Text, nullable=False)
+    sources = Column(Text, nullable=True)  # JSON list of cited source URIs
+    latency_ms = Column(Integer, nullable=False)
+    cache_hit = Column(Boolean, default=False)
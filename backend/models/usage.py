@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from backend.database import Base
+
+
+class TokenUsageDaily(Base):
+    __tablename__ = "token_usage_daily"
+
+    day = Column(String, primary_key=True)  # UTC date, YYYY-MM-DD
+    model = Column(String, primary_key=True)
+    requests = Column(Integer, default=0)
+    input_tokens = Column(Integer, default=0)
+    output_tokens = Column(Integer, default=0)
+    # Requests whose counts were estimated from text length, not reported by Bedrock
+    estimated_requests = Column(Integer, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class TokenUsageSession(Base):
+    __tablename__ = "token_usage_sessions"
+
+    session_id = Column(String, primary_key=True)
+    model = Column(String, nullable=True)  # Most recent model used
+    requests = Column(Integer, default=0)
+    input_tokens = Column(Integer, default=0)
+    output_tokens = Column(Integer, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), index=True)
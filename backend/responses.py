@@ -0,0 +1,14 @@
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson.
+
+    Routes with a ``response_model`` are already serialized by Pydantic's Rust
+    core, so this is for routes that build plain dicts/lists themselves. Return
+    it directly to skip FastAPI's ``jsonable_encoder`` pass as well.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
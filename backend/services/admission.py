@@ -0,0 +1,188 @@
+import asyncio
+import math
+import os
+import random
+import time
+from collections import deque
+from botocore.exceptions import ClientError
+from fastapi.concurrency import run_in_threadpool
+from backend.services import metrics
+
+BEDROCK_MAX_IN_FLIGHT = int(os.getenv("BEDROCK_MAX_IN_FLIGHT", "16"))
+BEDROCK_MIN_IN_FLIGHT = int(os.getenv("BEDROCK_MIN_IN_FLIGHT", "1"))
+BEDROCK_QUEUE_SIZE = int(os.getenv("BEDROCK_QUEUE_SIZE", "64"))
+BEDROCK_QUEUE_TIMEOUT = float(os.getenv("BEDROCK_QUEUE_TIMEOUT", "10"))
+BEDROCK_MAX_ATTEMPTS = int(os.getenv("BEDROCK_MAX_ATTEMPTS", "4"))
+BEDROCK_LATENCY_BUDGET = float(os.getenv("BEDROCK_LATENCY_BUDGET", "45"))
+
+RETRY_BASE_DELAY = 0.25
+RETRY_MAX_DELAY = 4.0
+
+THROTTLING_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    # Raised as EventStreamError when a response stream is throttled part way
+    "throttlingException",
+    "serviceUnavailableException",
+}
+
+
+class Overloaded(Exception):
+    """Raised when a call cannot be admitted or keeps being throttled upstream."""
+
+    def __init__(self, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+def is_throttling_error(error: Exception) -> bool:
+    return isinstance(error, ClientError) and error.response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES
+
+
+class AdaptiveLimiter:
+    """Concurrency limit with AIMD adjustment and a bounded FIFO wait queue.
+
+    The limit grows by ``1/limit`` per success and halves on throttling, so it
+    settles just under whatever concurrency the upstream quota allows. It is
+    only used from the event loop and therefore needs no locking.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int, queue_size: int):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.queue_size = queue_size
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._waiters = deque()
+        # Smoothed call latency, used to estimate Retry-After
+        self.avg_latency = 1.0
+
+    def _has_capacity(self):
+        return self.in_flight < max(int(self.limit), self.min_limit)
+
+    async def acquire(self, timeout: float):
+        if self._has_capacity() and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            metrics.incr("bedrock_queue_rejected")
+            raise Overloaded(self.retry_after(), "Admission queue is full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        granted = False
+        try:
+            await asyncio.wait_for(waiter, timeout)
+            granted = True
+        except asyncio.TimeoutError:
+            metrics.incr("bedrock_queue_timeouts")
+            raise Overloaded(self.retry_after(), "Timed out waiting for capacity")
+        finally:
+            if not granted:
+                if waiter.done() and not waiter.cancelled():
+                    # A slot was handed over just as this caller gave up
+                    self.release()
+                else:
+                    waiter.cancel()
+                    try:
+                        self._waiters.remove(waiter)
+                    except ValueError:
+                        pass
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self._has_capacity():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def on_success(self, latency: float):
+        self.avg_latency = 0.8 * self.avg_latency + 0.2 * latency
+        self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+        self._wake()
+
+    def on_throttle(self):
+        self.limit = max(float(self.min_limit), self.limit / 2)
+
+    def retry_after(self) -> int:
+        backlog = len(self._waiters) + 1
+        estimate = self.avg_latency * backlog / max(int(self.limit), 1)
+        return max(1, min(30, math.ceil(estimate)))
+
+    def stats(self):
+        return {
+            "limit": round(self.limit, 2),
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "queue_size": self.queue_size,
+            "avg_latency_seconds": round(self.avg_latency, 3),
+        }
+
+
+class AdmissionController:
+    """Runs blocking Bedrock calls behind the limiter with jittered retries."""
+
+    def __init__(
+        self,
+        limiter: AdaptiveLimiter,
+        queue_timeout: float = BEDROCK_QUEUE_TIMEOUT,
+        max_attempts: int = BEDROCK_MAX_ATTEMPTS,
+        latency_budget: float = BEDROCK_LATENCY_BUDGET,
+    ):
+        self.limiter = limiter
+        self.queue_timeout = queue_timeout
+        self.max_attempts = max_attempts
+        self.latency_budget = latency_budget
+
+    async def call(self, fn, *args, committed=None, **kwargs):
+        """Run ``fn`` in a worker thread, retrying when it is throttled.
+
+        ``committed`` returns True once the call has delivered output that a
+        retry would repeat (streamed text); a throttle after that point fails
+        with ``Overloaded`` straight away.
+        """
+        deadline = time.monotonic() + self.latency_budget
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = deadline - time.monotonic()
+            await self.limiter.acquire(max(0.0, min(self.queue_timeout, remaining)))
+            started = time.monotonic()
+            try:
+                result = await run_in_threadpool(fn, *args, **kwargs)
+                self.limiter.on_success(time.monotonic() - started)
+                return result
+            except Exception as e:
+                if not is_throttling_error(e):
+                    raise
+                self.limiter.on_throttle()
+                metrics.incr("bedrock_throttled")
+                error = e
+            finally:
+                self.limiter.release()
+
+            if committed is not None and committed():
+                metrics.incr("bedrock_throttled_mid_stream")
+                raise Overloaded(self.limiter.retry_after(), "Upstream model throttled the answer") from error
+
+            # Full jitter keeps retries from synchronising across waiting requests
+            delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+            if attempt >= self.max_attempts or time.monotonic() + delay >= deadline:
+                metrics.incr("bedrock_throttle_exhausted")
+                raise Overloaded(self.limiter.retry_after(), "Upstream model is throttling requests") from error
+            metrics.incr("bedrock_retries")
+            await asyncio.sleep(delay)
+
+    def stats(self):
+        return self.limiter.stats()
+
+
+bedrock_admission = AdmissionController(
+    AdaptiveLimiter(BEDROCK_MAX_IN_FLIGHT, BEDROCK_MIN_IN_FLIGHT, BEDROCK_QUEUE_SIZE)
+)
@@ -0,0 +1,60 @@
+"""boto3 clients shared by every request in this process.
+
+Building a client loads its service model and resolves the endpoint, and a
+fresh client opens a new connection pool; reusing clients keeps that work
+off the request path. Clients are keyed by the region and credentials they
+were built with, so saving new AWS settings simply builds new ones.
+boto3 clients are safe to share between threads.
+"""
+import threading
+
+_clients = {}
+_account_ids = {}
+_lock = threading.Lock()
+
+
+def _credentials(config):
+    if not config or not config.aws_access_key_id:
+        raise Exception("AWS credentials not configured")
+    return config.aws_region, config.aws_access_key_id, config.aws_secret_access_key
+
+
+def get_client(service_name: str, config, boto_config=None, variant: str = ""):
+    """Shared client for ``service_name``; ``variant`` tells apart clients built with different ``boto_config``"""
+    region, key_id, secret = _credentials(config)
+    key = (service_name, variant, region, key_id, secret)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                # boto3 takes a noticeable share of startup; only load it once AWS is used
+                import boto3
+
+                client = boto3.client(
+                    service_name=service_name,
+                    region_name=region,
+                    aws_access_key_id=key_id,
+                    aws_secret_access_key=secret,
+                    config=boto_config,
+                )
+                _clients[key] = client
+    return client
+
+
+def account_id(config) -> str:
+    """The account the configured credentials belong to, from the config or looked up once via STS"""
+    if config and config.aws_account_id:
+        return config.aws_account_id
+    region, key_id, secret = _credentials(config)
+    cached = _account_ids.get((key_id, secret))
+    if cached is None:
+        cached = get_client("sts", config).get_caller_identity()["Account"]
+        _account_ids[(key_id, secret)] = cached
+    return cached
+
+
+def clear():
+    with _lock:
+        _clients.clear()
+        _account_ids.clear()
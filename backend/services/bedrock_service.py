@@ -1,103 +1,408 @@
-import boto3
+import functools
+import hashlib
+import os
 from botocore.exceptions import ClientError
 from sqlalchemy.orm import Session
 from backend.models.config import Config
+from backend.services.ttl_cache import TTLCache
+from backend.services import metrics
+from backend.services import rag_backends
+from backend.services import usage
+from backend.services import aws_clients
+from backend.services.admission import BEDROCK_MAX_IN_FLIGHT
+
+RAG_MODES = ("retrieve_and_generate", "retrieve_then_generate")
+SEARCH_TYPES = ("HYBRID", "SEMANTIC")
+DEFAULT_RETRIEVAL_RESULTS = 5
+DEFAULT_CONTEXT_TOKEN_BUDGET = 3000
+DEFAULT_MAX_OUTPUT_TOKENS = 1024
+DEFAULT_MODEL = "global.anthropic.claude-haiku-4-5-20251001-v1:0"
+# RetrieveAndGenerate doesn't report usage; roughly what its prompt template adds
+RAG_PROMPT_OVERHEAD_TOKENS = 400
+
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "2048"))
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", "900"))
+
+
+@functools.cache
+def _client_config():
+    # botocore.config pulls in most of botocore, so it's imported with the first client
+    from botocore.config import Config as BotoConfig
+
+    return BotoConfig(
+        # Retries are owned by the admission controller so they don't compound
+        retries={"max_attempts": 1, "mode": "standard"},
+        # Clients are shared, so their pools carry every admitted call
+        max_pool_connections=max(10, BEDROCK_MAX_IN_FLIGHT),
+    )
+
+
+# Query -> retrieved references, shared by all requests in this process
+retrieval_cache = TTLCache(max_entries=RETRIEVAL_CACHE_SIZE, ttl=RETRIEVAL_CACHE_TTL)
+
+SYSTEM_PROMPT = (
+    "You are a helpful assistant answering questions using only the numbered "
+    "sources provided with each question. If the sources do not contain the "
+    "answer, say that you don't know. Do not mention the sources by number."
+)
+
+
+class Cancelled(Exception):
+    """Raised in a streaming call once its caller has given up on the answer"""
+
+
+def _events(stream, cancel):
+    """Events of a Bedrock response stream, closed early once ``cancel`` is set.
+
+    Closing the stream drops the connection, which stops generation upstream.
+    The call that opens the stream can't be interrupted, so cancellation takes
+    effect from the first event on.
+    """
+    try:
+        for event in stream:
+            if cancel is not None and cancel.is_set():
+                raise Cancelled()
+            yield event
+    finally:
+        stream.close()
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text
+    return max(1, len(text) // 4)
+
+
+def select_passages(results, token_budget: int):
+    """Order retrieved passages by score, drop duplicates and trim to the token budget"""
+    selected = []
+    seen = set()
+    remaining = token_budget
+    for result in sorted(results, key=lambda r: r.get("score") or 0, reverse=True):
+        text = (result.get("content") or {}).get("text", "").strip()
+        if not text or text in seen:
+            continue
+        seen.add(text)
+        tokens = estimate_tokens(text)
+        if tokens > remaining:
+            # Keep a truncated head of the passage if a useful amount still fits
+            if remaining < 100:
+                break
+            text = text[:remaining * 4]
+            tokens = remaining
+        selected.append({**result, "content": {**result.get("content", {}), "text": text}})
+        remaining -= tokens
+        if remaining <= 0:
+            break
+    return selected
+
 
 class BedrockService:
     def __init__(self, db: Session):
         self.db = db
         self.config = db.query(Config).first()
         self._client = None
+        self._runtime_client = None
         self._account_id = None
+        # Set when this request's retrieval was served from retrieval_cache
+        self.retrieval_cache_hit = False
+        # Model used instead of config.model_arn, e.g. once the daily token budget is spent
+        self.model_override = None
+        self._usage = None
+
+    def _boto_client(self, service_name: str):
+        return aws_clients.get_client(service_name, self.config, _client_config(), variant="bedrock")
 
     def _get_client(self):
-        if self._client:
-            return self._client
-        
-        if not self.config or not self.config.aws_access_key_id:
-            raise Exception("AWS credentials not configured")
-
-        self._client = boto3.client(
-            service_name="bedrock-agent-runtime",
-            region_name=self.config.aws_region,
-            aws_access_key_id=self.config.aws_access_key_id,
-            aws_secret_access_key=self.config.aws_secret_access_key,
-        )
+        if not self._client:
+            self._client = self._boto_client("bedrock-agent-runtime")
         return self._client
 
+    def _get_runtime_client(self):
+        if not self._runtime_client:
+            self._runtime_client = self._boto_client("bedrock-runtime")
+        return self._runtime_client
+
     def _get_account_id(self):
         """Get AWS account ID from config or using STS"""
         if self._account_id:
             return self._account_id
-        
+
         # First check if account ID is stored in config
         if self.config and self.config.aws_account_id:
             self._account_id = self.config.aws_account_id
             return self._account_id
-            
-        # Otherwise fetch from STS
-        if not self.config or not self.config.aws_access_key_id:
-            raise Exception("AWS credentials not configured")
-            
-        sts_client = boto3.client(
-            service_name="sts",
-            region_name=self.config.aws_region,
-            aws_access_key_id=self.config.aws_access_key_id,
-            aws_secret_access_key=self.config.aws_secret_access_key,
-        )
-        
-        identity = sts_client.get_caller_identity()
-        self._account_id = identity['Account']
-        return self._account_id
 
-    def chat(self, message: str, session_id: str = None):
-        client = self._get_client()
-        
-        if not self.config.kb_id:
-            raise Exception("Knowledge Base ID not configured")
+        # Otherwise fetch from STS, once per process
+        self._account_id = aws_clients.account_id(self.config)
+        return self._account_id
 
+    def _get_model_arn(self):
         # Get account ID for constructing inference profile ARN
         account_id = self._get_account_id()
-        
+        model_arn = self.model_override or self.config.model_arn
+
         # Construct model ARN with account ID
-        if self.config.model_arn:
+        if model_arn:
             # If model_arn is stored without account ID, add it
-            if '::inference-profile/' in self.config.model_arn:
+            if '::inference-profile/' in model_arn:
                 # Old format without account ID, replace :: with :account_id:
-                model_arn = self.config.model_arn.replace('::inference-profile/', f':{account_id}:inference-profile/')
-            else:
-                # Already has account ID or is in correct format
-                model_arn = self.config.model_arn
+                return model_arn.replace('::inference-profile/', f':{account_id}:inference-profile/')
+            # Already has account ID or is in correct format
+            return model_arn
+        # Default model
+        return f'arn:aws:bedrock:{self.config.aws_region}:{account_id}:inference-profile/{DEFAULT_MODEL}'
+
+    def warm_up(self):
+        """Build the clients and resolve the model ARN that answering a question needs"""
+        if self.config.retrieval_backend == "local":
+            from backend.services.local_index import local_index
+
+            local_index.stats()
         else:
-            # Default model
-            model_arn = f'arn:aws:bedrock:{self.config.aws_region}:{account_id}:inference-profile/global.anthropic.claude-haiku-4-5-20251001-v1:0'
+            self._get_client()
+        if self.uses_model():
+            self._get_runtime_client()
+            self._get_model_arn()
+
+    def model_name(self):
+        """Model id answers are billed under, for usage accounting"""
+        return usage.model_id(self.model_override or self.config.model_arn or DEFAULT_MODEL)
+
+    def uses_model(self):
+        """False when answers are written locally without any model call"""
+        return not (
+            self.config.retrieval_backend == "local" and self.config.local_generator != "bedrock"
+        )
+
+    def _record_usage(self, input_tokens: int, output_tokens: int, estimated: bool = False):
+        self._usage = {
+            "model": self.model_name(),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "estimated": estimated,
+        }
+
+    def _vector_search_configuration(self):
+        search = {
+            'numberOfResults': self.config.retrieval_results or DEFAULT_RETRIEVAL_RESULTS,
+        }
+        if self.config.search_type:
+            search['overrideSearchType'] = self.config.search_type
+        return {'vectorSearchConfiguration': search}
+
+    def config_version(self):
+        """Short fingerprint of the settings that shape an answer"""
+        if not self.config:
+            return "unconfigured"
+        parts = [
+            self.config.aws_region, self.config.kb_id, self.config.model_arn,
+            self.config.rag_mode, self.config.retrieval_results, self.config.search_type,
+            self.config.max_output_tokens, self.config.context_token_budget,
+            self.config.retrieval_backend, self.config.local_generator,
+            self.model_override,
+        ]
+        return hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:12]
+
+    def chat(self, message: str, session_id: str = None, history=None, on_text=None, cancel=None):
+        """Answer ``message``; with ``on_text``, the answer is streamed to it as it is written.
+
+        ``cancel`` is a ``threading.Event``; once set, a streaming call stops
+        reading and raises ``Cancelled``.
+        """
+        if cancel is not None and cancel.is_set():
+            raise Cancelled()
+
+        if self.config and self.config.retrieval_backend == "local":
+            # Local retrieval never touches the knowledge base, and needs no AWS
+            # access at all unless the answer is written by a Bedrock model
+            return self._retrieve_then_generate(message, history or [], on_text, cancel)
+
+        client = self._get_client()
+
+        if not self.config.kb_id:
+            raise Exception("Knowledge Base ID not configured")
+
+        model_arn = self._get_model_arn()
 
-        # Using RetrieveAndGenerate API for RAG
         try:
-            request_params = {
-                'input': {
-                    'text': message
-                },
-                'retrieveAndGenerateConfiguration': {
-                    'type': 'KNOWLEDGE_BASE',
-                    'knowledgeBaseConfiguration': {
-                        'knowledgeBaseId': self.config.kb_id,
-                        'modelArn': model_arn,
-                    }
-                }
-            }
-            
-            # Only include sessionId if it's provided and not empty
-            if session_id:
-                request_params['sessionId'] = session_id
-            
-            response = client.retrieve_and_generate(**request_params)
-            
-            return {
-                "response": response['output']['text'],
-                "sessionId": response['sessionId'],
-                "citations": response.get('citations', [])
-            }
+            if self.config.rag_mode == "retrieve_then_generate":
+                return self._retrieve_then_generate(message, history or [], on_text, cancel)
+            return self._retrieve_and_generate(client, message, session_id, model_arn, on_text, cancel)
         except ClientError as e:
             print(f"Error invoking Bedrock: {e}")
             raise e
+
+    def _retrieve_and_generate(self, client, message: str, session_id: str, model_arn: str, on_text=None, cancel=None):
+        # Using RetrieveAndGenerate API for RAG
+        knowledge_base_configuration = {
+            'knowledgeBaseId': self.config.kb_id,
+            'modelArn': model_arn,
+            'retrievalConfiguration': self._vector_search_configuration(),
+        }
+        if self.config.max_output_tokens:
+            knowledge_base_configuration['generationConfiguration'] = {
+                'inferenceConfig': {
+                    'textInferenceConfig': {'maxTokens': self.config.max_output_tokens}
+                }
+            }
+
+        request_params = {
+            'input': {
+                'text': message
+            },
+            'retrieveAndGenerateConfiguration': {
+                'type': 'KNOWLEDGE_BASE',
+                'knowledgeBaseConfiguration': knowledge_base_configuration,
+            }
+        }
+
+        # Only include sessionId if it's provided and not empty
+        if session_id:
+            request_params['sessionId'] = session_id
+
+        if on_text is None:
+            response = client.retrieve_and_generate(**request_params)
+            text = response['output']['text']
+            citations = response.get('citations', [])
+        else:
+            response = client.retrieve_and_generate_stream(**request_params)
+            parts, citations = [], []
+            for event in _events(response['stream'], cancel):
+                if 'output' in event:
+                    parts.append(event['output']['text'])
+                    on_text(event['output']['text'])
+                elif 'citation' in event:
+                    citation = event['citation']
+                    # Older responses nest the citation one level deeper
+                    citation = citation if 'retrievedReferences' in citation else citation.get('citation', {})
+                    citations.append({
+                        'generatedResponsePart': citation.get('generatedResponsePart', {}),
+                        'retrievedReferences': citation.get('retrievedReferences', []),
+                    })
+            text = "".join(parts)
+
+        # Estimated from the question, the retrieved passages and the answer;
+        # Bedrock's own session history isn't visible here
+        retrieved = sum(
+            estimate_tokens(ref.get('content', {}).get('text', ''))
+            for citation in citations
+            for ref in citation.get('retrievedReferences', [])
+        )
+        self._record_usage(
+            estimate_tokens(message) + retrieved + RAG_PROMPT_OVERHEAD_TOKENS,
+            estimate_tokens(text),
+            estimated=True,
+        )
+
+        return {
+            "response": text,
+            "sessionId": response['sessionId'],
+            "citations": citations,
+            "usage": self._usage,
+        }
+
+    def retrieve(self, query: str, k: int = None, search_type: str = None):
+        """Knowledge base passages; ``k`` and ``search_type`` override the configured ones"""
+        retrieval_configuration = self._vector_search_configuration()
+        search = retrieval_configuration['vectorSearchConfiguration']
+        if k is not None:
+            search['numberOfResults'] = k
+        if search_type:
+            search['overrideSearchType'] = search_type
+        cache_key = (
+            self.config.kb_id,
+            self.config.kb_version or 0,
+            normalize_text(query),
+            search['numberOfResults'],
+            search.get('overrideSearchType'),
+        )
+        results = retrieval_cache.get(cache_key)
+        if results is not None:
+            metrics.incr("retrieval_cache_hits")
+            self.retrieval_cache_hit = True
+            return results
+
+        metrics.incr("retrieval_cache_misses")
+        response = self._get_client().retrieve(
+            knowledgeBaseId=self.config.kb_id,
+            retrievalQuery={'text': query},
+            retrievalConfiguration=retrieval_configuration,
+        )
+        results = response.get('retrievalResults', [])
+        retrieval_cache.set(cache_key, results)
+        return results
+
+    def _retrieve_then_generate(self, message: str, history, on_text=None, cancel=None):
+        retriever = rag_backends.get_retriever(self.config, self)
+        generator = rag_backends.get_generator(self.config, self)
+        search = self._vector_search_configuration()['vectorSearchConfiguration']
+        results = retriever.retrieve(message, search['numberOfResults'], search.get('overrideSearchType'))
+        passages = select_passages(results, self.config.context_token_budget or DEFAULT_CONTEXT_TOKEN_BUDGET)
+        text = generator.generate(message, passages, history, on_text, cancel)
+
+        # Same shape as RetrieveAndGenerate citations so clients don't care which mode ran
+        citations = []
+        if passages:
+            citations.append({
+                'generatedResponsePart': {'textResponsePart': {'text': text}},
+                'retrievedReferences': [
+                    {k: p[k] for k in ('content', 'location', 'metadata') if k in p}
+                    for p in passages
+                ],
+            })
+
+        return {
+            "response": text,
+            "sessionId": None,
+            "citations": citations,
+            "usage": self._usage,
+        }
+
+    def converse(self, message: str, passages, history, on_text=None, cancel=None):
+        """Answer from the given passages with the configured model, streamed to ``on_text`` if given"""
+        sources = "\n\n".join(
+            f"[{i}] {p['content']['text']}" for i, p in enumerate(passages, start=1)
+        ) or "(no sources found)"
+        messages = []
+        for question, answer in history:
+            messages.append({'role': 'user', 'content': [{'text': question}]})
+            messages.append({'role': 'assistant', 'content': [{'text': answer}]})
+        messages.append({
+            'role': 'user',
+            'content': [{'text': f"Sources:\n{sources}\n\nQuestion: {message}"}],
+        })
+
+        request_params = {
+            'modelId': self._get_model_arn(),
+            'system': [{'text': SYSTEM_PROMPT}],
+            'messages': messages,
+            'inferenceConfig': {'maxTokens': self.config.max_output_tokens or DEFAULT_MAX_OUTPUT_TOKENS},
+        }
+        if on_text is None:
+            response = self._get_runtime_client().converse(**request_params)
+            text = "".join(
+                block.get('text', '') for block in response['output']['message']['content']
+            )
+            reported = response.get('usage')
+        else:
+            response = self._get_runtime_client().converse_stream(**request_params)
+            parts, reported = [], None
+            for event in _events(response['stream'], cancel):
+                if 'contentBlockDelta' in event:
+                    delta = event['contentBlockDelta']['delta'].get('text', '')
+                    if delta:
+                        parts.append(delta)
+                        on_text(delta)
+                elif 'metadata' in event:
+                    reported = event['metadata'].get('usage')
+            text = "".join(parts)
+        if reported:
+            self._record_usage(reported.get('inputTokens', 0), reported.get('outputTokens', 0))
+        else:
+            prompt = SYSTEM_PROMPT + "".join(m['content'][0]['text'] for m in messages)
+            self._record_usage(estimate_tokens(prompt), estimate_tokens(text), estimated=True)
+        return text
@@ -0,0 +1,27 @@
+"""Version counters for data each worker caches in memory.
+
+Writes bump the counter in their own transaction, so a worker that compares
+it with the version its cache was built from notices every committed
+change, however many land within the same second and whichever rows they
+touch.
+"""
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from backend.models.cache_version import CacheVersion
+
+EXAM_QUESTIONS = "exam_questions"
+PINNED_ANSWERS = "pinned_answers"
+
+
+def bump(db: Session, name: str):
+    """Count a change to ``name``; takes effect when ``db`` commits"""
+    stmt = sqlite_insert(CacheVersion).values(name=name, version=1)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[CacheVersion.name],
+        set_={"version": CacheVersion.version + 1},
+    ))
+
+
+def current(db: Session, name: str) -> int:
+    return db.query(CacheVersion.version).filter(CacheVersion.name == name).scalar() or 0
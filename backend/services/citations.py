@@ -0,0 +1,60 @@
+import os
+from urllib.parse import unquote, urlparse
+from backend.services.ttl_cache import TTLCache
+
+CITATION_CACHE_SIZE = int(os.getenv("CITATION_CACHE_SIZE", "5000"))
+CITATION_CACHE_TTL = float(os.getenv("CITATION_CACHE_TTL", "600"))
+SNIPPET_LENGTH = 200
+
+# response_id -> full Bedrock citations, for on-demand detail lookups
+citation_cache = TTLCache(max_entries=CITATION_CACHE_SIZE, ttl=CITATION_CACHE_TTL)
+
+
+def source_uri(reference: dict):
+    metadata = reference.get("metadata") or {}
+    if metadata.get("x-amz-bedrock-kb-source-uri"):
+        return metadata["x-amz-bedrock-kb-source-uri"]
+    # location is {"type": ..., "<kind>Location": {"uri"|"url"|"id": ...}}
+    for value in (reference.get("location") or {}).values():
+        if isinstance(value, dict):
+            for key in ("uri", "url", "id"):
+                if value.get(key):
+                    return value[key]
+    return None
+
+
+def source_title(reference: dict, uri: str):
+    metadata = reference.get("metadata") or {}
+    title = metadata.get("title") or metadata.get("x-amz-bedrock-kb-title")
+    if title:
+        return str(title)
+    if not uri:
+        return None
+    path = unquote(urlparse(uri).path).rstrip("/")
+    return path.rsplit("/", 1)[-1] or uri
+
+
+def snippet(text: str) -> str:
+    text = " ".join(text.split())
+    if len(text) <= SNIPPET_LENGTH:
+        return text
+    return text[:SNIPPET_LENGTH].rsplit(" ", 1)[0] + "…"
+
+
+def compact_citations(citations):
+    """Flatten Bedrock citations to one small entry per retrieved reference"""
+    compact = []
+    for citation_index, citation in enumerate(citations or []):
+        part = (citation.get("generatedResponsePart") or {}).get("textResponsePart") or {}
+        span = part.get("span")
+        for reference_index, reference in enumerate(citation.get("retrievedReferences") or []):
+            uri = source_uri(reference)
+            compact.append({
+                "source_uri": uri,
+                "title": source_title(reference, uri),
+                "span": {"start": span.get("start"), "end": span.get("end")} if span else None,
+                "snippet": snippet((reference.get("content") or {}).get("text", "")),
+                "citation": citation_index,
+                "reference": reference_index,
+            })
+    return compact
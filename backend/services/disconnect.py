@@ -0,0 +1,47 @@
+import asyncio
+from starlette.requests import Request
+from backend.services import metrics
+
+
+class ClientDisconnected(Exception):
+    """The client went away before its response was ready"""
+
+
+async def wait_for_disconnect(request: Request):
+    # Once the body has been read, the server's next message is the disconnect
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def unless_disconnected(request: Request, awaitable, metric: str):
+    """Await ``awaitable``, cancelling it if the client disconnects first.
+
+    Cancellation reaches whatever the awaitable is blocked on: a place in the
+    admission queue is given up, and a running Bedrock stream is closed at its
+    next event. Raises ``ClientDisconnected`` and counts ``metric`` in that case.
+    """
+    work = asyncio.ensure_future(awaitable)
+    watcher = asyncio.create_task(wait_for_disconnect(request))
+    try:
+        await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        work.cancel()
+        raise
+    finally:
+        watcher.cancel()
+
+    if work.done():
+        return work.result()
+
+    work.cancel()
+    try:
+        await work
+    except asyncio.CancelledError:
+        pass
+    except Exception:
+        # Nobody is waiting for the failure either
+        pass
+    metrics.incr(metric)
+    raise ClientDisconnected()
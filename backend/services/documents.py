@@ -0,0 +1,98 @@
+import html
+import io
+import os
+import re
+import zipfile
+from xml.etree import ElementTree
+
+# Matches client_max_body_size in the frontend nginx
+MAX_DOCUMENT_BYTES = int(os.getenv("MAX_DOCUMENT_BYTES", str(100 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+TEXT_EXTENSIONS = ("txt", "md", "markdown", "csv", "json", "xml", "log", "rst")
+HTML_EXTENSIONS = ("html", "htm")
+OFFICE_EXTENSIONS = ("docx", "pptx")
+
+_TAGS = re.compile(r"<(script|style)\b.*?</\1>|<[^>]+>", re.S | re.I)
+_SLIDE = re.compile(r"ppt/slides/slide(\d+)\.xml$")
+
+# Paragraph and text-run element names in WordprocessingML and DrawingML
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+
+
+class DocumentTooLarge(Exception):
+    pass
+
+
+def check_size(filename: str, size: int):
+    if size is not None and size > MAX_DOCUMENT_BYTES:
+        raise DocumentTooLarge(f"{filename} exceeds {MAX_DOCUMENT_BYTES // (1024 * 1024)} MB")
+
+
+async def read_upload(file) -> bytes:
+    """An upload's content, read in chunks and abandoned as soon as it's over MAX_DOCUMENT_BYTES"""
+    check_size(file.filename, file.size)
+    chunks, size = [], 0
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        check_size(file.filename, size)
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def _extension(filename: str) -> str:
+    return filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+
+
+def _pdf_pages(data: bytes):
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(data))
+    return [page.extract_text() or "" for page in reader.pages]
+
+
+def _xml_paragraphs(xml: bytes, paragraph: str, run: str) -> str:
+    paragraphs = []
+    for element in ElementTree.fromstring(xml).iter(paragraph):
+        text = "".join(node.text or "" for node in element.iter(run))
+        if text.strip():
+            paragraphs.append(text)
+    return "\n".join(paragraphs)
+
+
+def _docx_pages(data: bytes):
+    # Headers and footers live in separate parts (word/header*.xml), so the body has none
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        return [_xml_paragraphs(archive.read("word/document.xml"), f"{_W}p", f"{_W}t")]
+
+
+def _pptx_pages(data: bytes):
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        slides = sorted(
+            (int(match.group(1)), name)
+            for name in archive.namelist()
+            if (match := _SLIDE.match(name))
+        )
+        return [_xml_paragraphs(archive.read(name), f"{_A}p", f"{_A}t") for _, name in slides]
+
+
+def extract_pages(filename: str, data: bytes):
+    """Plain text per page (PDF), slide (PPTX) or form feed; empty when the format isn't supported"""
+    ext = _extension(filename)
+    if ext in TEXT_EXTENSIONS:
+        return data.decode("utf-8", errors="replace").split("\f")
+    if ext in HTML_EXTENSIONS:
+        return [html.unescape(_TAGS.sub(" ", data.decode("utf-8", errors="replace")))]
+    if ext == "pdf":
+        return _pdf_pages(data)
+    if ext == "docx":
+        return _docx_pages(data)
+    if ext == "pptx":
+        return _pptx_pages(data)
+    return []
+
+
+def extract_text(filename: str, data: bytes) -> str:
+    """Best-effort plain text for indexing; empty when the format isn't supported"""
+    return "\n\n".join(extract_pages(filename, data))
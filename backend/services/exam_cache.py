@@ -0,0 +1,91 @@
+import gzip
+import hashlib
+import json
+import os
+import random
+import time
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from backend.models.exam import ExamQuestion, ExamConfig
+from backend.services import cache_versions
+from backend.services.http_cache import http_date
+
+# How often a worker re-checks the database for question changes made elsewhere
+EXAM_CACHE_CHECK_INTERVAL = float(os.getenv("EXAM_CACHE_CHECK_INTERVAL", "2"))
+
+PUBLIC_FIELDS = (
+    "id", "question_text", "question_image_url",
+    "option_a", "option_b", "option_c", "option_d",
+)
+
+
+class QuestionSnapshot:
+    """Active questions serialized once, ready to be written straight to the wire"""
+
+    __slots__ = (
+        "fingerprint", "ids", "fragments", "by_id", "grading", "categories",
+        "body", "gzipped", "etag", "last_modified", "shuffle",
+    )
+
+    def __init__(self, fingerprint, questions, shuffle: bool, last_modified):
+        self.fingerprint = fingerprint
+        self.shuffle = shuffle
+        self.ids = [q.id for q in questions]
+        # One JSON object per question, so shuffling is a join over a permuted list
+        self.fragments = [
+            json.dumps({field: getattr(q, field) for field in PUBLIC_FIELDS}, separators=(",", ":")).encode()
+            for q in questions
+        ]
+        self.by_id = dict(zip(self.ids, self.fragments))
+        # Everything grading needs, so submissions don't re-query questions
+        self.grading = {q.id: (q.correct_answer.upper(), q.explanation) for q in questions}
+        self.categories = {q.id: q.category for q in questions}
+        self.body = b"[" + b",".join(self.fragments) + b"]"
+        self.gzipped = gzip.compress(self.body, compresslevel=6)
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        # Shuffled bodies differ per request but are equivalent, hence a weak validator
+        self.etag = f'W/"{digest}"' if shuffle else f'"{digest}"'
+        self.last_modified = http_date(last_modified) if last_modified else None
+
+    def render(self) -> bytes:
+        if not self.shuffle:
+            return self.body
+        return b"[" + b",".join(random.sample(self.fragments, len(self.fragments))) + b"]"
+
+    def render_ids(self, ids) -> bytes:
+        return b"[" + b",".join(self.by_id[i] for i in ids) + b"]"
+
+
+class QuestionCache:
+    def __init__(self):
+        self._snapshot = None
+        self._checked_at = 0.0
+
+    def get(self, db: Session) -> QuestionSnapshot:
+        now = time.monotonic()
+        if self._snapshot and now - self._checked_at < EXAM_CACHE_CHECK_INTERVAL:
+            return self._snapshot
+
+        version = cache_versions.current(db, cache_versions.EXAM_QUESTIONS)
+        if not self._snapshot or self._snapshot.fingerprint != version:
+            questions = db.query(ExamQuestion).filter(
+                ExamQuestion.is_active == True
+            ).order_by(ExamQuestion.order_index).all()
+            last_modified = db.query(
+                func.max(func.coalesce(ExamQuestion.updated_at, ExamQuestion.created_at))
+            ).scalar()
+            config = db.query(ExamConfig).first()
+            shuffle = bool(config and config.shuffle_questions)
+            self._snapshot = QuestionSnapshot(version, questions, shuffle, last_modified)
+        self._checked_at = now
+        return self._snapshot
+
+    def changed(self, db: Session):
+        """Record a change to questions or exam config in ``db``'s transaction, for every worker"""
+        cache_versions.bump(db, cache_versions.EXAM_QUESTIONS)
+
+    def invalidate(self):
+        self._snapshot = None
+
+
+question_cache = QuestionCache()
@@ -0,0 +1,75 @@
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from backend.models.exam import ExamSession
+
+# Unsubmitted sessions older than this can no longer be submitted and are purged
+EXAM_SESSION_TTL = float(os.getenv("EXAM_SESSION_TTL", str(24 * 3600)))
+# Grade submissions without an exam session, as clients from before exam sessions sent them
+EXAM_ALLOW_SESSIONLESS_SUBMIT = os.getenv("EXAM_ALLOW_SESSIONLESS_SUBMIT", "true").lower() == "true"
+PURGE_INTERVAL = 600
+
+_last_purge = 0.0
+
+
+def encode_ids(ids) -> str:
+    return ",".join(str(i) for i in ids)
+
+
+def decode_ids(value: str):
+    return [int(i) for i in value.split(",") if i]
+
+
+def _allocate(groups, count: int):
+    """Split ``count`` across groups in proportion to their size (largest remainder)"""
+    total = sum(len(ids) for ids in groups.values())
+    quotas = {key: count * len(ids) / total for key, ids in groups.items()}
+    allocation = {key: int(quota) for key, quota in quotas.items()}
+    leftover = count - sum(allocation.values())
+    for key in sorted(quotas, key=lambda k: quotas[k] - allocation[k], reverse=True)[:leftover]:
+        allocation[key] += 1
+    return allocation
+
+
+def draw_questions(snapshot, count: int, stratify: bool, shuffle: bool, rng=random):
+    """Pick the question ids for one exam from the active pool.
+
+    ``count`` of 0 (or more than the pool) takes every question. Stratified
+    draws keep each category's share of the pool.
+    """
+    pool = snapshot.ids
+    if count and count < len(pool):
+        if stratify:
+            groups = {}
+            for question_id in pool:
+                groups.setdefault(snapshot.categories.get(question_id) or "", []).append(question_id)
+            drawn = set()
+            for key, quota in _allocate(groups, count).items():
+                drawn.update(rng.sample(groups[key], quota))
+        else:
+            drawn = set(rng.sample(pool, count))
+        # Keep the admin-defined order unless the exam is shuffled
+        ids = [question_id for question_id in pool if question_id in drawn]
+    else:
+        ids = list(pool)
+
+    if shuffle:
+        rng.shuffle(ids)
+    return ids
+
+
+def is_expired(session: ExamSession) -> bool:
+    return bool(session.created_at) and session.created_at < datetime.utcnow() - timedelta(seconds=EXAM_SESSION_TTL)
+
+
+def purge_expired(db: Session):
+    """Drop stale sessions, at most once per PURGE_INTERVAL per process"""
+    global _last_purge
+    now = time.monotonic()
+    if now - _last_purge < PURGE_INTERVAL:
+        return
+    _last_purge = now
+    cutoff = datetime.utcnow() - timedelta(seconds=EXAM_SESSION_TTL)
+    db.query(ExamSession).filter(ExamSession.created_at < cutoff).delete(synchronize_session=False)
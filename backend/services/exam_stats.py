@@ -0,0 +1,74 @@
+from sqlalchemy import case, func, insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from backend.models.exam import ExamAnswer, ExamQuestionStats
+
+OPTIONS = ("A", "B", "C", "D")
+COUNTERS = ("attempts", "correct", "option_a", "option_b", "option_c", "option_d")
+
+
+def _empty_counters():
+    return dict.fromkeys(COUNTERS, 0)
+
+
+def record_answers(db: Session, result_id: int, answers):
+    """Store graded answers and fold them into the per-question counters.
+
+    ``answers`` is a list of ``(question_id, selected_answer, is_correct)``.
+    Runs inside the caller's transaction; nothing is committed here.
+    """
+    if not answers:
+        return
+
+    db.execute(insert(ExamAnswer), [
+        {"result_id": result_id, "question_id": q, "selected_answer": selected, "is_correct": correct}
+        for q, selected, correct in answers
+    ])
+
+    # One row per question: an upsert can't touch the same row twice in a statement
+    deltas = {}
+    for question_id, selected, correct in answers:
+        counters = deltas.setdefault(question_id, _empty_counters())
+        counters["attempts"] += 1
+        counters["correct"] += int(correct)
+        if selected in OPTIONS:
+            counters[f"option_{selected.lower()}"] += 1
+
+    stmt = sqlite_insert(ExamQuestionStats).values([
+        {"question_id": question_id, **counters} for question_id, counters in deltas.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ExamQuestionStats.question_id],
+        set_={
+            **{name: getattr(ExamQuestionStats, name) + getattr(stmt.excluded, name) for name in COUNTERS},
+            "updated_at": func.now(),
+        },
+    )
+    db.execute(stmt)
+
+
+def rebuild_question_stats(db: Session, question_id: int, correct_answer: str):
+    """Recount one question from its stored answers, e.g. after its answer key changed"""
+    selected = func.upper(ExamAnswer.selected_answer)
+    row = db.query(
+        func.count(ExamAnswer.id),
+        func.sum(case((selected == correct_answer.upper(), 1), else_=0)),
+        *(func.sum(case((selected == option, 1), else_=0)) for option in OPTIONS),
+    ).filter(ExamAnswer.question_id == question_id).one()
+
+    db.query(ExamQuestionStats).filter(ExamQuestionStats.question_id == question_id).delete()
+    if row[0]:
+        db.add(ExamQuestionStats(question_id=question_id, **dict(zip(COUNTERS, row))))
+
+
+def question_stats(db: Session):
+    stats = []
+    for s in db.query(ExamQuestionStats).all():
+        stats.append({
+            "question_id": s.question_id,
+            "attempts": s.attempts,
+            "correct": s.correct,
+            "correct_rate": round(s.correct / s.attempts * 100, 1) if s.attempts else None,
+            "options": {option: getattr(s, f"option_{option.lower()}") for option in OPTIONS},
+        })
+    return stats
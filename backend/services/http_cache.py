@@ -0,0 +1,53 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    wanted = etag.removeprefix("W/")
+    return wanted in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+def accepts_encoding(accept_encoding: str, coding: str) -> bool:
+    """Whether ``coding`` is acceptable per an Accept-Encoding header; ``q=0`` refuses it"""
+    weights = {}
+    for entry in (accept_encoding or "").split(","):
+        name, _, params = entry.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        # RFC 9110 treats x-gzip as gzip
+        weights[{"x-gzip": "gzip"}.get(name, name)] = weight
+    return weights.get(coding.lower(), weights.get("*", 0.0)) > 0
+
+
+def http_date(value: datetime) -> str:
+    # Database timestamps are naive UTC
+    return format_datetime(value.replace(tzinfo=timezone.utc), usegmt=True)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: str = None) -> bool:
+    """Evaluate If-None-Match, falling back to If-Modified-Since when no ETag was sent"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
@@ -0,0 +1,89 @@
+import hashlib
+import os
+import re
+import uuid
+import aiofiles
+from fastapi import UploadFile
+
+EXAM_IMAGE_DIR = "/app/data/exam_images"
+EXAM_IMAGE_S3_PREFIX = "exam-images/"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(20 * 1024 * 1024)))
+
+# Longest edge in pixels for each generated WebP variant
+IMAGE_VARIANTS = {
+    "display": 1280,
+    "thumb": 320,
+}
+
+# Content-hashed names never change content, so they can be cached forever
+HASHED_IMAGE_NAME = re.compile(r"^[0-9a-f]{20}(_[a-z]+)?\.[a-z0-9]+$")
+
+
+class ImageTooLarge(Exception):
+    pass
+
+
+def is_hashed_name(filename: str) -> bool:
+    return bool(HASHED_IMAGE_NAME.match(filename))
+
+
+async def save_upload(file: UploadFile):
+    """Stream an upload to a temporary file without buffering it in memory.
+
+    Returns the temporary path and the hex digest of the content.
+    """
+    os.makedirs(EXAM_IMAGE_DIR, exist_ok=True)
+    tmp_path = os.path.join(EXAM_IMAGE_DIR, f".upload-{uuid.uuid4().hex}")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(tmp_path, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_IMAGE_BYTES:
+                    raise ImageTooLarge(f"Image exceeds {MAX_IMAGE_BYTES // (1024 * 1024)} MB")
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest()
+
+
+def store_image(tmp_path: str, digest: str, original_ext: str):
+    """Move an upload into place and generate resized WebP variants.
+
+    Blocking; run it in the threadpool. Returns ``{variant: filename}`` with an
+    ``original`` entry and, when the image could be decoded, one entry per
+    ``IMAGE_VARIANTS`` key.
+    """
+    from PIL import Image, ImageOps
+
+    stem = digest[:20]
+    original_ext = re.sub(r"[^a-z0-9]", "", original_ext.lower()) or "png"
+    files = {"original": f"{stem}.{original_ext}"}
+    os.replace(tmp_path, os.path.join(EXAM_IMAGE_DIR, files["original"]))
+
+    try:
+        with Image.open(os.path.join(EXAM_IMAGE_DIR, files["original"])) as image:
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+            for name, edge in IMAGE_VARIANTS.items():
+                filename = f"{stem}_{name}.webp"
+                path = os.path.join(EXAM_IMAGE_DIR, filename)
+                if not os.path.exists(path):
+                    variant = image.copy()
+                    variant.thumbnail((edge, edge))
+                    variant.save(path, "WEBP", quality=80, method=4)
+                files[name] = filename
+    except Exception as e:
+        # Formats Pillow can't decode (SVG, HEIC...) are served as uploaded
+        print(f"Could not generate variants for {files['original']}: {e}")
+    return files
+
+
+def image_url(filename: str) -> str:
+    return f"/api/exam/images/{filename}"
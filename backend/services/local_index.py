@@ -0,0 +1,562 @@
+"""On-disk retrieval index for running without a Bedrock knowledge base.
+
+Chunk text and bookkeeping live in SQLite. Keyword search is BM25 over an
+inverted index stored as immutable NumPy segments, one per indexing batch;
+deleted chunks are masked out at query time and dropped when small segments
+are merged. Dense search is a cosine top-k over a memory-mapped float32
+matrix whose row number is the chunk id.
+
+Every write bumps a generation counter in SQLite, so other worker processes
+notice and reload before their next query.
+"""
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import uuid
+import zlib
+from collections import Counter
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+import numpy as np
+
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "/app/data/local_index")
+LOCAL_DOCS_DIR = os.getenv("LOCAL_DOCS_DIR", "/app/data/documents")
+
+CHUNK_WORDS = 200
+CHUNK_OVERLAP = 40
+EMBEDDING_DIM = 256
+# Merge the smallest segments once there are more than this many
+MAX_SEGMENTS = 16
+MERGE_FACTOR = 8
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Reciprocal rank fusion constant for hybrid search
+RRF_K = 60
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i if in into is it its "
+    "me my no not of on or our she so than that the their them then there these they "
+    "this to was we were what when where which who will with you your".split()
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS documents (
+    key TEXT PRIMARY KEY, chunks INTEGER NOT NULL, indexed_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, doc_key TEXT NOT NULL,
+    position INTEGER NOT NULL, length INTEGER NOT NULL, text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_chunks_doc_key ON chunks (doc_key);
+CREATE TABLE IF NOT EXISTS segments (name TEXT PRIMARY KEY, postings INTEGER NOT NULL);
+"""
+
+
+def tokenize(text: str):
+    return [t for t in TOKEN.findall(text.casefold()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def chunk_text(text: str, size: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP):
+    """Overlapping windows of ``size`` words"""
+    words = text.split()
+    if not words:
+        return []
+    step = size - overlap
+    return [" ".join(words[i:i + size]) for i in range(0, max(len(words) - overlap, 1), step)]
+
+
+class HashingEmbedder:
+    """Feature-hashed words and word pairs, L2-normalised.
+
+    Deterministic and model-free so the index works offline; anything with
+    the same ``name``/``dim``/``embed`` interface can replace it.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        self.name = f"hashing-v1-{dim}"
+
+    def embed(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            if not features:
+                continue
+            hashes = np.fromiter(
+                (zlib.crc32(f.encode()) for f in features), dtype=np.uint32, count=len(features)
+            )
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(out[row], hashes % self.dim, signs)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+class Segment:
+    """Immutable postings: for each term, the chunk ids containing it and their term frequencies"""
+
+    __slots__ = ("name", "terms", "starts", "ids", "tfs", "lookup")
+
+    def __init__(self, name, terms, starts, ids, tfs):
+        self.name = name
+        self.terms = terms
+        self.starts = starts
+        self.ids = ids
+        self.tfs = tfs
+        self.lookup = {term: i for i, term in enumerate(terms.tolist())}
+
+    @classmethod
+    def from_postings(cls, name, terms, ids, tfs):
+        order = np.lexsort((ids, terms))
+        terms, ids, tfs = terms[order], ids[order], tfs[order]
+        unique, starts = np.unique(terms, return_index=True)
+        starts = np.append(starts, len(terms)).astype(np.int64)
+        return cls(name, unique, starts, ids.astype(np.int32), tfs.astype(np.uint16))
+
+    @classmethod
+    def build(cls, name, chunk_ids, token_lists):
+        terms, ids, tfs = [], [], []
+        for chunk_id, tokens in zip(chunk_ids, token_lists):
+            for term, tf in Counter(tokens).items():
+                terms.append(term)
+                ids.append(chunk_id)
+                tfs.append(min(tf, 65535))
+        return cls.from_postings(name, np.array(terms, dtype=str), np.array(ids), np.array(tfs))
+
+    @classmethod
+    def merge(cls, name, segments, alive):
+        """Combine segments, dropping postings of deleted chunks"""
+        terms = np.concatenate([np.repeat(s.terms, np.diff(s.starts)) for s in segments])
+        ids = np.concatenate([s.ids for s in segments])
+        tfs = np.concatenate([s.tfs for s in segments])
+        keep = alive[ids]
+        return cls.from_postings(name, terms[keep], ids[keep], tfs[keep])
+
+    @classmethod
+    def load(cls, directory, name):
+        with np.load(os.path.join(directory, f"{name}.npz")) as data:
+            return cls(name, data["terms"], data["starts"], data["ids"], data["tfs"])
+
+    def save(self, directory):
+        tmp = os.path.join(directory, f".{self.name}.npz")
+        np.savez(tmp, terms=self.terms, starts=self.starts, ids=self.ids, tfs=self.tfs)
+        os.replace(tmp, os.path.join(directory, f"{self.name}.npz"))
+
+    def postings(self, term):
+        i = self.lookup.get(term)
+        if i is None:
+            return None
+        start, end = self.starts[i], self.starts[i + 1]
+        return self.ids[start:end], self.tfs[start:end]
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def _top_k(scores, k: int):
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class LocalIndex:
+    def __init__(self, path: str = LOCAL_INDEX_DIR, embedder=None):
+        self.path = path
+        self.segment_dir = os.path.join(path, "segments")
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.embedder = embedder or HashingEmbedder()
+        self._lock = threading.RLock()
+        self._conn = None
+        self._generation = None
+        self._segments = {}
+        self._alive = np.zeros(1, dtype=bool)
+        self._lengths = np.zeros(1, dtype=np.float32)
+        self._count = 0
+        self._avg_length = 1.0
+        self._vectors = None
+
+    # -- storage ---------------------------------------------------------
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(self.segment_dir, exist_ok=True)
+            conn = sqlite3.connect(
+                os.path.join(self.path, "index.db"), check_same_thread=False, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('generation', '0')")
+            stored = conn.execute("SELECT value FROM meta WHERE key = 'embedder'").fetchone()
+            if stored and stored[0] != self.embedder.name:
+                raise Exception(
+                    f"Local index was built with {stored[0]}, not {self.embedder.name}; rebuild it"
+                )
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('embedder', ?)", (self.embedder.name,))
+            self._conn = conn
+        return self._conn
+
+    def _open_vectors(self):
+        row_bytes = self.embedder.dim * 4
+        if not os.path.exists(self.vectors_path) or os.path.getsize(self.vectors_path) < row_bytes:
+            return None
+        rows = os.path.getsize(self.vectors_path) // row_bytes
+        return np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(rows, self.embedder.dim))
+
+    def _refresh(self):
+        """Reload in-memory state if this or another process changed the index"""
+        conn = self._connect()
+        generation = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+        if generation == self._generation:
+            return
+
+        names = [row[0] for row in conn.execute("SELECT name FROM segments")]
+        self._segments = {
+            name: self._segments.get(name) or Segment.load(self.segment_dir, name) for name in names
+        }
+        rows = np.array(conn.execute("SELECT id, length FROM chunks").fetchall(), dtype=np.int64).reshape(-1, 2)
+        # Removed chunks keep their postings until a merge, so size by the highest id ever assigned
+        assigned = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'chunks'").fetchone()
+        size = max(assigned[0] if assigned else 0, int(rows[:, 0].max()) if len(rows) else 0) + 1
+        self._alive = np.zeros(size, dtype=bool)
+        self._alive[rows[:, 0]] = True
+        self._lengths = np.zeros(size, dtype=np.float32)
+        self._lengths[rows[:, 0]] = rows[:, 1]
+        self._count = len(rows)
+        self._avg_length = float(rows[:, 1].mean()) if len(rows) else 1.0
+        self._vectors = self._open_vectors()
+        self._generation = generation
+
+    def _write_vectors(self, ids, vectors):
+        needed = max(ids) + 1
+        current = self._vectors.shape[0] if self._vectors is not None else 0
+        if needed > current:
+            rows = max(needed, current * 2, 1024)
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(rows * self.embedder.dim * 4)
+            self._vectors = self._open_vectors()
+        self._vectors[ids] = vectors
+        self._vectors.flush()
+
+    def _bump(self, conn):
+        conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'generation'")
+
+    def _remove(self, conn, key: str):
+        ids = [row[0] for row in conn.execute("SELECT id FROM chunks WHERE doc_key = ?", (key,))]
+        conn.execute("DELETE FROM chunks WHERE doc_key = ?", (key,))
+        conn.execute("DELETE FROM documents WHERE key = ?", (key,))
+        if ids and self._vectors is not None:
+            self._vectors[[i for i in ids if i < self._vectors.shape[0]]] = 0
+            self._vectors.flush()
+        return len(ids)
+
+    # -- writes ----------------------------------------------------------
+
+    def add_documents(self, documents):
+        """Index ``{key: text}``, replacing earlier versions of the same keys. Returns chunks added."""
+        if not documents:
+            return 0
+        prepared = []
+        for key, text in documents.items():
+            chunks = chunk_text(text)
+            prepared.append((key, chunks, [tokenize(c) for c in chunks]))
+        all_chunks = [c for _, chunks, _ in prepared for c in chunks]
+        vectors = self.embedder.embed(all_chunks) if all_chunks else None
+
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._refresh()
+                ids, token_lists = [], []
+                for key, chunks, tokens in prepared:
+                    self._remove(conn, key)
+                    for position, (chunk, chunk_tokens) in enumerate(zip(chunks, tokens)):
+                        cursor = conn.execute(
+                            "INSERT INTO chunks (doc_key, position, length, text) VALUES (?, ?, ?, ?)",
+                            (key, position, len(chunk_tokens), chunk),
+                        )
+                        ids.append(cursor.lastrowid)
+                        token_lists.append(chunk_tokens)
+                    conn.execute(
+                        "INSERT INTO documents (key, chunks) VALUES (?, ?)", (key, len(chunks))
+                    )
+                if ids:
+                    segment = Segment.build(uuid.uuid4().hex, ids, token_lists)
+                    segment.save(self.segment_dir)
+                    conn.execute("INSERT INTO segments VALUES (?, ?)", (segment.name, len(segment)))
+                    self._segments[segment.name] = segment
+                    self._write_vectors(ids, vectors)
+                self._bump(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._maybe_merge()
+            return len(ids)
+
+    def add_document(self, key: str, text: str):
+        return self.add_documents({key: text})
+
+    def remove_document(self, key: str):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._refresh()
+                removed = self._remove(conn, key)
+                self._bump(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return removed
+
+    def remove_all(self):
+        """Forget every document; other processes pick this up like any other write"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                names = [row[0] for row in conn.execute("SELECT name FROM segments")]
+                conn.execute("DELETE FROM chunks")
+                conn.execute("DELETE FROM documents")
+                conn.execute("DELETE FROM segments")
+                self._bump(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            # Ids keep counting from sqlite_sequence, so the old vector rows are never
+            # read again; they stay allocated in vectors.f32 until the index is cleared
+            for name in names:
+                os.remove(os.path.join(self.segment_dir, f"{name}.npz"))
+            self._refresh()
+
+    def clear(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            shutil.rmtree(self.path, ignore_errors=True)
+            self._generation = None
+            self._segments = {}
+            self._vectors = None
+
+    def _maybe_merge(self):
+        """Tiered merging: fold the smallest segments together so lookups stay cheap"""
+        conn = self._connect()
+        # Choose segments under the write lock so a concurrent merge or reset in
+        # another process can't retire them between the choice and the commit
+        conn.execute("BEGIN IMMEDIATE")
+        saved = None
+        try:
+            segments = conn.execute("SELECT name, postings FROM segments ORDER BY postings").fetchall()
+            if len(segments) <= MAX_SEGMENTS:
+                conn.execute("ROLLBACK")
+                return
+            names = [name for name, _ in segments[:MERGE_FACTOR]]
+            self._refresh()
+            merged = Segment.merge(uuid.uuid4().hex, [self._segments[n] for n in names], self._alive)
+            merged.save(self.segment_dir)
+            saved = os.path.join(self.segment_dir, f"{merged.name}.npz")
+            conn.executemany("DELETE FROM segments WHERE name = ?", [(n,) for n in names])
+            conn.execute("INSERT INTO segments VALUES (?, ?)", (merged.name, len(merged)))
+            self._bump(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            if saved is not None:
+                os.remove(saved)
+            raise
+        # Loaded segments are fully in memory, so other processes aren't affected
+        for name in names:
+            os.remove(os.path.join(self.segment_dir, f"{name}.npz"))
+
+    # -- reads -----------------------------------------------------------
+
+    def _bm25(self, terms, segments, alive, lengths, count, avg_length):
+        scores = np.zeros(len(alive), dtype=np.float32)
+        for term in set(terms):
+            found = [p for p in (s.postings(term) for s in segments) if p is not None]
+            if not found:
+                continue
+            ids = np.concatenate([p[0] for p in found])
+            tfs = np.concatenate([p[1] for p in found]).astype(np.float32)
+            live = alive[ids]
+            ids, tfs = ids[live], tfs[live]
+            if not len(ids):
+                continue
+            idf = np.log(1 + (count - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[ids] / avg_length)
+            # Each live chunk sits in exactly one segment, so ids are unique per term
+            scores[ids] += idf * tfs * (BM25_K1 + 1) / (tfs + norm)
+        return scores
+
+    def search(self, query: str, k: int = 5, search_type: str = None):
+        """Top ``k`` ``(chunk_id, score)`` pairs.
+
+        ``search_type`` follows the knowledge base options: ``SEMANTIC`` is
+        vector-only, anything else fuses BM25 and vector ranks (hybrid).
+        """
+        with self._lock:
+            self._refresh()
+            segments = list(self._segments.values())
+            alive, lengths, vectors = self._alive, self._lengths, self._vectors
+            count, avg_length = self._count, self._avg_length
+        if not count:
+            return []
+
+        ranked = []
+        size = min(len(alive), vectors.shape[0]) if vectors is not None else 0
+        if size:
+            q = self.embedder.embed([query])[0]
+            similarity = np.asarray(vectors[:size] @ q)
+            similarity[~alive[:size]] = -np.inf
+            top = _top_k(similarity, k if search_type == "SEMANTIC" else k * 4)
+            ranked.append([(int(i), float(similarity[i])) for i in top if np.isfinite(similarity[i])])
+        if search_type == "SEMANTIC":
+            return ranked[0][:k] if ranked else []
+
+        bm25 = self._bm25(tokenize(query), segments, alive, lengths, count, avg_length)
+        top = _top_k(bm25, k * 4)
+        ranked.append([(int(i), float(bm25[i])) for i in top if bm25[i] > 0])
+
+        fused = Counter()
+        for results in ranked:
+            for rank, (chunk_id, _) in enumerate(results):
+                fused[chunk_id] += 1.0 / (RRF_K + rank + 1)
+        return fused.most_common(k)
+
+    def retrieve(self, query: str, k: int = 5, search_type: str = None):
+        """Search results shaped like Bedrock ``retrievalResults``"""
+        hits = self.search(query, k, search_type)
+        if not hits:
+            return []
+        with self._lock:
+            rows = {
+                row[0]: row[1:] for row in self._connect().execute(
+                    f"SELECT id, doc_key, position, text FROM chunks WHERE id IN ({','.join('?' * len(hits))})",
+                    [chunk_id for chunk_id, _ in hits],
+                )
+            }
+        results = []
+        for chunk_id, score in hits:
+            if chunk_id not in rows:
+                continue
+            doc_key, position, text = rows[chunk_id]
+            uri = f"local://documents/{quote(doc_key)}"
+            results.append({
+                "content": {"text": text},
+                "location": {"type": "LOCAL", "localLocation": {"uri": uri}},
+                "metadata": {
+                    "x-amz-bedrock-kb-source-uri": uri,
+                    "x-amz-bedrock-kb-chunk-id": str(chunk_id),
+                    "chunk_position": position,
+                },
+                "score": score,
+            })
+        return results
+
+    def document_keys(self):
+        with self._lock:
+            return [row[0] for row in self._connect().execute("SELECT key FROM documents")]
+
+    def stats(self):
+        with self._lock:
+            self._refresh()
+            conn = self._connect()
+            documents = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            return {
+                "documents": documents,
+                "chunks": self._count,
+                "segments": len(self._segments),
+                "generation": int(self._generation),
+                "embedder": self.embedder.name,
+            }
+
+
+local_index = LocalIndex()
+
+
+def document_path(key: str) -> str:
+    path = os.path.realpath(os.path.join(LOCAL_DOCS_DIR, key))
+    if not path.startswith(os.path.realpath(LOCAL_DOCS_DIR) + os.sep):
+        raise ValueError(f"Invalid document key: {key}")
+    return path
+
+
+def list_documents():
+    """Stored local documents, in the same shape as ``S3Service.list_files``"""
+    files = []
+    for root, _, names in os.walk(LOCAL_DOCS_DIR):
+        for name in names:
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            files.append({
+                "key": os.path.relpath(path, LOCAL_DOCS_DIR),
+                "size": stat.st_size,
+                "last_modified": datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(),
+            })
+    return sorted(files, key=lambda f: f["key"])
+
+
+def _read_text(key: str) -> str:
+    from backend.services.documents import extract_text
+
+    with open(document_path(key), "rb") as f:
+        return extract_text(key, f.read())
+
+
+def store_document(key: str, fileobj) -> int:
+    """Keep a copy of an upload and index it; returns the chunk count (0 if no text). Blocking."""
+    path = document_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as out:
+        shutil.copyfileobj(fileobj, out)
+    text = _read_text(key)
+    if not text.strip():
+        local_index.remove_document(key)
+        return 0
+    return local_index.add_document(key, text)
+
+
+def delete_document(key: str):
+    path = document_path(key)
+    if os.path.exists(path):
+        os.remove(path)
+    local_index.remove_document(key)
+
+
+def reset():
+    """Delete every stored local document and empty the index. Blocking."""
+    if os.path.isdir(LOCAL_DOCS_DIR):
+        for name in os.listdir(LOCAL_DOCS_DIR):
+            path = os.path.join(LOCAL_DOCS_DIR, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+    local_index.remove_all()
+
+
+def rebuild(batch_size: int = 100):
+    """Re-index everything in LOCAL_DOCS_DIR and forget documents no longer there. Blocking."""
+    keys = [f["key"] for f in list_documents()]
+    for key in set(local_index.document_keys()) - set(keys):
+        local_index.remove_document(key)
+    for start in range(0, len(keys), batch_size):
+        batch = {}
+        for key in keys[start:start + batch_size]:
+            text = _read_text(key)
+            if text.strip():
+                batch[key] = text
+        local_index.add_documents(batch)
+    return local_index.stats()
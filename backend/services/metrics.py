@@ -0,0 +1,19 @@
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+
+
+def incr(name: str, amount: int = 1):
+    with _lock:
+        _counters[name] += amount
+
+
+def get(name: str) -> int:
+    return _counters.get(name, 0)
+
+
+def snapshot():
+    with _lock:
+        return dict(_counters)
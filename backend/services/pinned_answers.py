@@ -0,0 +1,253 @@
+"""Admin-approved answers served before retrieval-augmented generation.
+
+Active pinned answers are compiled into a matcher held by each worker:
+
+- every phrasing is reduced to its content terms (case, punctuation and
+  common function words dropped, plural "s" trimmed);
+- a trie over those term sequences recognizes phrasings that occur
+  verbatim inside a message;
+- an inverted index plus single-edit deletion variants (as in SymSpell)
+  finds phrasings that share terms with a message, typos included.
+
+A message matches the phrasing with the highest Dice coefficient over
+terms, plus PHRASE_BONUS when the phrasing occurs verbatim and in order, if
+that reaches PINNED_MATCH_THRESHOLD. Matching costs a few dictionary
+lookups per message term plus scoring the phrasings that share a term.
+"""
+import asyncio
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from backend.database import SessionLocal
+from backend.models.pinned import PinnedAnswer, PinnedAnswerStats
+from backend.services import cache_versions, metrics
+
+PINNED_MATCH_THRESHOLD = float(os.getenv("PINNED_MATCH_THRESHOLD", "0.8"))
+# Same cadence as the exam question cache
+PINNED_CHECK_INTERVAL = float(os.getenv("EXAM_CACHE_CHECK_INTERVAL", "2"))
+PINNED_STATS_FLUSH_INTERVAL = 10.0
+
+# A term matched through a one-letter typo counts for this much of a term
+FUZZY_WEIGHT = 0.8
+PHRASE_BONUS = 0.1
+# Typo tolerance only for terms long enough that one edit rarely changes the word
+FUZZY_MIN_LENGTH = 5
+
+STOPWORDS = frozenset("""
+a an the is are am was were be been being do does did i me my mine we us our you your
+it its to of in on at for from with by and or but if so how what when where who whom
+which why can could would should will shall may might must please hi hello hey there
+this that these those any some about tell know want need get got
+""".split())
+
+_WORD = re.compile(r"[a-z0-9]+")
+_END = None  # Trie key marking the end of a phrasing
+
+
+def _stem(word: str) -> str:
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def terms(text: str):
+    words = _WORD.findall(text.casefold())
+    content = [_stem(w) for w in words if w not in STOPWORDS]
+    # A message made only of function words ("who are you") still has to match something
+    return content or [_stem(w) for w in words]
+
+
+def _deletions(term: str):
+    if len(term) < FUZZY_MIN_LENGTH:
+        return ()
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def phrasings(entry) -> list:
+    lines = [entry.question, *(entry.phrases or "").splitlines()]
+    return [line.strip() for line in lines if line.strip()]
+
+
+class Matcher:
+    def __init__(self, entries=()):
+        """``entries`` are (id, answer, [phrasing, ...]) tuples"""
+        self.answers = {}
+        self.phrases = []  # (entry id, terms)
+        self.trie = {}
+        self.postings = {}  # term -> phrase indexes
+        self.variants = {}  # term or deletion variant -> indexed terms
+        for entry_id, answer, texts in entries:
+            self.answers[entry_id] = answer
+            for text in texts:
+                phrase_terms = tuple(terms(text))
+                if not phrase_terms:
+                    continue
+                index = len(self.phrases)
+                self.phrases.append((entry_id, phrase_terms))
+                node = self.trie
+                for term in phrase_terms:
+                    node = node.setdefault(term, {})
+                node.setdefault(_END, []).append(index)
+                for term in set(phrase_terms):
+                    if term not in self.postings:
+                        self.postings[term] = []
+                        self.variants.setdefault(term, set()).add(term)
+                        for variant in _deletions(term):
+                            self.variants.setdefault(variant, set()).add(term)
+                    self.postings[term].append(index)
+
+    def _term_weights(self, query_terms):
+        """Indexed term -> best weight of any query term that matches it"""
+        weights = {}
+        for term in set(query_terms):
+            if term in self.postings:
+                weights[term] = 1.0
+            for candidate in self.variants.get(term, ()):
+                weights.setdefault(candidate, FUZZY_WEIGHT)
+            for variant in _deletions(term):
+                for candidate in self.variants.get(variant, ()):
+                    weights.setdefault(candidate, FUZZY_WEIGHT)
+        return weights
+
+    def match(self, message: str, threshold: float = PINNED_MATCH_THRESHOLD):
+        """(entry id, answer, score) of the best phrasing reaching ``threshold``, else None"""
+        if not self.phrases:
+            return None
+        query = terms(message)
+        if not query:
+            return None
+
+        # Phrasings sharing terms with the message, typos included
+        weights = self._term_weights(query)
+        overlap = {}
+        for term, weight in weights.items():
+            for index in self.postings[term]:
+                overlap[index] = overlap.get(index, 0.0) + weight
+        scores = {}
+        for index, shared in overlap.items():
+            length = len(self.phrases[index][1])
+            scores[index] = 2 * min(shared, length, len(query)) / (length + len(query))
+
+        # Phrasings contained verbatim in the message
+        for start in range(len(query)):
+            node = self.trie
+            for term in query[start:]:
+                node = node.get(term)
+                if node is None:
+                    break
+                for index in node.get(_END, ()):
+                    scores[index] = min(1.0, scores[index] + PHRASE_BONUS)
+
+        if not scores:
+            return None
+        best = max(scores, key=scores.get)
+        if scores[best] < threshold:
+            return None
+        entry_id = self.phrases[best][0]
+        return entry_id, self.answers[entry_id], round(scores[best], 3)
+
+
+class PinnedAnswerCache:
+    """The compiled matcher, rebuilt when pinned answers change in any worker"""
+
+    def __init__(self):
+        self._matcher = Matcher()
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._hits = {}
+        self._task = None
+        self._stopping = False
+
+    def matcher(self, db: Session) -> Matcher:
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < PINNED_CHECK_INTERVAL:
+            return self._matcher
+        version = cache_versions.current(db, cache_versions.PINNED_ANSWERS)
+        if version != self._version:
+            entries = db.query(PinnedAnswer).filter(PinnedAnswer.is_active == True).all()
+            self._matcher = Matcher((e.id, e.answer, phrasings(e)) for e in entries)
+            self._version = version
+        self._checked_at = now
+        return self._matcher
+
+    def changed(self, db: Session):
+        """Record a change to pinned answers in ``db``'s transaction, for every worker"""
+        cache_versions.bump(db, cache_versions.PINNED_ANSWERS)
+
+    def invalidate(self):
+        self._version = None
+
+    def match(self, db: Session, message: str):
+        found = self.matcher(db).match(message)
+        if found is None:
+            metrics.incr("pinned_misses")
+            return None
+        metrics.incr("pinned_hits")
+        with self._lock:
+            self._hits[found[0]] = self._hits.get(found[0], 0) + 1
+        return found
+
+    def discard_hits(self):
+        """Drop unflushed hit counts, whose entries no longer exist"""
+        with self._lock:
+            self._hits = {}
+
+    def _write_hits(self, hits):
+        db = SessionLocal()
+        try:
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            stmt = sqlite_insert(PinnedAnswerStats).values([
+                {"pinned_answer_id": entry_id, "hits": count, "last_hit_at": now}
+                for entry_id, count in hits.items()
+            ])
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=[PinnedAnswerStats.pinned_answer_id],
+                set_={"hits": PinnedAnswerStats.hits + stmt.excluded.hits, "last_hit_at": stmt.excluded.last_hit_at},
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    async def flush_stats(self):
+        with self._lock:
+            hits, self._hits = self._hits, {}
+        if not hits:
+            return
+        try:
+            await run_in_threadpool(self._write_hits, hits)
+        except Exception as e:
+            print(f"[PINNED] Failed to write match stats: {e}")
+
+    async def _run(self):
+        while not self._stopping:
+            await asyncio.sleep(PINNED_STATS_FLUSH_INTERVAL)
+            await self.flush_stats()
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopping = True
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.flush_stats()
+
+
+pinned_answers = PinnedAnswerCache()
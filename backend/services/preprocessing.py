@@ -0,0 +1,127 @@
+"""Optional clean-up of uploads before they reach the knowledge base bucket.
+
+With ``Config.preprocess_uploads`` on, each uploaded document is converted
+to plain text in a process pool: extracted, normalized, stripped of headers
+and footers that repeat on most pages, and split into parts of at most
+PREPROCESS_PART_CHARS characters. The parts are uploaded to S3 as
+``<filename>.txt`` / ``<filename>.part-NNN.txt`` instead of the original, so
+ingestion jobs parse and embed less data. Files whose text can't be extracted
+(unsupported formats, scanned PDFs without a text layer) are uploaded as-is.
+"""
+import multiprocessing
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from backend.services.documents import extract_pages
+
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+PREPROCESS_PART_CHARS = int(os.getenv("PREPROCESS_PART_CHARS", "200000"))
+
+# Lines looked at for headers/footers at each end of a page, and the share of
+# pages a line must appear on (with digits ignored, for page numbers) to count
+EDGE_LINES = 3
+REPEAT_RATIO = 0.5
+MIN_PAGES = 3
+
+_HYPHENATED = re.compile(r"(\w)-\n(\w)")
+_SPACES = re.compile(r"[ \t]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+_CONTROL = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]")
+_DIGITS = re.compile(r"\d+")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).replace("\r\n", "\n").replace("\r", "\n")
+    text = _CONTROL.sub("", text)
+    text = _HYPHENATED.sub(r"\1\2", text)
+    lines = [_SPACES.sub(" ", line).strip() for line in text.split("\n")]
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+def _edge_key(line: str) -> str:
+    return _DIGITS.sub("#", line.lower())
+
+
+def strip_repeated_lines(pages):
+    """Drop lines near the top or bottom of a page that recur on most pages"""
+    if len(pages) < MIN_PAGES:
+        return pages
+    split = [page.split("\n") for page in pages]
+    counts = Counter()
+    for lines in split:
+        edges = lines[:EDGE_LINES] + lines[-EDGE_LINES:]
+        counts.update({_edge_key(line) for line in edges if line})
+    threshold = max(2, len(pages) * REPEAT_RATIO)
+    repeated = {key for key, count in counts.items() if count >= threshold}
+    if not repeated:
+        return pages
+
+    cleaned = []
+    for lines in split:
+        head, tail = min(EDGE_LINES, len(lines)), max(len(lines) - EDGE_LINES, 0)
+        cleaned.append("\n".join(
+            line for i, line in enumerate(lines)
+            if not ((i < head or i >= tail) and _edge_key(line) in repeated)
+        ))
+    return cleaned
+
+
+def split_parts(text: str, limit: int = PREPROCESS_PART_CHARS):
+    """Split at paragraph boundaries into parts no longer than ``limit``"""
+    if len(text) <= limit:
+        return [text]
+    parts, current, size = [], [], 0
+    for paragraph in text.split("\n\n"):
+        while len(paragraph) > limit:
+            # A single paragraph longer than a part: cut at the last space that fits
+            cut = paragraph.rfind(" ", 0, limit)
+            cut = cut if cut > 0 else limit
+            if current:
+                parts.append("\n\n".join(current))
+                current, size = [], 0
+            parts.append(paragraph[:cut])
+            paragraph = paragraph[cut:].lstrip()
+        if current and size + len(paragraph) + 2 > limit:
+            parts.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(paragraph)
+        size += len(paragraph) + 2
+    if current:
+        parts.append("\n\n".join(current))
+    return parts
+
+
+def preprocess(filename: str, data: bytes):
+    """(key, text) parts to upload in place of ``filename``; empty to upload the original"""
+    try:
+        pages = extract_pages(filename, data)
+    except Exception as e:
+        print(f"Could not extract text from {filename}: {e}")
+        return []
+    pages = strip_repeated_lines([normalize(page) for page in pages])
+    text = _BLANK_LINES.sub("\n\n", "\n\n".join(page for page in pages if page)).strip()
+    if not text:
+        return []
+    parts = split_parts(text)
+    if len(parts) == 1:
+        return [(f"{filename}.txt", parts[0])]
+    return [(f"{filename}.part-{i:03d}.txt", part) for i, part in enumerate(parts, 1)]
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the server process has running threads and open clients
+            _pool = ProcessPoolExecutor(
+                max_workers=PREPROCESS_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
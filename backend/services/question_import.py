@@ -0,0 +1,152 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import uuid
+import zipfile
+from pydantic import BaseModel, ValidationError, field_validator, model_validator
+from typing import Optional
+from backend.services import image_service
+
+MAX_IMPORT_ROWS = int(os.getenv("MAX_IMPORT_ROWS", "5000"))
+IMAGE_EXTENSIONS = ("png", "jpg", "jpeg", "gif", "webp", "bmp", "svg")
+
+
+class QuestionImportError(Exception):
+    pass
+
+
+class ImportedQuestion(BaseModel):
+    question_text: str
+    question_image_url: Optional[str] = None
+    # File name of an image inside the uploaded ZIP
+    image: Optional[str] = None
+    option_a: str
+    option_b: str
+    option_c: Optional[str] = None
+    option_d: Optional[str] = None
+    correct_answer: str
+    explanation: Optional[str] = None
+    order_index: Optional[int] = None
+    is_active: Optional[bool] = None
+    category: Optional[str] = None
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def blank_to_none(cls, value):
+        # CSV has no null, so empty cells mean "not set"
+        if isinstance(value, str) and not value.strip():
+            return None
+        return value
+
+    @field_validator("correct_answer")
+    @classmethod
+    def upper_answer(cls, value):
+        return value.strip().upper()
+
+    @model_validator(mode="after")
+    def answer_has_option(self):
+        if self.correct_answer not in ("A", "B", "C", "D"):
+            raise ValueError("correct_answer must be one of A, B, C, D")
+        if not getattr(self, f"option_{self.correct_answer.lower()}"):
+            raise ValueError(f"correct_answer {self.correct_answer} refers to an empty option")
+        return self
+
+
+def _read_csv(data: bytes):
+    return list(csv.DictReader(io.StringIO(data.decode("utf-8-sig"))))
+
+
+def _read_json(data: bytes):
+    rows = json.loads(data)
+    if isinstance(rows, dict):
+        rows = rows.get("questions")
+    if not isinstance(rows, list):
+        raise QuestionImportError("JSON must be a list of questions or {\"questions\": [...]}")
+    return rows
+
+
+def read_rows(filename: str, fileobj):
+    """Parse an upload into raw rows.
+
+    Returns ``(rows, archive)``; ``archive`` is the open ZipFile for ZIP
+    uploads so referenced images can be extracted, otherwise None.
+    """
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if ext == "csv":
+        return _read_csv(fileobj.read()), None
+    if ext == "json":
+        return _read_json(fileobj.read()), None
+    if ext != "zip":
+        raise QuestionImportError("Upload a .csv, .json or .zip file")
+
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        raise QuestionImportError("Not a valid ZIP file")
+    names = [n for n in archive.namelist() if not n.startswith("__MACOSX/")]
+    for name in names:
+        if os.path.basename(name) in ("questions.csv", "questions.json"):
+            data = archive.read(name)
+            rows = _read_csv(data) if name.endswith(".csv") else _read_json(data)
+            return rows, archive
+    raise QuestionImportError("ZIP must contain questions.csv or questions.json")
+
+
+def _image_members(archive):
+    return {os.path.basename(info.filename): info for info in archive.infolist() if not info.is_dir()}
+
+
+def validate_rows(rows, archive=None):
+    """Validate every row before anything is written; returns (questions, errors)"""
+    if len(rows) > MAX_IMPORT_ROWS:
+        return [], [{"row": None, "error": f"At most {MAX_IMPORT_ROWS} questions per import"}]
+
+    members = _image_members(archive) if archive is not None else {}
+
+    questions, errors = [], []
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            errors.append({"row": number, "error": "Expected an object"})
+            continue
+        try:
+            question = ImportedQuestion.model_validate(row)
+        except ValidationError as e:
+            errors.append({"row": number, "error": "; ".join(
+                f"{'.'.join(str(p) for p in err['loc']) or 'row'}: {err['msg']}" for err in e.errors()
+            )})
+            continue
+        if question.image:
+            info = members.get(os.path.basename(question.image))
+            if info is None:
+                errors.append({"row": number, "error": f"image {question.image} not found in ZIP"})
+                continue
+            if info.file_size > image_service.MAX_IMAGE_BYTES:
+                errors.append({"row": number, "error": f"image {question.image} is too large"})
+                continue
+            if question.image.rsplit(".", 1)[-1].lower() not in IMAGE_EXTENSIONS:
+                errors.append({"row": number, "error": f"image {question.image} is not a supported image type"})
+                continue
+        questions.append(question)
+    return questions, errors
+
+
+def extract_images(questions, archive):
+    """Store each referenced ZIP image once; returns {name: stored files}. Blocking."""
+    stored = {}
+    members = _image_members(archive)
+    os.makedirs(image_service.EXAM_IMAGE_DIR, exist_ok=True)
+    for question in questions:
+        name = os.path.basename(question.image) if question.image else None
+        if not name or name in stored:
+            continue
+        member = members[name]
+        tmp_path = os.path.join(image_service.EXAM_IMAGE_DIR, f".upload-{uuid.uuid4().hex}")
+        digest = hashlib.sha256()
+        with archive.open(member) as src, open(tmp_path, "wb") as out:
+            while chunk := src.read(image_service.UPLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+                out.write(chunk)
+        stored[name] = image_service.store_image(tmp_path, digest.hexdigest(), name.rsplit(".", 1)[-1])
+    return stored
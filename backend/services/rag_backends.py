@@ -0,0 +1,98 @@
+"""Pluggable retrieval and generation for the retrieve-then-generate pipeline.
+
+``Config.retrieval_backend`` picks where passages come from and
+``Config.local_generator`` how the answer is written when retrieval is local.
+"""
+import re
+from abc import ABC, abstractmethod
+
+RETRIEVAL_BACKENDS = ("bedrock", "local")
+LOCAL_GENERATORS = ("extractive", "bedrock")
+
+EXTRACTIVE_MAX_SENTENCES = 4
+NO_ANSWER = "I couldn't find anything about that in the available documents."
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+
+class Retriever(ABC):
+    @abstractmethod
+    def retrieve(self, query: str, k: int, search_type: str = None):
+        """Passages shaped like Bedrock ``retrievalResults``"""
+
+
+class BedrockRetriever(Retriever):
+    """Knowledge base retrieval through the Bedrock Retrieve API"""
+
+    def __init__(self, service):
+        self.service = service
+
+    def retrieve(self, query: str, k: int, search_type: str = None):
+        return self.service.retrieve(query, k, search_type)
+
+
+class LocalRetriever(Retriever):
+    """Documents uploaded through /admin/upload, indexed on this host"""
+
+    def retrieve(self, query: str, k: int, search_type: str = None):
+        from backend.services.local_index import local_index
+
+        return local_index.retrieve(query, k, search_type)
+
+
+class Generator(ABC):
+    @abstractmethod
+    def generate(self, question: str, passages, history, on_text=None, cancel=None):
+        """The answer text; also passed to ``on_text`` as it is written, if given"""
+
+
+class ExtractiveGenerator(Generator):
+    """Answers with the retrieved sentences that share the most terms with the question.
+
+    Needs no model or network access, which makes it suitable for
+    development, CI and air-gapped installs.
+    """
+
+    def generate(self, question: str, passages, history, on_text=None, cancel=None):
+        answer = self._extract(question, passages)
+        if on_text is not None:
+            on_text(answer)
+        return answer
+
+    def _extract(self, question: str, passages):
+        from backend.services.local_index import tokenize
+
+        terms = set(tokenize(question))
+        candidates = []
+        for rank, passage in enumerate(passages):
+            for position, sentence in enumerate(_SENTENCE.split(passage["content"]["text"])):
+                overlap = len(terms & set(tokenize(sentence)))
+                if overlap:
+                    # Prefer more shared terms, then better-ranked passages, then reading order
+                    candidates.append((-overlap, rank, position, sentence.strip()))
+        if not candidates:
+            return NO_ANSWER
+        best = sorted(candidates)[:EXTRACTIVE_MAX_SENTENCES]
+        return " ".join(sentence for _, _, _, sentence in sorted(best, key=lambda c: (c[1], c[2])))
+
+
+class BedrockGenerator(Generator):
+    """Writes the answer with the configured Bedrock model via the Converse API"""
+
+    def __init__(self, service):
+        self.service = service
+
+    def generate(self, question: str, passages, history, on_text=None, cancel=None):
+        return self.service.converse(question, passages, history, on_text, cancel)
+
+
+def get_retriever(config, service) -> Retriever:
+    if config.retrieval_backend == "local":
+        return LocalRetriever()
+    return BedrockRetriever(service)
+
+
+def get_generator(config, service) -> Generator:
+    if config.retrieval_backend == "local" and config.local_generator != "bedrock":
+        return ExtractiveGenerator()
+    return BedrockGenerator(service)
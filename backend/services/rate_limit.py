@@ -0,0 +1,255 @@
+"""Token-bucket rate limiting for the public chat and exam endpoints.
+
+Each route group ("chat", "exam") has a per-client allowance in requests per
+minute, set in the admin config; a client may burst up to a minute's worth
+and then refills continuously. Clients are told apart by IP address, chat or
+exam session id, or embedding site, depending on ``Config.rate_limit_key``.
+
+Limiting by IP address needs TRUSTED_PROXIES: behind a proxy every request
+comes from the proxy's address, so until the proxy is named, clients that
+would be told apart by IP are not limited at all rather than all sharing
+one bucket.
+
+Buckets live in process memory unless RATE_LIMIT_STORE_URL points at a
+Redis-protocol server, which makes the limit shared by every worker.
+"""
+import ipaddress
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import orjson
+from fastapi import HTTPException, Request
+from starlette.requests import HTTPConnection
+
+from backend.database import SessionLocal
+from backend.models.config import Config
+from backend.services import metrics
+
+RATE_LIMIT_STORE_URL = os.getenv("RATE_LIMIT_STORE_URL", "")
+# Proxies (addresses or CIDRs, comma separated) whose X-Real-IP header is believed
+TRUSTED_PROXIES = os.getenv("TRUSTED_PROXIES", "")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Seconds the limits read from the admin config are reused before re-reading
+RATE_LIMIT_CONFIG_TTL = 5.0
+
+RATE_LIMIT_KEYS = ("ip", "session", "origin")
+DEFAULT_RATE_LIMITS = {"chat": 20, "exam": 120}
+
+
+class MemoryBuckets:
+    """Buckets for the most recently seen clients, oldest evicted first"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, capacity: float):
+        """Spend one token; returns seconds to wait, 0 when allowed"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = [capacity, now]
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / rate
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+# Refill, spend and expire in one round trip so concurrent workers can't overspend
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - ts, 0) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisBuckets:
+    key_prefix = "rate_limit:"
+
+    def __init__(self, url: str):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._take = self._redis.register_script(_TAKE_SCRIPT)
+        self._fallback = MemoryBuckets()
+
+    def take(self, key: str, rate: float, capacity: float):
+        try:
+            return float(self._take(keys=[self.key_prefix + key], args=[rate, capacity, time.time()]))
+        except Exception as e:
+            # Keep limiting per worker rather than failing requests while Redis is away
+            print(f"[RATE LIMIT] Redis unavailable, limiting in-process: {e}")
+            return self._fallback.take(key, rate, capacity)
+
+    def clear(self):
+        self._fallback.clear()
+
+
+def _create_buckets():
+    if RATE_LIMIT_STORE_URL.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBuckets(RATE_LIMIT_STORE_URL)
+    return MemoryBuckets()
+
+
+buckets = _create_buckets()
+
+_settings = None
+_settings_at = 0.0
+
+
+def _load_settings():
+    db = SessionLocal()
+    try:
+        config = db.query(Config).first()
+    finally:
+        db.close()
+    if not config:
+        return {"key": "ip", **DEFAULT_RATE_LIMITS}
+    return {
+        "key": config.rate_limit_key or "ip",
+        "chat": config.chat_rate_limit,
+        "exam": config.exam_rate_limit,
+    }
+
+
+def settings():
+    global _settings, _settings_at
+    if _settings is None or time.monotonic() - _settings_at > RATE_LIMIT_CONFIG_TTL:
+        _settings, _settings_at = _load_settings(), time.monotonic()
+    return _settings
+
+
+def invalidate():
+    """Pick up changed limits on the next request, in this worker"""
+    global _settings
+    _settings = None
+
+
+def parse_networks(value: str):
+    return [ipaddress.ip_network(part.strip(), strict=False) for part in value.split(",") if part.strip()]
+
+
+trusted_proxies = parse_networks(TRUSTED_PROXIES)
+
+
+def client_ip(request: HTTPConnection) -> str:
+    peer = request.client.host if request.client else "unknown"
+    forwarded = request.headers.get("x-real-ip")
+    if forwarded and trusted_proxies:
+        # Anyone else could pick a new address, and so a fresh bucket, per request
+        try:
+            address = ipaddress.ip_address(peer)
+        except ValueError:
+            return peer
+        if any(address in network for network in trusted_proxies):
+            return forwarded.strip()
+    return peer
+
+
+def client_origin(request: HTTPConnection):
+    origin = request.headers.get("origin")
+    if origin and origin != "null":
+        return origin
+    referer = request.headers.get("referer")
+    if referer:
+        parts = urlsplit(referer)
+        if parts.netloc:
+            return f"{parts.scheme}://{parts.netloc}"
+    return None
+
+
+async def client_session(request: Request):
+    """The chat or exam session id from the JSON body, if any"""
+    if request.method != "POST":
+        return None
+    try:
+        # Starlette keeps the body, so the endpoint doesn't read it again
+        body = orjson.loads(await request.body())
+    except orjson.JSONDecodeError:
+        return None
+    if not isinstance(body, dict):
+        return None
+    return body.get("session_id") or body.get("exam_session_id")
+
+
+def connection_key(conn: HTTPConnection, mode: str, session_id: str = None):
+    """Bucket key for the client, or None when it can't be told apart from others"""
+    if mode == "session":
+        if session_id:
+            return f"session:{session_id}"
+    elif mode == "origin":
+        origin = client_origin(conn)
+        if origin:
+            return f"origin:{origin}"
+    if not trusted_proxies:
+        return None
+    return f"ip:{client_ip(conn)}"
+
+
+async def client_key(request: Request, mode: str):
+    session_id = await client_session(request) if mode == "session" else None
+    return connection_key(request, mode, session_id)
+
+
+def warn_if_unconfigured():
+    if not trusted_proxies:
+        print("[RATE LIMIT] TRUSTED_PROXIES is not set; clients are not rate limited by IP address")
+
+
+def wait_time(route: str, key: str) -> float:
+    """Spend one of the client's tokens for ``route``; seconds to wait, 0 when allowed"""
+    per_minute = settings().get(route)
+    if not per_minute or key is None:
+        return 0.0
+    wait = buckets.take(f"{route}:{key}", per_minute / 60.0, float(per_minute))
+    if wait:
+        metrics.incr(f"rate_limited_{route}")
+    return wait
+
+
+def rate_limit(route: str):
+    """Dependency enforcing the ``route`` group's per-client limit"""
+
+    async def check(request: Request):
+        current = settings()
+        if not current.get(route):
+            return
+        wait = wait_time(route, await client_key(request, current["key"]))
+        if wait:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests. Please slow down.",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+
+    return check
@@ -0,0 +1,93 @@
+"""Startup warm-up and the checks behind /readyz.
+
+Uvicorn only starts accepting connections once the lifespan startup has
+finished, so warming up there keeps the first requests after a deploy from
+paying for client construction, the STS account lookup and the local index
+load. /readyz reports whether this worker finished warming up and can reach
+a database whose migrations have been applied; results are cached for
+READINESS_CHECK_TTL seconds so frequent probes cost nothing.
+"""
+import asyncio
+import os
+import time
+
+from fastapi.concurrency import run_in_threadpool
+
+from backend.database import SessionLocal
+from backend.migrations import LATEST_VERSION, schema_version
+from backend.models.config import Config
+from backend.services.bedrock_service import BedrockService
+
+READINESS_CHECK_TTL = float(os.getenv("READINESS_CHECK_TTL", "5"))
+# Startup goes ahead without a warm AWS client rather than hang on the network
+STARTUP_WARMUP_TIMEOUT = float(os.getenv("STARTUP_WARMUP_TIMEOUT", "20"))
+
+
+class Readiness:
+    def __init__(self):
+        self.warmed = False
+        # Outcome of the AWS part of the warm-up, reported by /readyz
+        self.aws = "pending"
+        self._checks = None
+        self._checked_at = 0.0
+
+    def _warm_up(self):
+        db = SessionLocal()
+        try:
+            version = schema_version(db.connection())
+            if version < LATEST_VERSION:
+                # Nothing to read yet; /readyz keeps reporting this until migrations run
+                print(f"[STARTUP] Database schema is at version {version}, expected {LATEST_VERSION}; "
+                      "run python -m backend.migrations")
+                self.aws = "not checked"
+                return
+            config = db.query(Config).first()
+            # Local retrieval with the extractive generator runs without AWS credentials
+            if not config or not (config.aws_access_key_id or config.retrieval_backend == "local"):
+                self.aws = "unconfigured"
+                return
+            try:
+                BedrockService(db).warm_up()
+                self.aws = "ok"
+            except Exception as e:
+                # Serve anyway: the admin UI is how credentials get fixed
+                self.aws = f"error: {e}"
+                print(f"[STARTUP] AWS warm-up failed: {e}")
+        finally:
+            db.close()
+
+    async def warm_up(self):
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(run_in_threadpool(self._warm_up), STARTUP_WARMUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.aws = "error: warm-up timed out"
+            print(f"[STARTUP] Warm-up gave up after {STARTUP_WARMUP_TIMEOUT:.0f}s")
+        self.warmed = True
+        print(f"[STARTUP] Warmed up in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    def _run_checks(self):
+        db = SessionLocal()
+        try:
+            version = schema_version(db.connection())
+            if version < LATEST_VERSION:
+                database = f"schema at version {version}, expected {LATEST_VERSION}; run python -m backend.migrations"
+            else:
+                database = "ok"
+        except Exception as e:
+            database = f"error: {e}"
+        finally:
+            db.close()
+        return {"database": database}
+
+    async def status(self):
+        """(ready, checks); only the database decides readiness, AWS state is informational"""
+        if not self.warmed:
+            return False, {"warm_up": "pending"}
+        if self._checks is None or time.monotonic() - self._checked_at > READINESS_CHECK_TTL:
+            self._checks = await run_in_threadpool(self._run_checks)
+            self._checked_at = time.monotonic()
+        return self._checks["database"] == "ok", {**self._checks, "aws": self.aws}
+
+
+readiness = Readiness()
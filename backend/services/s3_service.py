@@ -1,7 +1,7 @@
-import boto3
 import os
 from sqlalchemy.orm import Session
 from backend.models.config import Config
+from backend.services import aws_clients
 
 class S3Service:
     def __init__(self, db: Session):
@@ -11,33 +11,13 @@ class S3Service:
         self._bedrock_agent_client = None
 
     def _get_s3_client(self):
-        if self._s3_client:
-            return self._s3_client
-        
-        if not self.config or not self.config.aws_access_key_id:
-            raise Exception("AWS credentials not configured")
-
-        self._s3_client = boto3.client(
-            "s3",
-            region_name=self.config.aws_region,
-            aws_access_key_id=self.config.aws_access_key_id,
-            aws_secret_access_key=self.config.aws_secret_access_key,
-        )
+        if not self._s3_client:
+            self._s3_client = aws_clients.get_client("s3", self.config)
         return self._s3_client
 
     def _get_bedrock_agent_client(self):
-        if self._bedrock_agent_client:
-            return self._bedrock_agent_client
-            
-        if not self.config or not self.config.aws_access_key_id:
-            raise Exception("AWS credentials not configured")
-
-        self._bedrock_agent_client = boto3.client(
-            "bedrock-agent",
-            region_name=self.config.aws_region,
-            aws_access_key_id=self.config.aws_access_key_id,
-            aws_secret_access_key=self.config.aws_secret_access_key,
-        )
+        if not self._bedrock_agent_client:
+            self._bedrock_agent_client = aws_clients.get_client("bedrock-agent", self.config)
         return self._bedrock_agent_client
 
     def upload_file(self, file_obj, filename: str, bucket_name: str):
@@ -49,6 +29,28 @@ class S3Service:
             print(f"Error uploading to S3: {e}")
             raise e
 
+    def upload_path(self, path: str, bucket_name: str, key: str):
+        s3 = self._get_s3_client()
+        try:
+            s3.upload_file(path, bucket_name, key)
+            return True
+        except Exception as e:
+            print(f"Error uploading to S3: {e}")
+            raise e
+
+    def download_path(self, bucket_name: str, key: str, path: str):
+        s3 = self._get_s3_client()
+        tmp_path = f"{path}.download"
+        try:
+            s3.download_file(bucket_name, key, tmp_path)
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            print(f"Error downloading from S3: {e}")
+            raise e
+
     def list_files(self, bucket_name: str):
         s3 = self._get_s3_client()
         try:
@@ -89,3 +91,17 @@ class S3Service:
         except Exception as e:
             print(f"Error starting ingestion job: {e}")
             raise e
+
+
+    def get_ingestion_job(self, job_id: str):
+        client = self._get_bedrock_agent_client()
+        try:
+            response = client.get_ingestion_job(
+                knowledgeBaseId=self.config.kb_id,
+                dataSourceId=self.config.data_source_id,
+                ingestionJobId=job_id
+            )
+            return response['ingestionJob']
+        except Exception as e:
+            print(f"Error getting ingestion job: {e}")
+            raise e
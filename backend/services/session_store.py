@@ -0,0 +1,109 @@
+import json
+import os
+import time
+from backend.services.ttl_cache import TTLCache
+
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "1800"))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+SESSION_MAX_HISTORY_TURNS = int(os.getenv("SESSION_MAX_HISTORY_TURNS", "6"))
+SESSION_STORE_URL = os.getenv("SESSION_STORE_URL", "")
+
+# Stored history is only a context window, so long answers are clipped
+HISTORY_TEXT_LIMIT = 2000
+
+
+class ChatSession:
+    __slots__ = ("bedrock_session_id", "created_at", "last_used", "turns", "history")
+
+    def __init__(self, bedrock_session_id=None, created_at=None, last_used=None, turns=0, history=None):
+        now = time.time()
+        self.bedrock_session_id = bedrock_session_id
+        self.created_at = created_at or now
+        self.last_used = last_used or now
+        self.turns = turns
+        # List of [question, answer] pairs, oldest first
+        self.history = history or []
+
+    def add_turn(self, question: str, answer: str):
+        self.turns += 1
+        self.last_used = time.time()
+        self.history.append([question[:HISTORY_TEXT_LIMIT], answer[:HISTORY_TEXT_LIMIT]])
+        if len(self.history) > SESSION_MAX_HISTORY_TURNS:
+            del self.history[:-SESSION_MAX_HISTORY_TURNS]
+
+    def to_dict(self):
+        return {
+            "bedrock_session_id": self.bedrock_session_id,
+            "created_at": self.created_at,
+            "last_used": self.last_used,
+            "turns": self.turns,
+            "history": self.history,
+        }
+
+
+class MemorySessionStore:
+    """In-process session store, bounded by LRU size and idle TTL."""
+
+    def __init__(self, max_entries: int = SESSION_MAX_ENTRIES, ttl: float = SESSION_TTL_SECONDS):
+        self._cache = TTLCache(max_entries=max_entries, ttl=ttl)
+
+    def get(self, session_id: str):
+        return self._cache.get(session_id)
+
+    def save(self, session_id: str, session: ChatSession):
+        # Re-setting refreshes both the LRU position and the idle TTL
+        self._cache.set(session_id, session)
+
+    def delete(self, session_id: str):
+        self._cache.pop(session_id)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        self._cache.purge_expired()
+        return {"backend": "memory", **self._cache.stats()}
+
+
+class RedisSessionStore:
+    """Session store backed by any Redis-protocol server (Redis, Valkey, KeyDB...).
+
+    Memory bounding is delegated to the server's ``maxmemory`` policy; idle
+    expiry uses per-key TTLs.
+    """
+
+    key_prefix = "chat_session:"
+
+    def __init__(self, url: str, ttl: float = SESSION_TTL_SECONDS):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self.ttl = int(ttl)
+
+    def get(self, session_id: str):
+        raw = self._redis.get(self.key_prefix + session_id)
+        if raw is None:
+            return None
+        return ChatSession(**json.loads(raw))
+
+    def save(self, session_id: str, session: ChatSession):
+        self._redis.set(self.key_prefix + session_id, json.dumps(session.to_dict()), ex=self.ttl)
+
+    def delete(self, session_id: str):
+        self._redis.delete(self.key_prefix + session_id)
+
+    def clear(self):
+        for key in self._redis.scan_iter(match=self.key_prefix + "*", count=1000):
+            self._redis.delete(key)
+
+    def stats(self):
+        return {"backend": "redis", "ttl_seconds": self.ttl}
+
+
+def _create_store():
+    if SESSION_STORE_URL.startswith(("redis://", "rediss://", "unix://")):
+        return RedisSessionStore(SESSION_STORE_URL)
+    return MemorySessionStore()
+
+
+session_store = _create_store()
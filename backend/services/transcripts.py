@@ -0,0 +1,146 @@
+"""Chat transcript logging that never slows down or blocks a chat request.
+
+Turns are appended to a bounded in-memory buffer and written to the
+``chat_transcripts`` table in batches by a background task. When the
+database can't keep up and the buffer is full, new turns are dropped (and
+counted) rather than making requests wait.
+"""
+import asyncio
+import os
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+import orjson
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
+
+from backend.database import SessionLocal
+from backend.models.transcript import ChatTranscript
+from backend.services import metrics
+from backend.services.citations import source_uri
+
+TRANSCRIPT_LOGGING = os.getenv("TRANSCRIPT_LOGGING", "true").lower() not in ("0", "false", "no")
+TRANSCRIPT_BUFFER_SIZE = int(os.getenv("TRANSCRIPT_BUFFER_SIZE", "10000"))
+TRANSCRIPT_BATCH_SIZE = int(os.getenv("TRANSCRIPT_BATCH_SIZE", "500"))
+TRANSCRIPT_FLUSH_INTERVAL = float(os.getenv("TRANSCRIPT_FLUSH_INTERVAL", "2"))
+
+# Questions and answers are clipped; the table is for analytics, not archival
+TEXT_LIMIT = 4000
+
+
+def cited_sources(citations):
+    """Distinct source URIs in citation order"""
+    seen = {}
+    for citation in citations or []:
+        for reference in citation.get("retrievedReferences", []):
+            uri = source_uri(reference)
+            if uri:
+                seen.setdefault(uri, None)
+    return list(seen)
+
+
+class TranscriptLogger:
+    def __init__(self, capacity: int = TRANSCRIPT_BUFFER_SIZE, batch_size: int = TRANSCRIPT_BATCH_SIZE,
+                 interval: float = TRANSCRIPT_FLUSH_INTERVAL, enabled: bool = TRANSCRIPT_LOGGING):
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.interval = interval
+        self.enabled = enabled
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._task = None
+        self._wake = None
+        self._loop = None
+        self._stopping = False
+
+    def log(self, session_id: str, question: str, answer: str, citations, latency: float, cache_hit: bool):
+        if not self.enabled:
+            return
+        row = {
+            "created_at": datetime.now(timezone.utc).replace(tzinfo=None),
+            "session_id": session_id,
+            "question": question[:TEXT_LIMIT],
+            "answer": answer[:TEXT_LIMIT],
+            "sources": orjson.dumps(cited_sources(citations)).decode(),
+            "latency_ms": int(latency * 1000),
+            "cache_hit": cache_hit,
+        }
+        with self._lock:
+            if len(self._buffer) >= self.capacity:
+                metrics.incr("transcripts_dropped")
+                return
+            self._buffer.append(row)
+            full = len(self._buffer) >= self.batch_size
+        if full and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def discard(self):
+        """Drop buffered transcripts, after the table was emptied"""
+        with self._lock:
+            self._buffer.clear()
+
+    def _take_batch(self):
+        with self._lock:
+            count = min(len(self._buffer), self.batch_size)
+            return [self._buffer.popleft() for _ in range(count)]
+
+    def _write(self, rows):
+        db = SessionLocal()
+        try:
+            db.execute(insert(ChatTranscript), rows)
+            db.commit()
+        finally:
+            db.close()
+
+    async def flush(self):
+        """Write everything buffered so far, a batch at a time"""
+        while rows := self._take_batch():
+            try:
+                await run_in_threadpool(self._write, rows)
+                metrics.incr("transcripts_written", len(rows))
+            except Exception as e:
+                # The batch is lost; retrying would only grow the backlog
+                print(f"[TRANSCRIPTS] Failed to write {len(rows)} transcripts: {e}")
+                metrics.incr("transcripts_dropped", len(rows))
+                return
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def start(self):
+        if not self.enabled or self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        # Let an in-flight batch finish, then write whatever is left
+        self._stopping = True
+        self._wake.set()
+        await self._task
+        self._task = None
+        self._wake = None
+        await self.flush()
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "buffered": len(self._buffer),
+            "capacity": self.capacity,
+            "written": metrics.get("transcripts_written"),
+            "dropped": metrics.get("transcripts_dropped"),
+        }
+
+
+transcript_logger = TranscriptLogger()
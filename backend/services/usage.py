@@ -0,0 +1,236 @@
+"""Token usage accounting and the daily token budget.
+
+Counts are aggregated in memory per (day, model) and per chat session, then
+folded into the ``token_usage_daily`` and ``token_usage_sessions`` tables by
+a background task every USAGE_FLUSH_INTERVAL seconds, so the chat path
+never waits on a write. The same task reloads today's total across all
+workers, which the daily token budget is checked against without a query.
+"""
+import asyncio
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from backend.database import SessionLocal
+from backend.models.usage import TokenUsageDaily, TokenUsageSession
+from backend.services import metrics
+
+USAGE_FLUSH_INTERVAL = float(os.getenv("USAGE_FLUSH_INTERVAL", "10"))
+
+# USD per million input/output tokens, matched against the model id
+MODEL_PRICES = (
+    ("claude-haiku-4-5", 1.0, 5.0),
+    ("claude-sonnet-4-5", 3.0, 15.0),
+    ("claude-sonnet-4", 3.0, 15.0),
+)
+
+COUNTERS = ("requests", "input_tokens", "output_tokens")
+
+
+def model_id(model_arn: str) -> str:
+    """``global.anthropic.claude-...`` from a model or inference profile ARN"""
+    return (model_arn or "").rsplit("/", 1)[-1] or "unknown"
+
+
+def cost(model: str, input_tokens: int, output_tokens: int):
+    for fragment, input_price, output_price in MODEL_PRICES:
+        if fragment in model:
+            return round((input_tokens * input_price + output_tokens * output_price) / 1_000_000, 6)
+    return None
+
+
+def today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def seconds_until_tomorrow() -> int:
+    now = datetime.now(timezone.utc)
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), timezone.utc)
+    return int((midnight - now).total_seconds()) + 1
+
+
+class BudgetExceeded(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("Daily token budget exhausted")
+        self.retry_after = retry_after
+
+
+class UsageTracker:
+    def __init__(self, interval: float = USAGE_FLUSH_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._daily = {}
+        self._sessions = {}
+        # Daily counts taken by a flush that is still writing them
+        self._flushing = {}
+        self._task = None
+        self._stopping = False
+        # Today's total as last read from the database, shared by every worker
+        self._stored_day = None
+        self._stored_total = 0
+
+    def record(self, session_id: str, usage):
+        """Count one model call; ``usage`` as returned by BedrockService.chat"""
+        if not usage:
+            return
+        model = usage["model"]
+        tokens = (1, usage["input_tokens"], usage["output_tokens"])
+        with self._lock:
+            daily = self._daily.setdefault((today(), model), [0, 0, 0, 0])
+            for i, value in enumerate(tokens):
+                daily[i] += value
+            daily[3] += int(usage.get("estimated", False))
+            session = self._sessions.setdefault(session_id, [0, 0, 0, model])
+            for i, value in enumerate(tokens):
+                session[i] += value
+            session[3] = model
+        metrics.incr("input_tokens", usage["input_tokens"])
+        metrics.incr("output_tokens", usage["output_tokens"])
+
+    def _take(self):
+        with self._lock:
+            daily, sessions = self._daily, self._sessions
+            self._daily, self._sessions = {}, {}
+            self._flushing = daily
+        return daily, sessions
+
+    def _write(self, daily, sessions):
+        db = SessionLocal()
+        try:
+            if daily:
+                stmt = sqlite_insert(TokenUsageDaily).values([
+                    {"day": day, "model": model, "requests": c[0], "input_tokens": c[1],
+                     "output_tokens": c[2], "estimated_requests": c[3]}
+                    for (day, model), c in daily.items()
+                ])
+                db.execute(stmt.on_conflict_do_update(
+                    index_elements=[TokenUsageDaily.day, TokenUsageDaily.model],
+                    set_={
+                        **{name: getattr(TokenUsageDaily, name) + getattr(stmt.excluded, name)
+                           for name in (*COUNTERS, "estimated_requests")},
+                        "updated_at": func.now(),
+                    },
+                ))
+            if sessions:
+                stmt = sqlite_insert(TokenUsageSession).values([
+                    {"session_id": session_id, "requests": c[0], "input_tokens": c[1],
+                     "output_tokens": c[2], "model": c[3]}
+                    for session_id, c in sessions.items()
+                ])
+                db.execute(stmt.on_conflict_do_update(
+                    index_elements=[TokenUsageSession.session_id],
+                    set_={
+                        **{name: getattr(TokenUsageSession, name) + getattr(stmt.excluded, name)
+                           for name in COUNTERS},
+                        "model": stmt.excluded.model,
+                        "updated_at": func.now(),
+                    },
+                ))
+            db.commit()
+        finally:
+            db.close()
+
+    def _read_total(self, day: str) -> int:
+        db = SessionLocal()
+        try:
+            return db.query(
+                func.coalesce(func.sum(TokenUsageDaily.input_tokens + TokenUsageDaily.output_tokens), 0)
+            ).filter(TokenUsageDaily.day == day).scalar()
+        finally:
+            db.close()
+
+    async def flush(self):
+        """Write unflushed counts, then reload today's total as stored by every worker"""
+        daily, sessions = self._take()
+        day = today()
+        try:
+            if daily or sessions:
+                await run_in_threadpool(self._write, daily, sessions)
+        except Exception as e:
+            print(f"[USAGE] Failed to write token usage: {e}")
+            # Put the counts back so the next flush retries them
+            with self._lock:
+                self._flushing = {}
+                for key, c in daily.items():
+                    current = self._daily.setdefault(key, [0, 0, 0, 0])
+                    for i in range(4):
+                        current[i] += c[i]
+                for key, c in sessions.items():
+                    current = self._sessions.setdefault(key, [0, 0, 0, c[3]])
+                    for i in range(3):
+                        current[i] += c[i]
+            return
+        try:
+            total = await run_in_threadpool(self._read_total, day)
+        except Exception as e:
+            print(f"[USAGE] Failed to read today's token usage: {e}")
+            # Keep counting from the last total plus what was just written
+            total = self._stored_total if self._stored_day == day else 0
+            total += sum(c[1] + c[2] for (d, _), c in daily.items() if d == day)
+        with self._lock:
+            self._flushing = {}
+            self._stored_day, self._stored_total = day, total
+
+    def reset(self):
+        """Forget unflushed counts and the stored total, after the usage tables were emptied"""
+        self._take()
+        with self._lock:
+            self._flushing = {}
+            self._stored_day, self._stored_total = None, 0
+
+    def tokens_today(self) -> int:
+        """Tokens used today by every worker, as of the last flush, plus this worker's unflushed use"""
+        day = today()
+        with self._lock:
+            stored = self._stored_total if self._stored_day == day else 0
+            pending = sum(
+                c[1] + c[2] for counts in (self._daily, self._flushing) for (d, _), c in counts.items() if d == day
+            )
+        return stored + pending
+
+    def apply_budget(self, service):
+        """Switch ``service`` to the fallback model, or raise BudgetExceeded, once today's budget is used up"""
+        config = service.config
+        if not config or not config.daily_token_budget or not service.uses_model():
+            return
+        if self.tokens_today() < config.daily_token_budget:
+            return
+        fallback = config.budget_fallback_model_arn
+        if fallback and fallback != config.model_arn:
+            service.model_override = fallback
+            metrics.incr("budget_fallbacks")
+            return
+        metrics.incr("budget_rejections")
+        raise BudgetExceeded(seconds_until_tomorrow())
+
+    async def _run(self):
+        # Load today's total now rather than after the first interval
+        await self.flush()
+        while not self._stopping:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopping = True
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.flush()
+
+
+usage_tracker = UsageTracker()
@@ -0,0 +1,22 @@
+import hashlib
+import json
+import os
+from backend.services.ttl_cache import TTLCache
+
+WIDGET_BOOTSTRAP_TTL = float(os.getenv("WIDGET_BOOTSTRAP_TTL", "10"))
+WIDGET_BOOTSTRAP_MAX_AGE = int(os.getenv("WIDGET_BOOTSTRAP_MAX_AGE", "30"))
+
+# Single slot holding (body, etag). Writes in this process clear it right away;
+# other workers pick up changes once the TTL lapses.
+bootstrap_cache = TTLCache(max_entries=1, ttl=WIDGET_BOOTSTRAP_TTL)
+
+
+def serialize(payload: dict):
+    """Canonical JSON body plus a strong ETag derived from it"""
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    return body, etag
+
+
+def invalidate():
+    bootstrap_cache.clear()
@@ -0,0 +1,230 @@
+import asyncio
+import threading
+
+import pytest
+from botocore.exceptions import ClientError, EventStreamError
+
+from backend.services import admission
+from backend.services.admission import AdaptiveLimiter, AdmissionController, Overloaded, is_throttling_error
+
+
+def throttled(code="ThrottlingException"):
+    return ClientError({"Error": {"Code": code, "Message": "Rate exceeded"}}, "Converse")
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(admission.random, "uniform", lambda low, high: 0.0)
+
+
+def test_stream_throttling_codes():
+    assert is_throttling_error(throttled())
+    assert is_throttling_error(EventStreamError(
+        {"Error": {"Code": "throttlingException", "Message": "slow down"}}, "ConverseStream"
+    ))
+    assert is_throttling_error(EventStreamError(
+        {"Error": {"Code": "serviceUnavailableException", "Message": "busy"}}, "ConverseStream"
+    ))
+    assert not is_throttling_error(throttled("ValidationException"))
+    assert not is_throttling_error(RuntimeError("ThrottlingException"))
+
+
+def test_throttle_halves_limit_and_success_grows_it():
+    limiter = AdaptiveLimiter(max_limit=8, min_limit=1, queue_size=4)
+    limiter.on_throttle()
+    assert limiter.limit == 4
+    for _ in range(3):
+        limiter.on_throttle()
+    assert limiter.limit == 1
+    limiter.on_throttle()
+    assert limiter.limit == 1
+    limiter.on_success(0.5)
+    assert limiter.limit == 2
+    limiter.on_success(0.5)
+    assert limiter.limit == 2.5
+
+
+def test_retries_throttled_calls():
+    async def main():
+        controller = AdmissionController(AdaptiveLimiter(8, 1, 4), max_attempts=3)
+        calls = []
+
+        def fn(value):
+            calls.append(value)
+            if len(calls) < 3:
+                raise throttled()
+            return value * 2
+
+        assert await controller.call(fn, 21) == 42
+        assert len(calls) == 3
+        # Halved twice, then grown by one success
+        assert controller.limiter.limit == pytest.approx(2 + 1 / 2)
+        assert controller.limiter.in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_gives_up_after_max_attempts():
+    async def main():
+        controller = AdmissionController(AdaptiveLimiter(8, 1, 4), max_attempts=2)
+        calls = []
+
+        def fn():
+            calls.append(1)
+            raise throttled()
+
+        with pytest.raises(Overloaded) as raised:
+            await controller.call(fn)
+        assert len(calls) == 2
+        assert raised.value.retry_after >= 1
+        assert controller.limiter.in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_no_retry_once_output_was_streamed():
+    async def main():
+        controller = AdmissionController(AdaptiveLimiter(8, 1, 4), max_attempts=4)
+        streamed = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            streamed.set()
+            raise EventStreamError({"Error": {"Code": "throttlingException", "Message": ""}}, "ConverseStream")
+
+        with pytest.raises(Overloaded):
+            await controller.call(fn, committed=streamed.is_set)
+        assert len(calls) == 1
+        assert controller.limiter.limit == 4
+
+    asyncio.run(main())
+
+
+def test_other_errors_are_not_retried():
+    async def main():
+        controller = AdmissionController(AdaptiveLimiter(8, 1, 4))
+        calls = []
+
+        def fn():
+            calls.append(1)
+            raise ValueError("bad request")
+
+        with pytest.raises(ValueError):
+            await controller.call(fn)
+        assert len(calls) == 1
+        assert controller.limiter.limit == 8
+        assert controller.limiter.in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_queue_full():
+    async def main():
+        limiter = AdaptiveLimiter(max_limit=1, min_limit=1, queue_size=1)
+        await limiter.acquire(1)
+        waiter = asyncio.create_task(limiter.acquire(1))
+        await asyncio.sleep(0)
+        assert limiter.stats()["queued"] == 1
+
+        with pytest.raises(Overloaded):
+            await limiter.acquire(1)
+
+        limiter.release()
+        await waiter
+        assert limiter.in_flight == 1
+        assert limiter.stats()["queued"] == 0
+
+    asyncio.run(main())
+
+
+def test_waiters_are_served_in_order():
+    async def main():
+        limiter = AdaptiveLimiter(max_limit=1, min_limit=1, queue_size=4)
+        await limiter.acquire(1)
+        order = []
+
+        async def wait(name):
+            await limiter.acquire(1)
+            order.append(name)
+
+        tasks = [asyncio.create_task(wait(name)) for name in "abc"]
+        await asyncio.sleep(0)
+        for _ in range(3):
+            limiter.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        assert order == ["a", "b", "c"]
+
+    asyncio.run(main())
+
+
+def test_queue_timeout():
+    async def main():
+        limiter = AdaptiveLimiter(max_limit=1, min_limit=1, queue_size=4)
+        await limiter.acquire(1)
+        with pytest.raises(Overloaded):
+            await limiter.acquire(0.01)
+        assert limiter.stats()["queued"] == 0
+        assert limiter.in_flight == 1
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        limiter = AdaptiveLimiter(max_limit=1, min_limit=1, queue_size=4)
+        await limiter.acquire(1)
+        waiter = asyncio.create_task(limiter.acquire(10))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.stats()["queued"] == 0
+
+        limiter.release()
+        assert limiter.in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_slot_granted_to_a_cancelled_waiter_is_returned():
+    async def main():
+        limiter = AdaptiveLimiter(max_limit=1, min_limit=1, queue_size=4)
+        await limiter.acquire(1)
+        waiter = asyncio.create_task(limiter.acquire(10))
+        await asyncio.sleep(0)
+        # The slot is handed over, but the waiter is cancelled before it runs again
+        limiter.release()
+        waiter.cancel()
+        try:
+            await waiter
+            granted = True
+        except asyncio.CancelledError:
+            granted = False
+        # Either the waiter holds the slot or it was given back, never lost
+        assert limiter.in_flight == (1 if granted else 0)
+
+    asyncio.run(main())
+
+
+def test_cancelled_call_releases_its_slot():
+    async def main():
+        controller = AdmissionController(AdaptiveLimiter(1, 1, 4))
+        started, finish = threading.Event(), threading.Event()
+
+        def fn():
+            started.set()
+            finish.wait(5)
+
+        call = asyncio.create_task(controller.call(fn))
+        while not started.is_set():
+            await asyncio.sleep(0.001)
+        assert controller.limiter.in_flight == 1
+        call.cancel()
+        finish.set()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        assert controller.limiter.in_flight == 0
+
+    asyncio.run(main())
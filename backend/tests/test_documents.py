@@ -0,0 +1,34 @@
+import asyncio
+import io
+
+import pytest
+from starlette.datastructures import UploadFile
+
+from backend.services import documents
+
+
+def upload(data: bytes, size=None):
+    return UploadFile(io.BytesIO(data), filename="notes.txt", size=size)
+
+
+def test_read_upload(monkeypatch):
+    monkeypatch.setattr(documents, "UPLOAD_CHUNK_SIZE", 4)
+    assert asyncio.run(documents.read_upload(upload(b"0123456789", size=10))) == b"0123456789"
+
+
+def test_read_upload_rejects_declared_size_before_reading(monkeypatch):
+    monkeypatch.setattr(documents, "MAX_DOCUMENT_BYTES", 8)
+    file = upload(b"0123456789", size=10)
+    with pytest.raises(documents.DocumentTooLarge):
+        asyncio.run(documents.read_upload(file))
+    assert file.file.tell() == 0
+
+
+def test_read_upload_stops_once_over_the_limit(monkeypatch):
+    monkeypatch.setattr(documents, "MAX_DOCUMENT_BYTES", 8)
+    monkeypatch.setattr(documents, "UPLOAD_CHUNK_SIZE", 4)
+    # No declared size, so the limit is enforced while reading
+    file = upload(b"0123456789abcdef")
+    with pytest.raises(documents.DocumentTooLarge):
+        asyncio.run(documents.read_upload(file))
+    assert file.file.tell() == 12
@@ -0,0 +1,30 @@
+import pytest
+
+from backend.services.http_cache import accepts_encoding, etag_matches
+
+
+@pytest.mark.parametrize("header, accepted", [
+    ("gzip, deflate, br", True),
+    ("GZIP", True),
+    ("br;q=1.0, gzip;q=0.8", True),
+    ("x-gzip", True),
+    ("*", True),
+    (None, False),
+    ("", False),
+    ("identity", False),
+    ("gzip;q=0", False),
+    ("gzip; q=0.000", False),
+    ("*;q=0", False),
+    ("gzip;q=0, *", False),
+    ("*;q=0, gzip;q=0.5", True),
+    ("notgzip", False),
+    ("gzip;q=high", False),
+])
+def test_accepts_gzip(header, accepted):
+    assert accepts_encoding(header, "gzip") is accepted
+
+
+def test_etag_matches_weakly():
+    assert etag_matches('W/"abc", "def"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"def"', '"abc"')
@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+from backend.services import local_index as local_index_module
+from backend.services.local_index import LocalIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LocalIndex(str(tmp_path / "index"))
+    yield index
+    index.clear()
+
+
+def doc_keys(index, hits):
+    rows = dict(index._connect().execute("SELECT id, doc_key FROM chunks").fetchall())
+    return [rows[chunk_id] for chunk_id, _ in hits]
+
+
+def test_add_and_search(index):
+    index.add_documents({
+        "apples.txt": "apples grow in orchards and are picked in autumn",
+        "bananas.txt": "bananas grow in tropical plantations",
+    })
+    hits = index.search("orchards autumn", k=1)
+    assert doc_keys(index, hits) == ["apples.txt"]
+    assert index.stats()["documents"] == 2
+
+
+def test_replacing_a_document_drops_old_chunks(index):
+    index.add_document("notes.txt", "the meeting is on tuesday")
+    index.add_document("notes.txt", "the meeting moved to friday")
+    assert index.stats()["chunks"] == 1
+    assert doc_keys(index, index.search("friday", k=3)) == ["notes.txt"]
+
+
+def test_search_after_removing_newest_document(index):
+    index.add_document("a.txt", "apples and pears")
+    index.add_document("b.txt", "bananas and pears")
+    assert index.remove_document("b.txt") == 1
+
+    assert doc_keys(index, index.search("bananas pears", k=5)) == ["a.txt"]
+    assert doc_keys(index, index.search("bananas", k=5, search_type="SEMANTIC")) == ["a.txt"]
+
+
+def test_search_after_removing_everything(index):
+    index.add_document("a.txt", "apples")
+    index.remove_document("a.txt")
+    assert index.search("apples") == []
+    assert index.retrieve("apples") == []
+
+
+def test_merge_after_removing_newest_document(index, monkeypatch):
+    index.add_document("a.txt", "apples and pears")
+    index.add_document("b.txt", "bananas and pears")
+    index.remove_document("b.txt")
+
+    monkeypatch.setattr(local_index_module, "MAX_SEGMENTS", 1)
+    index._maybe_merge()
+    assert index.stats()["segments"] == 1
+    assert doc_keys(index, index.search("pears", k=5)) == ["a.txt"]
+    # The merged segment no longer holds postings for the removed chunk
+    (segment,) = index._segments.values()
+    assert segment.ids.tolist() == [1, 1]
+
+
+def test_merge_picks_segments_current_in_the_database(index, monkeypatch):
+    other = LocalIndex(index.path)
+    for key, text in [("a.txt", "apples"), ("b.txt", "bananas"), ("c.txt", "cherries")]:
+        index.add_document(key, text)
+    assert other.stats()["segments"] == 3
+
+    monkeypatch.setattr(local_index_module, "MAX_SEGMENTS", 1)
+    monkeypatch.setattr(local_index_module, "MERGE_FACTOR", 2)
+    index._maybe_merge()
+    # ``other`` still has the retired segments loaded and must not merge those
+    other._maybe_merge()
+    assert index.stats()["segments"] == 1
+    assert len(os.listdir(index.segment_dir)) == 1
+    assert doc_keys(index, index.search("bananas", k=1)) == ["b.txt"]
+
+
+def test_other_instances_see_writes(index):
+    other = LocalIndex(index.path)
+    index.add_document("a.txt", "apples")
+    assert doc_keys(other, other.search("apples", k=1)) == ["a.txt"]
+    index.remove_document("a.txt")
+    assert other.search("apples") == []
+
+
+def test_remove_all(index):
+    other = LocalIndex(index.path)
+    index.add_documents({"a.txt": "apples", "b.txt": "bananas"})
+    assert other.stats()["documents"] == 2
+    index.remove_all()
+    assert other.stats() | {"generation": 0} == {
+        "documents": 0, "chunks": 0, "segments": 0, "generation": 0, "embedder": index.embedder.name,
+    }
+    assert other.search("apples") == []
+    index.add_document("c.txt", "cherries")
+    assert doc_keys(other, other.search("cherries", k=1)) == ["c.txt"]
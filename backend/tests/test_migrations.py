@@ -0,0 +1,76 @@
+from sqlalchemy import create_engine, inspect, text
+
+from backend import migrations
+from backend.database import Base
+
+# configs and users as the first release created them, before any migrations
+LEGACY_SCHEMA = (
+    """CREATE TABLE configs (
+        id INTEGER PRIMARY KEY, aws_access_key_id VARCHAR, aws_secret_access_key VARCHAR,
+        aws_region VARCHAR, kb_id VARCHAR, bot_name VARCHAR, enable_exam_mode BOOLEAN
+    )""",
+    "CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR, hashed_password VARCHAR)",
+    "INSERT INTO configs (id, aws_region, kb_id, bot_name, enable_exam_mode) VALUES (1, 'eu-west-1', 'KB1', 'Helper', 1)",
+    "INSERT INTO users (id, username, hashed_password) VALUES (1, 'admin', 'x')",
+)
+
+
+def make_engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path}/chatbot.db")
+
+
+def columns(conn, table):
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+
+def test_fresh_database(tmp_path):
+    engine = make_engine(tmp_path)
+    assert migrations.migrate(engine) == [version for version, _ in migrations.MIGRATIONS]
+    with engine.connect() as conn:
+        assert migrations.schema_version(conn) == migrations.LATEST_VERSION
+        assert set(inspect(conn).get_table_names()) >= set(Base.metadata.tables)
+
+
+def test_legacy_database_is_brought_up_to_date(tmp_path):
+    engine = make_engine(tmp_path)
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.execute(text(statement))
+
+    migrations.migrate(engine)
+
+    with engine.connect() as conn:
+        assert migrations.schema_version(conn) == migrations.LATEST_VERSION
+        assert columns(conn, "configs") == {c.name for c in Base.metadata.tables["configs"].columns}
+        indexes = {index["name"] for index in inspect(conn).get_indexes("token_usage_sessions")}
+        assert {i.name for i in Base.metadata.tables["token_usage_sessions"].indexes} <= indexes
+        row = conn.execute(text(
+            "SELECT aws_region, kb_id, bot_name, chat_rate_limit, rate_limit_key, kb_version FROM configs"
+        )).one()
+        # Existing values are kept; new columns take their defaults
+        assert tuple(row) == ("eu-west-1", "KB1", "Helper", 20, "ip", 0)
+        assert conn.execute(text("SELECT username FROM users")).scalar() == "admin"
+
+
+def test_running_twice_changes_nothing(tmp_path):
+    engine = make_engine(tmp_path)
+    migrations.migrate(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO cache_versions (name, version) VALUES ('exam_questions', 3)"))
+
+    assert migrations.migrate(engine) == []
+    with engine.connect() as conn:
+        assert migrations.schema_version(conn) == migrations.LATEST_VERSION
+        assert conn.execute(text("SELECT version FROM cache_versions")).scalar() == 3
+
+
+def test_database_at_an_earlier_version(tmp_path):
+    engine = make_engine(tmp_path)
+    with engine.begin() as conn:
+        migrations._baseline(conn)
+        conn.execute(text("DROP TABLE cache_versions"))
+        conn.exec_driver_sql("PRAGMA user_version = 1")
+
+    assert migrations.migrate(engine) == [2]
+    with engine.connect() as conn:
+        assert "cache_versions" in inspect(conn).get_table_names()
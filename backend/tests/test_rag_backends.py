@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+import pytest
+
+from backend.services import bedrock_service
+from backend.services.bedrock_service import BedrockService
+from backend.services.rag_backends import BedrockRetriever, Generator, Retriever
+
+
+class FakeDB:
+    def __init__(self, config):
+        self.config = config
+
+    def query(self, model):
+        return self
+
+    def first(self):
+        return self.config
+
+
+class FakeAgentClient:
+    def __init__(self):
+        self.calls = []
+
+    def retrieve(self, **kwargs):
+        self.calls.append(kwargs)
+        return {"retrievalResults": [{"content": {"text": "passage"}}]}
+
+
+@pytest.fixture
+def service():
+    bedrock_service.retrieval_cache.clear()
+    config = SimpleNamespace(kb_id="KB123", kb_version=None, retrieval_results=5, search_type=None)
+    service = BedrockService(FakeDB(config))
+    service._client = FakeAgentClient()
+    yield service
+    bedrock_service.retrieval_cache.clear()
+
+
+def test_base_classes_are_abstract():
+    with pytest.raises(TypeError):
+        Retriever()
+    with pytest.raises(TypeError):
+        Generator()
+
+
+def test_bedrock_retriever_passes_k_and_search_type(service):
+    BedrockRetriever(service).retrieve("question", 3, "HYBRID")
+    (call,) = service._client.calls
+    assert call["retrievalConfiguration"] == {
+        "vectorSearchConfiguration": {"numberOfResults": 3, "overrideSearchType": "HYBRID"}
+    }
+
+
+def test_bedrock_retrieve_defaults_to_config(service):
+    service.retrieve("question")
+    (call,) = service._client.calls
+    assert call["retrievalConfiguration"] == {"vectorSearchConfiguration": {"numberOfResults": 5}}
+
+
+def test_retrieval_cache_is_keyed_by_k(service):
+    retriever = BedrockRetriever(service)
+    retriever.retrieve("question", 3)
+    retriever.retrieve("question", 3)
+    retriever.retrieve("question", 4)
+    assert [c["retrievalConfiguration"]["vectorSearchConfiguration"]["numberOfResults"]
+            for c in service._client.calls] == [3, 4]
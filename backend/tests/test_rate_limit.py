@@ -0,0 +1,100 @@
+from types import SimpleNamespace
+
+import pytest
+
+from backend.services import rate_limit
+from backend.services.rate_limit import MemoryBuckets
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+
+def test_burst_then_wait(clock):
+    buckets = MemoryBuckets()
+    # 60 a minute: one per second, bursting to 3
+    assert [buckets.take("ip:a", 1.0, 3.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert buckets.take("ip:a", 1.0, 3.0) == pytest.approx(1.0)
+
+
+def test_refills_continuously_up_to_capacity(clock):
+    buckets = MemoryBuckets()
+    for _ in range(3):
+        buckets.take("ip:a", 1.0, 3.0)
+    clock.now += 0.5
+    assert buckets.take("ip:a", 1.0, 3.0) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert buckets.take("ip:a", 1.0, 3.0) == 0.0
+
+    clock.now += 3600
+    assert [buckets.take("ip:a", 1.0, 3.0) for _ in range(4)][-1] > 0
+
+
+def test_clients_have_separate_buckets(clock):
+    buckets = MemoryBuckets()
+    assert buckets.take("ip:a", 1.0, 1.0) == 0.0
+    assert buckets.take("ip:a", 1.0, 1.0) > 0
+    assert buckets.take("ip:b", 1.0, 1.0) == 0.0
+
+
+def test_least_recently_seen_clients_are_evicted(clock):
+    buckets = MemoryBuckets(max_keys=2)
+    buckets.take("ip:a", 1.0, 1.0)
+    buckets.take("ip:b", 1.0, 1.0)
+    buckets.take("ip:a", 1.0, 1.0)
+    buckets.take("ip:c", 1.0, 1.0)
+    # a was kept and is still empty; b was evicted and starts full again
+    assert buckets.take("ip:a", 1.0, 1.0) > 0
+    assert buckets.take("ip:b", 1.0, 1.0) == 0.0
+
+
+def test_redis_buckets_fall_back_to_memory(clock):
+    pytest.importorskip("redis")
+    # Nothing listens on port 1, so every take fails over to the in-process buckets
+    buckets = rate_limit.RedisBuckets("redis://127.0.0.1:1/0")
+    assert buckets.take("ip:a", 1.0, 1.0) == 0.0
+    assert buckets.take("ip:a", 1.0, 1.0) > 0
+
+
+def connection(peer, real_ip=None):
+    headers = {"x-real-ip": real_ip} if real_ip else {}
+    return SimpleNamespace(client=SimpleNamespace(host=peer), headers=headers)
+
+
+def test_real_ip_ignored_without_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(rate_limit, "trusted_proxies", [])
+    assert rate_limit.client_ip(connection("10.0.0.5", "203.0.113.9")) == "10.0.0.5"
+    assert rate_limit.client_ip(connection("127.0.0.1", "203.0.113.9")) == "127.0.0.1"
+
+
+def test_real_ip_trusted_only_from_configured_proxies(monkeypatch):
+    monkeypatch.setattr(rate_limit, "trusted_proxies", rate_limit.parse_networks("172.30.10.10, 10.1.0.0/16"))
+    assert rate_limit.client_ip(connection("172.30.10.10", "203.0.113.9")) == "203.0.113.9"
+    assert rate_limit.client_ip(connection("10.1.2.3", "203.0.113.9")) == "203.0.113.9"
+    assert rate_limit.client_ip(connection("10.0.0.5", "203.0.113.9")) == "10.0.0.5"
+    assert rate_limit.client_ip(connection("172.30.10.10")) == "172.30.10.10"
+
+
+def test_no_ip_buckets_without_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(rate_limit, "trusted_proxies", [])
+    # Behind an unnamed proxy every client would share the proxy's bucket
+    assert rate_limit.connection_key(connection("172.30.10.10", "203.0.113.9"), "ip") is None
+    assert rate_limit.connection_key(connection("172.30.10.10"), "session", "abc") == "session:abc"
+    assert rate_limit.connection_key(connection("172.30.10.10"), "session") is None
+
+
+def test_ip_buckets_with_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(rate_limit, "trusted_proxies", rate_limit.parse_networks("172.30.10.0/24"))
+    assert rate_limit.connection_key(connection("172.30.10.10", "203.0.113.9"), "ip") == "ip:203.0.113.9"
+    assert rate_limit.connection_key(connection("172.30.10.10", "203.0.113.9"), "session") == "ip:203.0.113.9"
@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from backend.services.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_task():
+    async def main():
+        flight = SingleFlight()
+        release = asyncio.Event()
+        calls = []
+
+        async def answer():
+            calls.append(1)
+            await release.wait()
+            return "answer"
+
+        first = asyncio.create_task(flight.do("q", answer))
+        second = asyncio.create_task(flight.do("q", answer))
+        other = asyncio.create_task(flight.do("other", answer))
+        await asyncio.sleep(0)
+        assert flight.in_flight() == 2
+        release.set()
+
+        assert await first == ("answer", False)
+        assert await second == ("answer", True)
+        assert await other == ("answer", False)
+        assert len(calls) == 2
+        assert flight.in_flight() == 0
+
+    asyncio.run(main())
+
+
+def test_later_calls_start_afresh():
+    async def main():
+        flight = SingleFlight()
+        calls = []
+
+        async def answer():
+            calls.append(1)
+            return len(calls)
+
+        assert await flight.do("q", answer) == (1, False)
+        assert await flight.do("q", answer) == (2, False)
+
+    asyncio.run(main())
+
+
+def test_errors_reach_every_caller():
+    async def main():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def fail():
+            await release.wait()
+            raise ValueError("no answer")
+
+        callers = [asyncio.create_task(flight.do("q", fail)) for _ in range(2)]
+        await asyncio.sleep(0)
+        release.set()
+        for caller in callers:
+            with pytest.raises(ValueError):
+                await caller
+        assert flight.in_flight() == 0
+
+    asyncio.run(main())
+
+
+def test_leader_cancellation_keeps_the_call_for_others():
+    async def main():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def answer():
+            await release.wait()
+            return "answer"
+
+        leader = asyncio.create_task(flight.do("q", answer))
+        follower = asyncio.create_task(flight.do("q", answer))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        release.set()
+        assert await follower == ("answer", True)
+
+    asyncio.run(main())
+
+
+def test_call_is_cancelled_once_every_caller_has_gone():
+    async def main():
+        flight = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def answer():
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        callers = [asyncio.create_task(flight.do("q", answer)) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        callers[0].cancel()
+        await asyncio.sleep(0)
+        assert not cancelled.is_set()
+
+        callers[1].cancel()
+        for caller in callers:
+            with pytest.raises(asyncio.CancelledError):
+                await caller
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        assert flight.in_flight() == 0
+
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base
+from backend.models.usage import TokenUsageDaily
+from backend.services import usage
+from backend.services.usage import UsageTracker
+
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path}/usage.db")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(usage, "SessionLocal", factory)
+    return factory
+
+
+def record(tracker, session_id, tokens):
+    tracker.record(session_id, {"model": "m", "input_tokens": tokens, "output_tokens": 0})
+
+
+def test_tokens_today_is_served_from_memory(sessions, monkeypatch):
+    tracker = UsageTracker()
+    record(tracker, "s1", 100)
+    asyncio.run(tracker.flush())
+    # Another worker's flush shows up after this worker's next flush
+    db = sessions()
+    db.add(TokenUsageDaily(day=usage.today(), model="other", input_tokens=50, output_tokens=0))
+    db.commit()
+    db.close()
+    record(tracker, "s1", 10)
+
+    def no_db():
+        raise AssertionError("tokens_today queried the database")
+
+    monkeypatch.setattr(usage, "SessionLocal", no_db)
+    assert tracker.tokens_today() == 110
+    monkeypatch.setattr(usage, "SessionLocal", sessions)
+    asyncio.run(tracker.flush())
+    assert tracker.tokens_today() == 160
+
+
+def test_counts_being_written_still_count(sessions, monkeypatch):
+    tracker = UsageTracker()
+    record(tracker, "s1", 100)
+    seen = []
+    write = tracker._write
+
+    def slow_write(daily, sessions):
+        seen.append(tracker.tokens_today())
+        write(daily, sessions)
+
+    monkeypatch.setattr(tracker, "_write", slow_write)
+    asyncio.run(tracker.flush())
+    assert seen == [100]
+    assert tracker.tokens_today() == 100
+
+
+def test_failed_write_is_retried(sessions, monkeypatch):
+    tracker = UsageTracker()
+    record(tracker, "s1", 100)
+
+    def broken_write(daily, sessions):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(tracker, "_write", broken_write)
+    asyncio.run(tracker.flush())
+    assert tracker.tokens_today() == 100
+    monkeypatch.undo()
+    monkeypatch.setattr(usage, "SessionLocal", sessions)
+    asyncio.run(tracker.flush())
+    assert tracker.tokens_today() == 100
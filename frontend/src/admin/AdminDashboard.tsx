@@ -5,6 +5,7 @@ import ChatWidget from "../widget/ChatWidget";
 import SetupGuideModal from "../wizard/SetupGuideModal";
 import FileManager from "./FileManager";
 import ExamManager from "./ExamManager";
+import PinnedAnswers from "./PinnedAnswers";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
 import { Label } from "@/components/ui/label";
@@ -102,6 +103,13 @@ function AdminDashboard() {
           >
             Files & Sync
           </Button>
+          <Button
+            variant={activeTab === "pinned" ? "default" : "ghost"}
+            className="w-full justify-start"
+            onClick={() => setActiveTab("pinned")}
+          >
+            Pinned Answers
+          </Button>
           <Button
             variant={activeTab === "preview" ? "default" : "ghost"}
             className="w-full justify-start"
@@ -262,6 +270,256 @@ function AdminDashboard() {
                       Choose the model for generating responses
                     </p>
                   </div>
+                  <div className="border-t pt-4 space-y-4">
+                    <div className="grid grid-cols-2 gap-4">
+                      <div className="space-y-2">
+                        <Label>Document Source</Label>
+                        <select
+                          value={config.retrieval_backend || "bedrock"}
+                          onChange={(e) =>
+                            setConfig({
+                              ...config,
+                              retrieval_backend: e.target.value,
+                            })
+                          }
+                          className="flex h-10 w-full rounded-md border border-input bg-background px-3 py-2 text-sm ring-offset-background focus-visible:outline-none focus-visible:ring-2 focus-visible:ring-ring focus-visible:ring-offset-2"
+                        >
+                          <option value="bedrock">Bedrock Knowledge Base</option>
+                          <option value="local">Local index (offline)</option>
+                        </select>
+                      </div>
+                      {config.retrieval_backend === "local" && (
+                        <div className="space-y-2">
+                          <Label>Local Answers</Label>
+                          <select
+                            value={config.local_generator || "extractive"}
+                            onChange={(e) =>
+                              setConfig({
+                                ...config,
+                                local_generator: e.target.value,
+                              })
+                            }
+                            className="flex h-10 w-full rounded-md border border-input bg-background px-3 py-2 text-sm ring-offset-background focus-visible:outline-none focus-visible:ring-2 focus-visible:ring-ring focus-visible:ring-offset-2"
+                          >
+                            <option value="extractive">
+                              Quote matching passages (no model)
+                            </option>
+                            <option value="bedrock">Write with Bedrock model</option>
+                          </select>
+                        </div>
+                      )}
+                    </div>
+                    {config.retrieval_backend !== "local" && (
+                      <div className="flex items-center justify-between">
+                        <div className="space-y-0.5">
+                          <Label>Preprocess Uploads</Label>
+                          <p className="text-xs text-muted-foreground">
+                            Upload extracted text without repeated headers and
+                            footers, split into smaller parts, so syncs are faster
+                          </p>
+                        </div>
+                        <button
+                          type="button"
+                          onClick={() =>
+                            setConfig({
+                              ...config,
+                              preprocess_uploads: !config.preprocess_uploads,
+                            })
+                          }
+                          className={`relative inline-flex h-6 w-11 items-center rounded-full transition-colors focus-visible:outline-none focus-visible:ring-2 focus-visible:ring-ring focus-visible:ring-offset-2 ${
+                            config.preprocess_uploads ? "bg-primary" : "bg-gray-200"
+                          }`}
+                        >
+                          <span
+                            className={`inline-block h-4 w-4 transform rounded-full bg-white transition-transform ${
+                              config.preprocess_uploads
+                                ? "translate-x-6"
+                                : "translate-x-1"
+                            }`}
+                          />
+                        </button>
+                      </div>
+                    )}
+                    <div className="space-y-2">
+                      <Label>Answer Pipeline</Label>
+                      <select
+                        value={config.rag_mode || "retrieve_and_generate"}
+                        onChange={(e) =>
+                          setConfig({ ...config, rag_mode: e.target.value })
+                        }
+                        className="flex h-10 w-full rounded-md border border-input bg-background px-3 py-2 text-sm ring-offset-background focus-visible:outline-none focus-visible:ring-2 focus-visible:ring-ring focus-visible:ring-offset-2"
+                      >
+                        <option value="retrieve_and_generate">
+                          Bedrock Retrieve &amp; Generate (managed)
+                        </option>
+                        <option value="retrieve_then_generate">
+                          Retrieve, then generate locally (tunable)
+                        </option>
+                      </select>
+                    </div>
+                    <div className="grid grid-cols-2 gap-4">
+                      <div className="space-y-2">
+                        <Label>Retrieved Passages</Label>
+                        <Input
+                          type="number"
+                          min={1}
+                          max={100}
+                          value={config.retrieval_results ?? 5}
+                          onChange={(e) =>
+                            setConfig({
+                              ...config,
+                              retrieval_results: Number(e.target.value),
+                            })
+                          }
+                        />
+                      </div>
+                      <div className="space-y-2">
+                        <Label>Search Type</Label>
+                        <select
+                          value={config.search_type || ""}
+                          onChange={(e) =>
+                            setConfig({
+                              ...config,
+                              search_type: e.target.value,
+                            })
+                          }
+                          className="flex h-10 w-full rounded-md border border-input bg-background px-3 py-2 text-sm ring-offset-background focus-visible:outline-none focus-visible:ring-2 focus-visible:ring-ring focus-visible:ring-offset-2"
+                        >
+                          <option value="">Knowledge base default</option>
+                          <option value="HYBRID">Hybrid</option>
+                          <option value="SEMANTIC">Semantic</option>
+                        </select>
+                      </div>
+                      <div className="space-y-2">
+                        <Label>Max Output Tokens</Label>
+                        <Input
+                          type="number"
+                          min={0}
+                          value={config.max_output_tokens ?? ""}
+                          placeholder="Model default"
+                          onChange={(e) =>
+                            setConfig({
+                              ...config,
+                              max_output_tokens: Number(e.target.value),
+                            })
+                          }
+                        />
+                      </div>
+                      <div className="space-y-2">
+                        <Label>Context Token Budget</Label>
+                        <Input
+                          type="number"
+                          min={0}
+                          value={config.context_token_budget ?? 3000}
+                          onChange={(e) =>
+                            setConfig({
+                              ...config,
+                              context_token_budget: Number(e.target.value),
+                            })
+                          }
+                        />
+                      </div>
+                    </div>
+                    <p className="text-xs text-muted-foreground">
+                      Fewer passages and tokens answer faster and cost less.
+                      The context budget only applies to the local pipeline.
+                    </p>
+                  </div>
+                  <div className="border-t pt-4 space-y-4">
+                    <div className="grid grid-cols-2 gap-4">
+                      <div className="space-y-2">
+                        <Label>Daily Token Budget</Label>
+                        <Input
+                          type="number"
+                          min={0}
+                          value={config.daily_token_budget ?? ""}
+                          placeholder="Unlimited"
+                          onChange={(e) =>
+                            setConfig({
+                              ...config,
+                              daily_token_budget: Number(e.target.value),
+                            })
+                          }
+                        />
+                      </div>
+                      <div className="space-y-2">
+                        <Label>When Budget Is Spent</Label>
+                        <select
+                          value={config.budget_fallback_model_arn || ""}
+                          onChange={(e) =>
+                            setConfig({
+                              ...config,
+                              budget_fallback_model_arn: e.target.value,
+                            })
+                          }
+                          className="flex h-10 w-full rounded-md border border-input bg-background px-3 py-2 text-sm ring-offset-background focus-visible:outline-none focus-visible:ring-2 focus-visible:ring-ring focus-visible:ring-offset-2"
+                        >
+                          <option value="">Reject chat requests</option>
+                          <option value="arn:aws:bedrock:us-east-1::inference-profile/global.anthropic.claude-haiku-4-5-20251001-v1:0">
+                            Switch to Claude 4.5 Haiku
+                          </option>
+                        </select>
+                      </div>
+                    </div>
+                    <p className="text-xs text-muted-foreground">
+                      Input and output tokens per UTC day, across all
+                      conversations. Usage and cost are reported by the
+                      admin API at <code>GET /api/admin/usage</code>.
+                    </p>
+                  </div>
+                  <div className="border-t pt-4 space-y-4">
+                    <div className="grid grid-cols-3 gap-4">
+                      <div className="space-y-2">
+                        <Label>Chat Requests / Minute</Label>
+                        <Input
+                          type="number"
+                          min={0}
+                          value={config.chat_rate_limit ?? 20}
+                          onChange={(e) =>
+                            setConfig({
+                              ...config,
+                              chat_rate_limit: Number(e.target.value),
+                            })
+                          }
+                        />
+                      </div>
+                      <div className="space-y-2">
+                        <Label>Exam Requests / Minute</Label>
+                        <Input
+                          type="number"
+                          min={0}
+                          value={config.exam_rate_limit ?? 120}
+                          onChange={(e) =>
+                            setConfig({
+                              ...config,
+                              exam_rate_limit: Number(e.target.value),
+                            })
+                          }
+                        />
+                      </div>
+                      <div className="space-y-2">
+                        <Label>Limit Per</Label>
+                        <select
+                          value={config.rate_limit_key || "ip"}
+                          onChange={(e) =>
+                            setConfig({
+                              ...config,
+                              rate_limit_key: e.target.value,
+                            })
+                          }
+                          className="flex h-10 w-full rounded-md border border-input bg-background px-3 py-2 text-sm ring-offset-background focus-visible:outline-none focus-visible:ring-2 focus-visible:ring-ring focus-visible:ring-offset-2"
+                        >
+                          <option value="ip">Visitor IP address</option>
+                          <option value="session">Conversation / exam</option>
+                          <option value="origin">Embedding website</option>
+                        </select>
+                      </div>
+                    </div>
+                    <p className="text-xs text-muted-foreground">
+                      Limits on the public chat and exam endpoints. 0 means
+                      unlimited.
+                    </p>
+                  </div>
                   <div className="border-t pt-4 space-y-4">
                     <div className="space-y-2">
                       <Label>AWS Access Key ID</Label>
@@ -529,6 +787,8 @@ function AdminDashboard() {
 
         {activeTab === "files" && <FileManager />}
 
+        {activeTab === "pinned" && <PinnedAnswers />}
+
         {activeTab === "preview" && (
           <div className="flex justify-center items-start h-full">
             <ChatWidget />
@@ -21,6 +21,7 @@ import {
 } from "@/components/ui/dialog";
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
 import { Trash2, GripVertical, Check, X, Image } from "lucide-react";
+import { thumbnailSrc } from "@/lib/utils";
 
 interface ExamQuestion {
   id?: number;
@@ -34,6 +35,7 @@ interface ExamQuestion {
   explanation?: string | null;
   order_index: number;
   is_active: boolean;
+  category?: string | null;
 }
 
 interface ExamConfig {
@@ -42,6 +44,8 @@ interface ExamConfig {
   exam_description?: string | null;
   show_correct_answers: boolean;
   shuffle_questions: boolean;
+  questions_per_exam: number;
+  stratify_by_category: boolean;
 }
 
 interface ExamResult {
@@ -57,6 +61,31 @@ interface ExamResult {
   completed_at: string;
 }
 
+interface QuestionStats {
+  question_id: number;
+  attempts: number;
+  correct: number;
+  correct_rate: number | null;
+  options: Record<string, number>;
+}
+
+interface ResultsSummary {
+  total: number;
+  passed: number;
+  failed: number;
+  pass_rate: number | null;
+  average_score: number | null;
+  score_distribution: { range: string; count: number }[];
+  per_day: { date: string; total: number; passed: number }[];
+}
+
+interface ResultFilters {
+  external_user_id: string;
+  passed: "" | "true" | "false";
+  date_from: string;
+  date_to: string;
+}
+
 function ExamManager() {
   const [questions, setQuestions] = useState<ExamQuestion[]>([]);
   const [config, setConfig] = useState<ExamConfig>({
@@ -65,8 +94,21 @@ function ExamManager() {
     exam_description: "",
     show_correct_answers: true,
     shuffle_questions: false,
+    questions_per_exam: 0,
+    stratify_by_category: false,
   });
   const [results, setResults] = useState<ExamResult[]>([]);
+  const [resultsCursor, setResultsCursor] = useState<number | null>(null);
+  const [summary, setSummary] = useState<ResultsSummary | null>(null);
+  const [questionStats, setQuestionStats] = useState<
+    Record<number, QuestionStats>
+  >({});
+  const [resultFilters, setResultFilters] = useState<ResultFilters>({
+    external_user_id: "",
+    passed: "",
+    date_from: "",
+    date_to: "",
+  });
   const [showDialog, setShowDialog] = useState(false);
   const [editingQuestion, setEditingQuestion] = useState<ExamQuestion | null>(
     null
@@ -85,11 +127,13 @@ function ExamManager() {
   });
   const [uploading, setUploading] = useState(false);
   const fileInputRef = useRef<HTMLInputElement>(null);
+  const importInputRef = useRef<HTMLInputElement>(null);
 
   useEffect(() => {
     loadQuestions();
     loadConfig();
     loadResults();
+    loadQuestionStats();
   }, []);
 
   const loadQuestions = async () => {
@@ -101,6 +145,22 @@ function ExamManager() {
     }
   };
 
+  const loadQuestionStats = async () => {
+    try {
+      const response = await api.get("/exam/questions/stats");
+      setQuestionStats(
+        Object.fromEntries(
+          response.data.map((stats: QuestionStats) => [
+            stats.question_id,
+            stats,
+          ])
+        )
+      );
+    } catch (error) {
+      console.error("Failed to load question stats:", error);
+    }
+  };
+
   const loadConfig = async () => {
     try {
       const response = await api.get("/exam/config");
@@ -110,15 +170,77 @@ function ExamManager() {
     }
   };
 
-  const loadResults = async () => {
+  // Empty filter fields are left out so the API doesn't apply them
+  const resultParams = () =>
+    Object.fromEntries(
+      Object.entries(resultFilters).filter(([, value]) => value !== "")
+    );
+
+  const loadResults = async (cursor?: number) => {
     try {
-      const response = await api.get("/exam/results");
-      setResults(response.data);
+      const params = { ...resultParams(), ...(cursor ? { cursor } : {}) };
+      const response = await api.get("/exam/results", { params });
+      setResults((prev) =>
+        cursor ? [...prev, ...response.data.items] : response.data.items
+      );
+      setResultsCursor(response.data.next_cursor);
+      if (!cursor) {
+        const summaryResponse = await api.get("/exam/results/summary", {
+          params: resultParams(),
+        });
+        setSummary(summaryResponse.data);
+      }
     } catch (error) {
       console.error("Failed to load results:", error);
     }
   };
 
+  const exportResults = async (format: "csv" | "ndjson") => {
+    try {
+      const response = await api.get("/exam/results/export", {
+        params: { ...resultParams(), format },
+        responseType: "blob",
+      });
+      const url = URL.createObjectURL(response.data);
+      const link = document.createElement("a");
+      link.href = url;
+      link.download = `exam-results.${format}`;
+      link.click();
+      URL.revokeObjectURL(url);
+    } catch (error) {
+      console.error("Failed to export results:", error);
+    }
+  };
+
+  const handleImport = async (e: React.ChangeEvent<HTMLInputElement>) => {
+    const file = e.target.files?.[0];
+    e.target.value = "";
+    if (!file) return;
+
+    const body = new FormData();
+    body.append("file", file);
+    try {
+      const response = await api.post("/exam/questions/import", body);
+      alert(`Imported ${response.data.imported} questions`);
+      loadQuestions();
+    } catch (error: any) {
+      const detail = error.response?.data?.detail;
+      if (detail?.errors) {
+        alert(
+          `${detail.message}:\n` +
+            detail.errors
+              .slice(0, 10)
+              .map((e: { row: number | null; error: string }) =>
+                e.row ? `Row ${e.row}: ${e.error}` : e.error
+              )
+              .join("\n")
+        );
+      } else {
+        alert(detail || "Error importing questions");
+      }
+    }
+  };
+
   const handleOpenDialog = (question?: ExamQuestion) => {
     if (question) {
       setEditingQuestion(question);
@@ -136,6 +258,7 @@ function ExamManager() {
         explanation: "",
         order_index: questions.length,
         is_active: true,
+        category: "",
       });
     }
     setShowDialog(true);
@@ -243,7 +366,22 @@ function ExamManager() {
                   Configure the questions that will be asked during the exam.
                 </CardDescription>
               </div>
-              <Button onClick={() => handleOpenDialog()}>+ New Question</Button>
+              <div className="flex gap-2">
+                <input
+                  ref={importInputRef}
+                  type="file"
+                  accept=".csv,.json,.zip"
+                  onChange={handleImport}
+                  className="hidden"
+                />
+                <Button
+                  variant="outline"
+                  onClick={() => importInputRef.current?.click()}
+                >
+                  Import
+                </Button>
+                <Button onClick={() => handleOpenDialog()}>+ New Question</Button>
+              </div>
             </CardHeader>
             <CardContent>
               {questions.length === 0 ? (
@@ -269,13 +407,9 @@ function ExamManager() {
                             <div className="flex items-start gap-4">
                               {question.question_image_url && (
                                 <img
-                                  src={
-                                    question.question_image_url.startsWith(
-                                      "data:"
-                                    )
-                                      ? question.question_image_url
-                                      : `/api${question.question_image_url}`
-                                  }
+                                  src={thumbnailSrc(
+                                    question.question_image_url
+                                  )}
                                   alt="Question"
                                   className="w-20 h-20 object-cover rounded border"
                                 />
@@ -326,6 +460,28 @@ function ExamManager() {
                                     </div>
                                   )}
                                 </div>
+                                {question.id && questionStats[question.id] && (
+                                  <div className="text-xs text-muted-foreground mt-2">
+                                    {questionStats[question.id].attempts} answers
+                                    {" · "}
+                                    {questionStats[question.id].correct_rate}%
+                                    correct
+                                    {" · "}
+                                    {Object.entries(
+                                      questionStats[question.id].options
+                                    )
+                                      .map(
+                                        ([option, count]) =>
+                                          `${option}: ${Math.round(
+                                            (count /
+                                              questionStats[question.id!]
+                                                .attempts) *
+                                              100
+                                          )}%`
+                                      )
+                                      .join("  ")}
+                                  </div>
+                                )}
                                 {!question.is_active && (
                                   <span className="text-xs text-muted-foreground mt-2 block">
                                     (Inactive)
@@ -440,6 +596,44 @@ function ExamManager() {
                   Shuffle question order
                 </Label>
               </div>
+              <div className="space-y-2">
+                <Label>Questions per Exam</Label>
+                <Input
+                  type="number"
+                  min="0"
+                  value={config.questions_per_exam}
+                  onChange={(e) =>
+                    setConfig({
+                      ...config,
+                      questions_per_exam: parseInt(e.target.value) || 0,
+                    })
+                  }
+                />
+                <p className="text-xs text-muted-foreground">
+                  Each exam draws this many active questions at random. Use 0
+                  to ask every question.
+                </p>
+              </div>
+              <div className="flex items-center space-x-2">
+                <input
+                  type="checkbox"
+                  id="stratify_by_category"
+                  checked={config.stratify_by_category}
+                  onChange={(e) =>
+                    setConfig({
+                      ...config,
+                      stratify_by_category: e.target.checked,
+                    })
+                  }
+                  className="h-4 w-4 rounded border-gray-300"
+                />
+                <Label
+                  htmlFor="stratify_by_category"
+                  className="cursor-pointer"
+                >
+                  Keep each category's share of the pool when drawing
+                </Label>
+              </div>
               <Button onClick={handleConfigSave}>Save Settings</Button>
             </CardContent>
           </Card>
@@ -453,7 +647,111 @@ function ExamManager() {
                 View recent exam submissions and scores.
               </CardDescription>
             </CardHeader>
-            <CardContent>
+            <CardContent className="space-y-4">
+              <div className="grid grid-cols-5 gap-2 items-end">
+                <div className="space-y-1">
+                  <Label>User ID</Label>
+                  <Input
+                    value={resultFilters.external_user_id}
+                    onChange={(e) =>
+                      setResultFilters({
+                        ...resultFilters,
+                        external_user_id: e.target.value,
+                      })
+                    }
+                  />
+                </div>
+                <div className="space-y-1">
+                  <Label>Result</Label>
+                  <select
+                    value={resultFilters.passed}
+                    onChange={(e) =>
+                      setResultFilters({
+                        ...resultFilters,
+                        passed: e.target.value as ResultFilters["passed"],
+                      })
+                    }
+                    className="flex h-10 w-full rounded-md border border-input bg-background px-3 py-2 text-sm"
+                  >
+                    <option value="">All</option>
+                    <option value="true">Passed</option>
+                    <option value="false">Failed</option>
+                  </select>
+                </div>
+                <div className="space-y-1">
+                  <Label>From</Label>
+                  <Input
+                    type="date"
+                    value={resultFilters.date_from}
+                    onChange={(e) =>
+                      setResultFilters({
+                        ...resultFilters,
+                        date_from: e.target.value,
+                      })
+                    }
+                  />
+                </div>
+                <div className="space-y-1">
+                  <Label>To</Label>
+                  <Input
+                    type="date"
+                    value={resultFilters.date_to}
+                    onChange={(e) =>
+                      setResultFilters({
+                        ...resultFilters,
+                        date_to: e.target.value,
+                      })
+                    }
+                  />
+                </div>
+                <Button onClick={() => loadResults()}>Apply</Button>
+              </div>
+              <div className="flex gap-2">
+                <Button variant="outline" onClick={() => exportResults("csv")}>
+                  Export CSV
+                </Button>
+                <Button
+                  variant="outline"
+                  onClick={() => exportResults("ndjson")}
+                >
+                  Export NDJSON
+                </Button>
+              </div>
+              {summary && summary.total > 0 && (
+                <div className="grid grid-cols-4 gap-4 text-sm">
+                  <div>
+                    <div className="text-muted-foreground">Submissions</div>
+                    <div className="text-lg font-medium">{summary.total}</div>
+                  </div>
+                  <div>
+                    <div className="text-muted-foreground">Pass rate</div>
+                    <div className="text-lg font-medium">
+                      {summary.pass_rate?.toFixed(1)}%
+                    </div>
+                  </div>
+                  <div>
+                    <div className="text-muted-foreground">Average score</div>
+                    <div className="text-lg font-medium">
+                      {summary.average_score?.toFixed(1)}%
+                    </div>
+                  </div>
+                  <div>
+                    <div className="text-muted-foreground">Score distribution</div>
+                    <div className="flex items-end gap-0.5 h-8">
+                      {summary.score_distribution.map((bucket) => (
+                        <div
+                          key={bucket.range}
+                          title={`${bucket.range}%: ${bucket.count}`}
+                          className="flex-1 bg-primary/70"
+                          style={{
+                            height: `${(bucket.count / summary.total) * 100}%`,
+                          }}
+                        />
+                      ))}
+                    </div>
+                  </div>
+                </div>
+              )}
               {results.length === 0 ? (
                 <div className="text-center py-8 text-muted-foreground">
                   No exam results yet.
@@ -507,6 +805,15 @@ function ExamManager() {
                       </div>
                     </div>
                   ))}
+                  {resultsCursor && (
+                    <Button
+                      variant="outline"
+                      className="w-full"
+                      onClick={() => loadResults(resultsCursor)}
+                    >
+                      Load more
+                    </Button>
+                  )}
                 </div>
               )}
             </CardContent>
@@ -542,11 +849,7 @@ function ExamManager() {
               <div className="flex items-center gap-4">
                 {formData.question_image_url && (
                   <img
-                    src={
-                      formData.question_image_url.startsWith("data:")
-                        ? formData.question_image_url
-                        : `/api${formData.question_image_url}`
-                    }
+                    src={thumbnailSrc(formData.question_image_url)}
                     alt="Question preview"
                     className="w-24 h-24 object-cover rounded border"
                   />
@@ -666,6 +969,17 @@ function ExamManager() {
               />
             </div>
 
+            <div className="space-y-2">
+              <Label>Category (Optional)</Label>
+              <Input
+                value={formData.category || ""}
+                onChange={(e) =>
+                  setFormData({ ...formData, category: e.target.value })
+                }
+                placeholder="e.g. Safety"
+              />
+            </div>
+
             <div className="flex items-center space-x-2">
               <input
                 type="checkbox"
@@ -77,8 +77,8 @@ function FileManager() {
   const handleSync = async () => {
     setSyncStatus('Starting sync...');
     try {
-      await api.post('/admin/sync');
-      setSyncStatus('Sync job started!');
+      const res = await api.post('/admin/sync');
+      setSyncStatus(res.data.job ? 'Sync job started!' : res.data.message);
     } catch (err) {
       setSyncStatus('Sync failed.');
     }
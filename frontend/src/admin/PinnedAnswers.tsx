@@ -0,0 +1,218 @@
+import { useState, useEffect } from 'react';
+import api from '../api';
+import { Button } from "@/components/ui/button"
+import { Input } from "@/components/ui/input"
+import { Label } from "@/components/ui/label"
+import { Textarea } from "@/components/ui/textarea"
+import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card"
+
+interface PinnedAnswer {
+  id: number;
+  question: string;
+  phrases: string;
+  answer: string;
+  is_active: boolean;
+  hits: number;
+  last_hit_at: string | null;
+}
+
+interface PinnedStats {
+  total_hits: number;
+  worker: { hits: number; misses: number; hit_rate: number | null };
+}
+
+interface MatchResult {
+  matched: boolean;
+  threshold: number;
+  closest: { id: number; answer: string; score: number } | null;
+}
+
+const emptyForm = { question: '', phrases: '', answer: '', is_active: true };
+
+function PinnedAnswers() {
+  const [entries, setEntries] = useState<PinnedAnswer[]>([]);
+  const [stats, setStats] = useState<PinnedStats | null>(null);
+  const [form, setForm] = useState(emptyForm);
+  const [editingId, setEditingId] = useState<number | null>(null);
+  const [testMessage, setTestMessage] = useState('');
+  const [testResult, setTestResult] = useState<MatchResult | null>(null);
+
+  useEffect(() => {
+    load();
+  }, []);
+
+  const load = async () => {
+    try {
+      const [list, summary] = await Promise.all([
+        api.get('/admin/pinned-answers'),
+        api.get('/admin/pinned-answers/stats'),
+      ]);
+      setEntries(list.data);
+      setStats(summary.data);
+    } catch (err) {
+      console.error('Error loading pinned answers:', err);
+    }
+  };
+
+  const handleSave = async (e: React.FormEvent) => {
+    e.preventDefault();
+    try {
+      if (editingId) {
+        await api.put(`/admin/pinned-answers/${editingId}`, form);
+      } else {
+        await api.post('/admin/pinned-answers', form);
+      }
+      setForm(emptyForm);
+      setEditingId(null);
+      await load();
+    } catch (err: any) {
+      alert(err.response?.data?.detail || 'Error saving pinned answer');
+    }
+  };
+
+  const handleEdit = (entry: PinnedAnswer) => {
+    setEditingId(entry.id);
+    setForm({ question: entry.question, phrases: entry.phrases, answer: entry.answer, is_active: entry.is_active });
+  };
+
+  const handleDelete = async (id: number) => {
+    if (!confirm('Delete this pinned answer?')) return;
+    try {
+      await api.delete(`/admin/pinned-answers/${id}`);
+      await load();
+    } catch (err) {
+      alert('Error deleting pinned answer');
+    }
+  };
+
+  const handleTest = async (e: React.FormEvent) => {
+    e.preventDefault();
+    if (!testMessage.trim()) return;
+    const res = await api.post('/admin/pinned-answers/test', { message: testMessage });
+    setTestResult(res.data);
+  };
+
+  return (
+    <div className="space-y-6 max-w-4xl">
+      <Card>
+        <CardHeader>
+          <CardTitle>{editingId ? 'Edit Pinned Answer' : 'Add Pinned Answer'}</CardTitle>
+          <CardDescription>
+            Matching chat messages get this answer instantly, without searching documents.
+          </CardDescription>
+        </CardHeader>
+        <CardContent>
+          <form onSubmit={handleSave} className="space-y-4">
+            <div className="space-y-2">
+              <Label>Question</Label>
+              <Input
+                value={form.question}
+                onChange={e => setForm({ ...form, question: e.target.value })}
+                placeholder="What are your opening hours?"
+              />
+            </div>
+            <div className="space-y-2">
+              <Label>Other Phrasings (one per line)</Label>
+              <Textarea
+                value={form.phrases}
+                onChange={e => setForm({ ...form, phrases: e.target.value })}
+                placeholder={'When are you open?\nOffice hours'}
+              />
+            </div>
+            <div className="space-y-2">
+              <Label>Answer</Label>
+              <Textarea value={form.answer} onChange={e => setForm({ ...form, answer: e.target.value })} />
+            </div>
+            <label className="flex items-center gap-2 text-sm">
+              <input
+                type="checkbox"
+                checked={form.is_active}
+                onChange={e => setForm({ ...form, is_active: e.target.checked })}
+              />
+              Active
+            </label>
+            <div className="flex gap-2">
+              <Button type="submit" disabled={!form.question.trim() || !form.answer.trim()}>
+                {editingId ? 'Save' : 'Add'}
+              </Button>
+              {editingId && (
+                <Button type="button" variant="outline" onClick={() => { setEditingId(null); setForm(emptyForm); }}>
+                  Cancel
+                </Button>
+              )}
+            </div>
+          </form>
+        </CardContent>
+      </Card>
+
+      <Card>
+        <CardHeader>
+          <CardTitle>Pinned Answers</CardTitle>
+          <CardDescription>
+            {stats
+              ? `${stats.total_hits} messages answered in total` +
+                (stats.worker.hit_rate !== null ? ` · ${Math.round(stats.worker.hit_rate * 100)}% of recent messages` : '')
+              : 'Approved answers to common questions.'}
+          </CardDescription>
+        </CardHeader>
+        <CardContent>
+          {entries.length === 0 ? (
+            <p className="text-sm text-muted-foreground">No pinned answers yet.</p>
+          ) : (
+            <div className="border rounded-lg overflow-hidden">
+              <table className="w-full">
+                <thead className="bg-muted">
+                  <tr>
+                    <th className="text-left p-3 text-sm font-semibold">Question</th>
+                    <th className="text-left p-3 text-sm font-semibold">Answer</th>
+                    <th className="text-right p-3 text-sm font-semibold">Hits</th>
+                    <th className="text-right p-3 text-sm font-semibold">Actions</th>
+                  </tr>
+                </thead>
+                <tbody>
+                  {entries.map((entry, index) => (
+                    <tr key={entry.id} className={index % 2 === 0 ? 'bg-background' : 'bg-muted/50'}>
+                      <td className="p-3 text-sm">
+                        {entry.question}
+                        {!entry.is_active && <span className="ml-2 text-xs text-muted-foreground">(inactive)</span>}
+                      </td>
+                      <td className="p-3 text-sm text-muted-foreground">{entry.answer}</td>
+                      <td className="p-3 text-sm text-right">{entry.hits}</td>
+                      <td className="p-3 text-right space-x-2 whitespace-nowrap">
+                        <Button variant="outline" size="sm" onClick={() => handleEdit(entry)}>Edit</Button>
+                        <Button variant="destructive" size="sm" onClick={() => handleDelete(entry.id)}>Delete</Button>
+                      </td>
+                    </tr>
+                  ))}
+                </tbody>
+              </table>
+            </div>
+          )}
+        </CardContent>
+      </Card>
+
+      <Card>
+        <CardHeader>
+          <CardTitle>Test a Message</CardTitle>
+          <CardDescription>See which pinned answer, if any, a message would get.</CardDescription>
+        </CardHeader>
+        <CardContent className="space-y-4">
+          <form onSubmit={handleTest} className="flex gap-2">
+            <Input value={testMessage} onChange={e => setTestMessage(e.target.value)} placeholder="Type a question" />
+            <Button type="submit">Test</Button>
+          </form>
+          {testResult && (
+            <p className="text-sm text-muted-foreground">
+              {testResult.closest
+                ? `${testResult.matched ? 'Matched' : 'No match'}: closest score ${testResult.closest.score} ` +
+                  `(needs ${testResult.threshold}) — "${testResult.closest.answer}"`
+                : 'No pinned answer shares any words with this message.'}
+            </p>
+          )}
+        </CardContent>
+      </Card>
+    </div>
+  );
+}
+
+export default PinnedAnswers;
@@ -4,3 +4,15 @@ import { twMerge } from "tailwind-merge"
 export function cn(...inputs: ClassValue[]) {
   return twMerge(clsx(inputs))
 }
+
+// Stored image URLs are either data: URIs or backend paths under /api
+export function imageSrc(url: string) {
+  if (url.startsWith("data:") || url.startsWith("/api/")) {
+    return url
+  }
+  return `/api${url}`
+}
+
+export function thumbnailSrc(url: string) {
+  return imageSrc(url).replace(/_display\.webp$/, "_thumb.webp")
+}
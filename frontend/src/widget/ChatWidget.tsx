@@ -1,6 +1,12 @@
 import { useState, useRef, useEffect } from "react";
 import { useSearchParams } from "react-router-dom";
 import api from "../api";
+import {
+  ChatSocket,
+  type ChatReply,
+  ChatCancelled,
+  SocketUnavailable,
+} from "./chatSocket";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
 import {
@@ -19,14 +25,27 @@ import {
   ArrowRight,
 } from "lucide-react";
 import ReactMarkdown from "react-markdown";
+import { imageSrc } from "@/lib/utils";
 import remarkGfm from "remark-gfm";
 
+interface Citation {
+  source_uri: string | null;
+  title: string | null;
+  span: { start: number; end: number } | null;
+  snippet: string;
+  citation: number;
+  reference: number;
+}
+
 interface Message {
   role: "user" | "bot";
   text: string;
-  citations?: any[];
+  citations?: Citation[];
+  responseId?: string;
   isTyping?: boolean;
   displayedText?: string;
+  // Set on bot replies, so streamed parts land in the right bubble
+  turnId?: string;
 }
 
 interface ExamQuestion {
@@ -76,19 +95,29 @@ const defaultTheme: ThemeColors = {
   chat_bubble_bot_foreground: "#18181b",
 };
 
+const SESSION_STORAGE_KEY = "chat_session_id";
+
 function ChatWidget() {
   const [searchParams] = useSearchParams();
   const [messages, setMessages] = useState<Message[]>([]);
   const [input, setInput] = useState("");
   const [loading, setLoading] = useState(false);
-  const [sessionId, setSessionId] = useState<string | null>(null);
+  const [sessionId, setSessionId] = useState<string | null>(() =>
+    sessionStorage.getItem(SESSION_STORAGE_KEY)
+  );
   const [botName, setBotName] = useState<string>("Chat Support");
   const [examModeEnabled, setExamModeEnabled] = useState(false);
   const [theme, setTheme] = useState<ThemeColors>(defaultTheme);
+  const [greetingTemplate, setGreetingTemplate] = useState<string | null>(
+    null
+  );
   const messagesEndRef = useRef<HTMLDivElement>(null);
+  const chatSocketRef = useRef<ChatSocket | null>(null);
+  const latestTurnRef = useRef<string | null>(null);
 
   const [examMode, setExamMode] = useState(false);
   const [examQuestions, setExamQuestions] = useState<ExamQuestion[]>([]);
+  const [examSessionId, setExamSessionId] = useState<string | null>(null);
   const [currentQuestionIndex, setCurrentQuestionIndex] = useState(0);
   const [answers, setAnswers] = useState<AnswerSubmission[]>([]);
   const [examResult, setExamResult] = useState<ExamResult | null>(null);
@@ -150,42 +179,48 @@ function ChatWidget() {
   }, [messages]);
 
   useEffect(() => {
-    const fetchBotConfig = async () => {
+    const fetchBootstrap = async () => {
       try {
-        const response = await api.get("/admin/public-config");
-        if (response.data.bot_name) {
-          setBotName(response.data.bot_name);
+        const response = await api.get("/widget/bootstrap");
+        const { config, greeting, exam } = response.data;
+        if (config.bot_name) {
+          setBotName(config.bot_name);
         }
-        if (response.data.enable_exam_mode !== undefined) {
-          setExamModeEnabled(response.data.enable_exam_mode);
+        if (config.enable_exam_mode !== undefined) {
+          setExamModeEnabled(config.enable_exam_mode);
         }
         setTheme({
-          primary_color:
-            response.data.primary_color || defaultTheme.primary_color,
+          primary_color: config.primary_color || defaultTheme.primary_color,
           primary_foreground:
-            response.data.primary_foreground || defaultTheme.primary_foreground,
+            config.primary_foreground || defaultTheme.primary_foreground,
           chat_bubble_user:
-            response.data.chat_bubble_user || defaultTheme.chat_bubble_user,
+            config.chat_bubble_user || defaultTheme.chat_bubble_user,
           chat_bubble_user_foreground:
-            response.data.chat_bubble_user_foreground ||
+            config.chat_bubble_user_foreground ||
             defaultTheme.chat_bubble_user_foreground,
           chat_bubble_bot:
-            response.data.chat_bubble_bot || defaultTheme.chat_bubble_bot,
+            config.chat_bubble_bot || defaultTheme.chat_bubble_bot,
           chat_bubble_bot_foreground:
-            response.data.chat_bubble_bot_foreground ||
+            config.chat_bubble_bot_foreground ||
             defaultTheme.chat_bubble_bot_foreground,
         });
-        if (response.data.webhook_url) {
-          setConfigWebhookUrl(response.data.webhook_url);
+        if (config.webhook_url) {
+          setConfigWebhookUrl(config.webhook_url);
+        }
+        if (greeting.template) {
+          setGreetingTemplate(greeting.template);
         }
+        setExamConfig(exam);
       } catch (error) {
-        console.error("Failed to fetch bot config:", error);
+        console.error("Failed to load widget:", error);
       }
     };
-    fetchBotConfig();
+    fetchBootstrap();
   }, []);
 
   useEffect(() => {
+    if (!greetingTemplate) return;
+
     const parseGreetingTemplate = (template: string): string => {
       let result = template;
 
@@ -206,36 +241,18 @@ function ChatWidget() {
       return result.trim();
     };
 
-    const fetchGreeting = async () => {
-      try {
-        const response = await api.get("/chat/greeting");
-        if (response.data.template) {
-          const greeting = parseGreetingTemplate(response.data.template);
-          const greetingMsg: Message = {
-            role: "bot",
-            text: greeting,
-            isTyping: true,
-            displayedText: "",
-          };
-          setMessages([greetingMsg]);
-        }
-      } catch (error) {
-        console.error("Failed to fetch greeting:", error);
-      }
+    const greetingMsg: Message = {
+      role: "bot",
+      text: parseGreetingTemplate(greetingTemplate),
+      isTyping: true,
+      displayedText: "",
     };
-    fetchGreeting();
-  }, [externalUserName, externalUserId]);
+    setMessages([greetingMsg]);
+  }, [greetingTemplate, externalUserName, externalUserId]);
 
   useEffect(() => {
-    const loadExamConfig = async () => {
-      try {
-        const response = await api.get("/exam/public/config");
-        setExamConfig(response.data);
-      } catch (error) {
-        console.error("Failed to load exam config:", error);
-      }
-    };
-    loadExamConfig();
+    chatSocketRef.current = new ChatSocket();
+    return () => chatSocketRef.current?.close();
   }, []);
 
   const sendMessage = async (messageText: string) => {
@@ -246,23 +263,59 @@ function ChatWidget() {
     setInput("");
     setLoading(true);
 
-    try {
-      const response = await api.post("/chat/", {
-        message: messageText,
-        session_id: sessionId,
+    const turnId = crypto.randomUUID();
+    latestTurnRef.current = turnId;
+    const showDelta = (text: string) => {
+      setLoading(false);
+      setMessages((prev) => {
+        const streaming = prev.find((msg) => msg.turnId === turnId);
+        if (!streaming) return [...prev, { role: "bot", text, turnId }];
+        return prev.map((msg) =>
+          msg === streaming ? { ...msg, text: msg.text + text } : msg
+        );
       });
+    };
+
+    try {
+      let reply: ChatReply;
+      try {
+        if (!chatSocketRef.current) throw new SocketUnavailable();
+        reply = await chatSocketRef.current.send(
+          turnId,
+          messageText,
+          sessionId,
+          showDelta
+        );
+      } catch (error) {
+        if (!(error instanceof SocketUnavailable)) throw error;
+        const response = await api.post("/chat/", {
+          message: messageText,
+          session_id: sessionId,
+        });
+        reply = response.data;
+      }
 
       const botMsg: Message = {
         role: "bot",
-        text: response.data.response,
-        citations: response.data.citations,
-        isTyping: true,
-        displayedText: "",
+        text: reply.response,
+        citations: reply.citations,
+        responseId: reply.response_id ?? undefined,
+        turnId,
       };
 
-      setSessionId(response.data.session_id);
-      setMessages((prev) => [...prev, botMsg]);
+      setSessionId(reply.session_id);
+      sessionStorage.setItem(SESSION_STORAGE_KEY, reply.session_id);
+      setMessages((prev) => {
+        // Streamed replies are already on screen; others are typed out
+        const streamed = prev.find((msg) => msg.turnId === turnId);
+        if (streamed) {
+          return prev.map((msg) => (msg === streamed ? botMsg : msg));
+        }
+        return [...prev, { ...botMsg, isTyping: true, displayedText: "" }];
+      });
     } catch (error) {
+      // A newer message replaced this one; keep whatever was streamed
+      if (error instanceof ChatCancelled) return;
       console.error("Chat error:", error);
       setMessages((prev) => [
         ...prev,
@@ -274,7 +327,7 @@ function ChatWidget() {
         },
       ]);
     } finally {
-      setLoading(false);
+      if (latestTurnRef.current === turnId) setLoading(false);
     }
   };
 
@@ -286,19 +339,22 @@ function ChatWidget() {
 
   const startExam = async () => {
     try {
-      const response = await api.get("/exam/public/questions");
-      if (response.data.length === 0) {
-        alert("No exam questions available.");
-        return;
-      }
-      setExamQuestions(response.data);
+      const response = await api.post("/exam/public/start", {
+        external_user_id: externalUserId,
+      });
+      setExamSessionId(response.data.exam_session_id);
+      setExamQuestions(response.data.questions);
       setCurrentQuestionIndex(0);
       setAnswers([]);
       setExamResult(null);
       setSelectedAnswer(null);
       setAnswerFeedback(null);
       setExamMode(true);
-    } catch (error) {
+    } catch (error: any) {
+      if (error.response?.status === 404) {
+        alert("No exam questions available.");
+        return;
+      }
       console.error("Failed to load exam questions:", error);
       alert("Failed to start exam. Please try again.");
     }
@@ -307,6 +363,7 @@ function ChatWidget() {
   const exitExam = () => {
     setExamMode(false);
     setExamQuestions([]);
+    setExamSessionId(null);
     setCurrentQuestionIndex(0);
     setAnswers([]);
     setExamResult(null);
@@ -320,6 +377,7 @@ function ChatWidget() {
 
     try {
       const response = await api.post("/exam/public/check-answer", {
+        exam_session_id: examSessionId,
         question_id: examQuestions[currentQuestionIndex].id,
         selected_answer: answer,
       });
@@ -358,6 +416,7 @@ function ChatWidget() {
           external_user_name: externalUserName,
           webhook_url: webhookUrlParam || configWebhookUrl,
           custom_data: parsedCustomData,
+          exam_session_id: examSessionId,
           answers: answers,
         });
         setExamResult(response.data);
@@ -438,11 +497,7 @@ function ChatWidget() {
           <div className="max-w-2xl mx-auto space-y-6">
             {question.question_image_url && (
               <img
-                src={
-                  question.question_image_url.startsWith("data:")
-                    ? question.question_image_url
-                    : `/api${question.question_image_url}`
-                }
+                src={imageSrc(question.question_image_url)}
                 alt="Question"
                 className="w-full max-h-64 object-contain rounded-lg border"
               />
@@ -589,7 +644,7 @@ function ChatWidget() {
                 )}
                 {msg.citations && msg.citations.length > 0 && (
                   <div className="text-xs opacity-70 mt-1 border-t border-current/20 pt-1">
-                    Sources: {msg.citations.length}
+                    Sources: {new Set(msg.citations.map((c) => c.source_uri ?? c.title)).size}
                   </div>
                 )}
               </div>
@@ -0,0 +1,138 @@
+export interface ChatReply {
+  response: string;
+  session_id: string;
+  citations: any[];
+  response_id: string | null;
+}
+
+// The socket couldn't be opened or dropped mid-answer; callers fall back to HTTP
+export class SocketUnavailable extends Error {}
+
+// A newer message replaced this one before it was answered
+export class ChatCancelled extends Error {}
+
+export class ChatSocketError extends Error {
+  status: number;
+
+  constructor(status: number, message: string) {
+    super(message);
+    this.status = status;
+  }
+}
+
+interface PendingTurn {
+  onDelta: (text: string) => void;
+  resolve: (reply: ChatReply) => void;
+  reject: (error: Error) => void;
+}
+
+const CONNECT_TIMEOUT_MS = 5000;
+
+function socketUrl(sessionId: string | null) {
+  // Same base as the HTTP API, which may include a path prefix
+  const base = (import.meta.env.VITE_API_URL || window.location.origin).replace(/\/$/, "");
+  const url = new URL(`${base}/chat/ws`);
+  url.protocol = url.protocol === "https:" ? "wss:" : "ws:";
+  if (sessionId) url.searchParams.set("session_id", sessionId);
+  return url.toString();
+}
+
+/**
+ * One WebSocket per widget, reused for every message. Answers stream in as
+ * deltas; sending a new message cancels the one still being answered.
+ */
+export class ChatSocket {
+  private ws: WebSocket | null = null;
+  private opening: Promise<WebSocket> | null = null;
+  private sessionId: string | null = null;
+  private pending = new Map<string, PendingTurn>();
+  // Set once the socket can't be opened (e.g. a proxy without upgrade support)
+  private unavailable = false;
+
+  private connect(sessionId: string | null): Promise<WebSocket> {
+    if (this.unavailable || typeof WebSocket === "undefined") {
+      return Promise.reject(new SocketUnavailable("WebSocket unavailable"));
+    }
+    if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+      return Promise.resolve(this.ws);
+    }
+    if (this.opening) return this.opening;
+
+    this.opening = new Promise<WebSocket>((resolve, reject) => {
+      const ws = new WebSocket(socketUrl(sessionId));
+      let ready = false;
+      const timer = setTimeout(() => ws.close(), CONNECT_TIMEOUT_MS);
+
+      ws.onmessage = (event) => {
+        const frame = JSON.parse(event.data);
+        if (frame.type === "ready") {
+          ready = true;
+          clearTimeout(timer);
+          this.ws = ws;
+          this.sessionId = frame.session_id;
+          resolve(ws);
+        } else {
+          this.handle(ws, frame);
+        }
+      };
+      ws.onclose = () => {
+        clearTimeout(timer);
+        if (this.ws === ws) this.ws = null;
+        if (!ready) {
+          this.unavailable = true;
+          reject(new SocketUnavailable("Could not open chat socket"));
+        }
+        this.pending.forEach((turn) =>
+          turn.reject(new SocketUnavailable("Chat socket closed"))
+        );
+        this.pending.clear();
+      };
+    }).finally(() => {
+      this.opening = null;
+    });
+    return this.opening;
+  }
+
+  private handle(ws: WebSocket, frame: any) {
+    if (frame.type === "ping") {
+      ws.send(JSON.stringify({ type: "pong" }));
+      return;
+    }
+    const turn = this.pending.get(frame.id);
+    if (!turn) return;
+    if (frame.type === "delta") {
+      turn.onDelta(frame.text);
+      return;
+    }
+    this.pending.delete(frame.id);
+    if (frame.type === "done") {
+      turn.resolve({
+        response: frame.response,
+        session_id: this.sessionId as string,
+        citations: frame.citations,
+        response_id: frame.response_id,
+      });
+    } else if (frame.type === "cancelled") {
+      turn.reject(new ChatCancelled("Replaced by a newer message"));
+    } else if (frame.type === "error") {
+      turn.reject(new ChatSocketError(frame.status, frame.detail));
+    }
+  }
+
+  async send(
+    turnId: string,
+    message: string,
+    sessionId: string | null,
+    onDelta: (text: string) => void
+  ): Promise<ChatReply> {
+    const ws = await this.connect(sessionId);
+    return new Promise<ChatReply>((resolve, reject) => {
+      this.pending.set(turnId, { onDelta, resolve, reject });
+      ws.send(JSON.stringify({ type: "message", id: turnId, message }));
+    });
+  }
+
+  close() {
+    this.ws?.close();
+  }
+}